@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------
+# SERVER-SIDE AGGREGATION OF BULK PREDICTIONS
+# -------------------------------------------------
+# Instead of returning one prediction per row, /upload-data?aggregate=true
+# folds each chunk into fixed-size running reductions (bincount sums and
+# counts, per-day maxima) and returns a small summary. Memory is bounded by
+# the number of distinct days, not the number of rows.
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _day_keys(chunk: pd.DataFrame):
+    # Calendar day of each row, when the upload carries timestamps
+    if "datetime" in chunk.columns:
+        dt = pd.to_datetime(chunk["datetime"], errors="coerce")
+    elif "date" in chunk.columns:
+        dt = pd.to_datetime(chunk["date"], dayfirst=True, errors="coerce")
+    else:
+        return None
+    return dt.dt.normalize()
+
+
+class DemandSummary:
+    def __init__(self, threshold: float = None, risk_threshold: float = None, high_risk_class: int = 1):
+        # high_risk_class: the classifier label counted as high risk (2 for
+        # the 3-level voltage-band classifier)
+        self.threshold = threshold
+        self.risk_threshold = risk_threshold
+        self.high_risk_class = high_risk_class
+        self.rows = 0
+        self.total = 0.0
+        self.peak = -np.inf
+        self.hour_sum = np.zeros(24)
+        self.hour_count = np.zeros(24, dtype=np.int64)
+        self.dow_sum = np.zeros(7)
+        self.dow_count = np.zeros(7, dtype=np.int64)
+        self.above = 0
+        self.above_by_hour = np.zeros(24, dtype=np.int64)
+        self.high_risk = None
+        self.daily_peak = None   # pd.Series: day -> max predicted demand
+
+    def update(self, chunk: pd.DataFrame, predictions, risk=None):
+        y = np.asarray(predictions, dtype=np.float64)
+        hour = np.clip(chunk["hour"].to_numpy(dtype=np.int64), 0, 23)
+        dow = np.clip(chunk["dayofweek"].to_numpy(dtype=np.int64), 0, 6)
+
+        self.rows += len(y)
+        self.total += float(y.sum())
+        if len(y):
+            self.peak = max(self.peak, float(y.max()))
+
+        self.hour_sum += np.bincount(hour, weights=y, minlength=24)
+        self.hour_count += np.bincount(hour, minlength=24)
+        self.dow_sum += np.bincount(dow, weights=y, minlength=7)
+        self.dow_count += np.bincount(dow, minlength=7)
+
+        if self.threshold is not None:
+            mask = y > self.threshold
+            self.above += int(mask.sum())
+            self.above_by_hour += np.bincount(hour[mask], minlength=24)
+
+        if risk is not None:
+            self.high_risk = (self.high_risk or 0) + int(np.sum(np.asarray(risk) == self.high_risk_class))
+        elif self.risk_threshold is not None:
+            self.high_risk = (self.high_risk or 0) + int(np.sum(y > self.risk_threshold))
+
+        days = _day_keys(chunk)
+        if days is not None:
+            per_day = pd.Series(y, index=days.to_numpy()).groupby(level=0).max()
+            per_day = per_day[per_day.index.notna()]
+            if self.daily_peak is None:
+                self.daily_peak = per_day
+            else:
+                self.daily_peak = pd.concat([self.daily_peak, per_day]).groupby(level=0).max()
+
+    def result(self):
+        def means(s, c):
+            return [float(v) if n else None for v, n in zip(s / np.maximum(c, 1), c)]
+
+        out = {
+            "rows": self.rows,
+            "mean_demand": self.total / self.rows if self.rows else None,
+            "peak_demand": self.peak if self.rows else None,
+            "mean_by_hour": means(self.hour_sum, self.hour_count),
+            "mean_by_dayofweek": dict(zip(DAY_NAMES, means(self.dow_sum, self.dow_count))),
+        }
+        if self.threshold is not None:
+            out["threshold"] = self.threshold
+            out["hours_above_threshold"] = self.above
+            out["hours_above_threshold_by_hour"] = self.above_by_hour.tolist()
+        if self.high_risk is not None:
+            out["high_risk_hours"] = self.high_risk
+        if self.daily_peak is not None:
+            out["daily_peak"] = {
+                day.strftime("%Y-%m-%d"): float(v)
+                for day, v in self.daily_peak.sort_index().items()
+            }
+        return out
@@ -0,0 +1,220 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from app.utils import load_models
+from training.features import FEATURES, add_features, missing_features
+from training.uci_reader import read_uci
+
+# -------------------------------------------------
+# OFFLINE MULTI-CORE BATCH SCORING
+# -------------------------------------------------
+# Usage:
+#   python -m app.batch_score INPUT OUTPUT [--workers N] [--chunk-rows N] [--risk]
+#
+# INPUT is a feature CSV (hour, temperature, voltage, dayofweek), a Parquet
+# file with the same columns, or a raw UCI `household_power_consumption.txt`.
+# Chunks are scored in a process pool (models are loaded once per worker)
+# and written in input order to OUTPUT (.parquet, or .csv).
+
+
+# -------------------------------------------------
+# INPUT READERS (YIELD CHUNKS)
+# -------------------------------------------------
+def _detect_format(path: Path) -> str:
+    if path.suffix.lower() == ".parquet":
+        return "parquet"
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        header = f.readline()
+    return "uci" if header.startswith("Date;Time") else "csv"
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("pyarrow is required for Parquet input/output. Please install it.")
+
+
+def _uci_features(chunk: pd.DataFrame) -> pd.DataFrame:
+    # Same derivation as training/preprocess.py, per minute row
+    out = add_features(pd.DataFrame({"datetime": chunk["datetime"], "voltage": chunk["voltage"]}))
+    return out.dropna(subset=["voltage"])
+
+
+def iter_chunks(path, fmt: str = "auto", chunk_rows: int = 100000):
+    path = Path(path)
+    fmt = _detect_format(path) if fmt == "auto" else fmt
+
+    if fmt == "parquet":
+        _require_pyarrow()
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunk_rows):
+            yield add_features(batch.to_pandas(), synthesize=False)
+    elif fmt == "uci":
+        for chunk in read_uci(path, chunksize=chunk_rows):
+            yield _uci_features(chunk)
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            yield add_features(chunk, synthesize=False)
+
+
+# -------------------------------------------------
+# WORKER PROCESS
+# -------------------------------------------------
+_worker_models = None
+_worker_models_dir = None
+
+
+def _init_worker(models_dir: str):
+    global _worker_models, _worker_models_dir
+    # Loaded once per worker; forests are pinned to n_jobs=1 by load_models
+    # so the pool itself is the only source of parallelism.
+    _worker_models = load_models(models_dir)
+    _worker_models_dir = models_dir
+
+
+def _model(kind: str):
+    # A pickle that exists but failed to load (load_models prints why)
+    model = _worker_models.get(kind)
+    if model is None:
+        raise RuntimeError(f"The {kind} model could not be loaded from {_worker_models_dir}")
+    return model
+
+
+def _score(X: np.ndarray, with_risk: bool):
+    out = {"predicted_demand": _model("regression").predict(X)}
+    if with_risk:
+        out["risk"] = _model("classifier").predict(X)
+    return out
+
+
+def _check_models(models_dir: str, with_risk: bool):
+    # Fail before starting the pool rather than inside every worker
+    needed = ["regression", "classifier"] if with_risk else ["regression"]
+    missing = [f"{kind}.pkl" for kind in needed if not (Path(models_dir) / f"{kind}.pkl").exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing {', '.join(missing)} in {models_dir}; train the models first")
+
+
+# -------------------------------------------------
+# OUTPUT WRITERS
+# -------------------------------------------------
+class _ParquetSink:
+    def __init__(self, path):
+        _require_pyarrow()
+        self.path = path
+        self.writer = None
+
+    def write(self, df: pd.DataFrame):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self.first = True
+
+    def write(self, df: pd.DataFrame):
+        df.to_csv(self.path, mode="w" if self.first else "a", header=self.first, index=False)
+        self.first = False
+
+    def close(self):
+        pass
+
+
+# -------------------------------------------------
+# DRIVER
+# -------------------------------------------------
+def batch_score(
+    input_path: str,
+    output_path: str,
+    fmt: str = "auto",
+    models_dir: str = "models",
+    workers: int = None,
+    chunk_rows: int = 100000,
+    with_risk: bool = False,
+):
+    workers = workers or os.cpu_count() or 1
+    _check_models(models_dir, with_risk)
+    out = Path(output_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    sink = _ParquetSink(out) if out.suffix.lower() == ".parquet" else _CsvSink(out)
+
+    rows = 0
+    t0 = time.perf_counter()
+    # Bounded number of chunks in flight keeps memory flat; popping the
+    # oldest future first keeps the output in input order.
+    in_flight = deque()
+
+    def drain_one():
+        nonlocal rows
+        meta, fut = in_flight.popleft()
+        for col, values in fut.result().items():
+            meta[col] = values
+        sink.write(meta)
+        rows += len(meta)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(models_dir,)) as pool:
+            for chunk in iter_chunks(input_path, fmt, chunk_rows):
+                missing = missing_features(chunk)
+                if missing:
+                    raise ValueError(f"Input missing required columns: {missing}")
+                X = chunk[FEATURES].to_numpy(dtype=np.float64)
+                meta = chunk[["datetime"]].reset_index(drop=True) if "datetime" in chunk.columns else pd.DataFrame(index=range(len(chunk)))
+                in_flight.append((meta, pool.submit(_score, X, with_risk)))
+                if len(in_flight) >= 2 * workers:
+                    drain_one()
+            while in_flight:
+                drain_one()
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - t0
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s) with {workers} workers -> {out}")
+    return {"rows": rows, "seconds": elapsed, "rows_per_second": rate, "output_path": str(out)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score large CSV / Parquet / raw UCI files offline.")
+    parser.add_argument("input")
+    parser.add_argument("output", help=".parquet (columnar) or .csv")
+    parser.add_argument("--format", default="auto", choices=["auto", "csv", "parquet", "uci"])
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=100000)
+    parser.add_argument("--risk", action="store_true", help="also run the classifier")
+    args = parser.parse_args(argv)
+
+    try:
+        batch_score(args.input, args.output, args.format, args.models_dir,
+                    args.workers, args.chunk_rows, args.risk)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from app.config import CASCADE_REPROBE_SECONDS, CASCADE_TRUNCATED_FRACTION
+
+# -------------------------------------------------
+# DEADLINE-AWARE INFERENCE CASCADE
+# -------------------------------------------------
+# Three tiers, best first:
+#   full       - every tree in the forest
+#   truncated  - the first k trees only
+#   surrogate  - nearest point of a grid precomputed with the full forest
+# A request with a latency budget gets the best tier whose observed latency
+# fits in what is left of the budget (the caller passes the deadline minus
+# the time already spent, queueing included). The surrogate is the floor:
+# it is a single table lookup and answers in microseconds.
+#
+# Estimates only move when a tier runs, so a tier that is being skipped is
+# re-timed off the request path (on a copy of the skipped request's row)
+# once it has gone CASCADE_REPROBE_SECONDS without a sample; the fresh
+# estimate replaces the old one, as at warm-up.
+
+TIERS = ["full", "truncated", "surrogate"]
+
+# Surrogate grid: every hour and weekday, plus temperature / voltage bins
+# covering the ranges the frontend allows.
+TEMP_GRID = np.arange(0.0, 50.0 + 1e-9, 2.5)
+VOLT_GRID = np.arange(200.0, 250.0 + 1e-9, 2.0)
+
+# Safety margin on the latency estimate (mean + 3 * mean deviation)
+_EWMA_ALPHA = 0.2
+_DEV_WEIGHT = 3.0
+
+
+class _Latency:
+    def __init__(self):
+        self.mean = None
+        self.dev = 0.0
+
+    def update(self, ms: float):
+        if self.mean is None:
+            self.mean = ms
+            return
+        self.dev = (1 - _EWMA_ALPHA) * self.dev + _EWMA_ALPHA * abs(ms - self.mean)
+        self.mean = (1 - _EWMA_ALPHA) * self.mean + _EWMA_ALPHA * ms
+
+    def estimate(self):
+        if self.mean is None:
+            return None
+        return self.mean + _DEV_WEIGHT * self.dev
+
+
+class Cascade:
+    def __init__(self, model, kind: str, truncated_fraction: float = CASCADE_TRUNCATED_FRACTION):
+        self.model = model
+        self.kind = kind
+        n_trees = len(model.estimators_)
+        self.k = max(1, min(n_trees, int(math.ceil(n_trees * truncated_fraction))))
+        self.latency = {tier: _Latency() for tier in TIERS}
+        self.last_run = {tier: 0.0 for tier in TIERS}
+        self.reprobes = 0
+        self._probing = set()
+        self._lock = threading.Lock()
+        self._table = None
+        self._build_surrogate()
+        self._warm_up()
+
+    # -- tiers ------------------------------------
+    def _full(self, X):
+        return self.model.predict(X)
+
+    def _truncated(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        trees = self.model.estimators_[:self.k]
+        if self.kind == "classifier":
+            votes = sum(t.predict_proba(X, check_input=False) for t in trees)
+            return self.model.classes_.take(np.argmax(votes, axis=1))
+        return sum(t.predict(X, check_input=False) for t in trees) / len(trees)
+
+    def _surrogate(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        h = np.clip(np.rint(X[:, 0]), 0, 23).astype(np.intp)
+        t = _nearest(X[:, 1], TEMP_GRID)
+        v = _nearest(X[:, 2], VOLT_GRID)
+        d = np.clip(np.rint(X[:, 3]), 0, 6).astype(np.intp)
+        return self._table[h, t, v, d]
+
+    def _build_surrogate(self):
+        h, t, v, d = np.meshgrid(np.arange(24), TEMP_GRID, VOLT_GRID, np.arange(7), indexing="ij")
+        grid = np.column_stack([h.ravel(), t.ravel(), v.ravel(), d.ravel()])
+        table = self.model.predict(grid)
+        if self.kind != "classifier":
+            table = table.astype(np.float32)
+        self._table = table.reshape(h.shape)
+
+    def _warm_up(self, repeats: int = 5):
+        row = np.array([[18, 25.0, 230.0, 2]])
+        for _ in range(repeats):
+            for tier in TIERS:
+                self._run(tier, row)
+
+    def _timed(self, tier: str, X):
+        fn = {"full": self._full, "truncated": self._truncated, "surrogate": self._surrogate}[tier]
+        t0 = time.perf_counter()
+        y = fn(X)
+        return y, (time.perf_counter() - t0) * 1e3
+
+    def _run(self, tier: str, X):
+        y, ms = self._timed(tier, X)
+        with self._lock:
+            self.latency[tier].update(ms)
+            self.last_run[tier] = time.monotonic()
+        return y
+
+    def _reprobe(self, tier: str, X, repeats: int = 3):
+        try:
+            fresh = _Latency()
+            for _ in range(repeats):
+                fresh.update(self._timed(tier, X)[1])
+            with self._lock:
+                self.latency[tier] = fresh
+                self.last_run[tier] = time.monotonic()
+                self.reprobes += 1
+        finally:
+            with self._lock:
+                self._probing.discard(tier)
+
+    def _reprobe_skipped(self, chosen: str, X):
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                tier for tier in TIERS[:TIERS.index(chosen)]
+                if tier not in self._probing and now - self.last_run[tier] >= CASCADE_REPROBE_SECONDS
+            ]
+            self._probing.update(stale)
+        for tier in stale:
+            # X may be a per-thread buffer that the next request overwrites
+            row = np.array(X, copy=True)
+            threading.Thread(target=self._reprobe, args=(tier, row), name=f"cascade-reprobe-{tier}", daemon=True).start()
+
+    # -- public -----------------------------------
+    def choose(self, budget_ms: float):
+        with self._lock:
+            for tier in TIERS[:-1]:
+                est = self.latency[tier].estimate()
+                if est is not None and est <= budget_ms:
+                    return tier
+        return TIERS[-1]
+
+    def predict(self, X, budget_ms: float):
+        # budget_ms: what is left of the request's deadline
+        tier = self.choose(budget_ms)
+        y = self._run(tier, X)
+        if tier != TIERS[0]:
+            self._reprobe_skipped(tier, X)
+        return y, tier
+
+    def stats(self):
+        with self._lock:
+            return {
+                "truncated_trees": self.k,
+                "forest_size": len(self.model.estimators_),
+                "reprobes": self.reprobes,
+                "latency_ms": {
+                    tier: {"mean": lat.mean, "estimate": lat.estimate()}
+                    for tier, lat in self.latency.items()
+                },
+            }
+
+
+def _nearest(values, grid):
+    step = grid[1] - grid[0]
+    idx = np.rint((values - grid[0]) / step)
+    return np.clip(idx, 0, len(grid) - 1).astype(np.intp)
+
+
+# -------------------------------------------------
+# ONE CASCADE PER LOADED MODEL
+# -------------------------------------------------
+_cascades = {}
+_cascades_lock = threading.Lock()
+
+
+def get_cascade(model, kind: str) -> Cascade:
+    with _cascades_lock:
+        cascade = _cascades.get(kind)
+        # Rebuild when the model object changed (e.g. after a reload)
+        if cascade is None or cascade.model is not model:
+            cascade = Cascade(model, kind)
+            _cascades[kind] = cascade
+        return cascade
+
+
+def cascade_stats():
+    with _cascades_lock:
+        return {kind: c.stats() for kind, c in _cascades.items()}
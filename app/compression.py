@@ -0,0 +1,240 @@
+import threading
+import time
+import zlib
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config import (
+    COMPRESSION_LEVEL,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_PATHS,
+    MAX_DECOMPRESSED_BYTES,
+)
+
+# -------------------------------------------------
+# COMPRESSED REQUEST / RESPONSE BODIES FOR BULK ROUTES
+# -------------------------------------------------
+# Requests with `Content-Encoding: gzip|deflate` are inflated chunk by chunk
+# as the ASGI server hands them over, so the multipart / JSON parsers
+# downstream only ever see plain bytes and nothing buffers the whole
+# compressed body. Responses are compressed when the client's
+# Accept-Encoding allows it and the body is at least COMPRESSION_MIN_SIZE.
+
+_stats = {
+    "requests_decoded": 0,
+    "request_bytes_compressed": 0,
+    "request_bytes_decompressed": 0,
+    "request_cpu_ms": 0.0,
+    "responses_encoded": 0,
+    "response_bytes_uncompressed": 0,
+    "response_bytes_compressed": 0,
+    "response_cpu_ms": 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def _add(**values):
+    with _stats_lock:
+        for k, v in values.items():
+            _stats[k] += v
+
+
+def compression_stats():
+    with _stats_lock:
+        s = dict(_stats)
+    s["request_bytes_saved"] = s["request_bytes_decompressed"] - s["request_bytes_compressed"]
+    s["response_bytes_saved"] = s["response_bytes_uncompressed"] - s["response_bytes_compressed"]
+    return s
+
+
+def _negotiate(accept_encoding: str):
+    # Pick gzip over deflate; honour q=0 exclusions
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    for enc in ("gzip", "deflate"):
+        if accepted.get(enc, accepted.get("*", 0.0)) > 0:
+            return enc
+    return None
+
+
+class _DecompressingReceive:
+    def __init__(self, receive, encoding: str, limit: int):
+        self.receive = receive
+        self.encoding = encoding
+        self.limit = limit
+        self.decoder = None
+        self.total_in = 0
+        self.total_out = 0
+        self.cpu = 0.0
+
+    def _make_decoder(self, first: bytes):
+        if self.encoding == "gzip":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # "deflate" should be zlib-wrapped (RFC 9110) but many clients send
+        # raw deflate; tell them apart by the zlib header checksum.
+        if len(first) >= 2 and (first[0] & 0x0F) == 8 and ((first[0] << 8) | first[1]) % 31 == 0:
+            return zlib.decompressobj(zlib.MAX_WBITS)
+        return zlib.decompressobj(-zlib.MAX_WBITS)
+
+    async def __call__(self):
+        message = await self.receive()
+        if message["type"] != "http.request":
+            return message
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        t0 = time.thread_time()
+        try:
+            if self.decoder is None and body:
+                self.decoder = self._make_decoder(body)
+            # Never inflate more than one byte past the limit: a small
+            # chunk can expand a thousandfold (decompression bomb)
+            budget = self.limit - self.total_out + 1
+            out = self.decoder.decompress(body, budget) if body else b""
+            too_large = len(out) >= budget or (self.decoder is not None and self.decoder.unconsumed_tail)
+            if not too_large and not more_body and self.decoder is not None:
+                out += self.decoder.flush()
+        except zlib.error:
+            raise HTTPException(status_code=400, detail=f"Invalid {self.encoding} request body")
+        self.cpu += time.thread_time() - t0
+
+        self.total_in += len(body)
+        self.total_out += len(out)
+        if too_large or self.total_out > self.limit:
+            raise HTTPException(status_code=413, detail="Decompressed request body too large")
+
+        if not more_body:
+            _add(
+                requests_decoded=1,
+                request_bytes_compressed=self.total_in,
+                request_bytes_decompressed=self.total_out,
+                request_cpu_ms=self.cpu * 1e3,
+            )
+        return {"type": "http.request", "body": out, "more_body": more_body}
+
+
+class _CompressingSend:
+    def __init__(self, send, encoding: str, level: int, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+        self.total_in = 0
+        self.total_out = 0
+        self.cpu = 0.0
+
+    def _compress(self, body: bytes, final: bool) -> bytes:
+        t0 = time.thread_time()
+        out = self.encoder.compress(body)
+        # Sync-flush streamed parts so clients can decode each one as it
+        # arrives (e.g. NDJSON from /upload-data?stream=true)
+        out += self.encoder.flush() if final else self.encoder.flush(zlib.Z_SYNC_FLUSH)
+        self.cpu += time.thread_time() - t0
+        self.total_in += len(body)
+        self.total_out += len(out)
+        if final:
+            _add(
+                responses_encoded=1,
+                response_bytes_uncompressed=self.total_in,
+                response_bytes_compressed=self.total_out,
+                response_cpu_ms=self.cpu * 1e3,
+            )
+        return out
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if "content-encoding" in headers or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            wbits = 16 + zlib.MAX_WBITS if self.encoding == "gzip" else zlib.MAX_WBITS
+            self.encoder = zlib.compressobj(self.level, zlib.DEFLATED, wbits)
+            out = self._compress(body, final=not more_body)
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(out))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": out, "more_body": more_body})
+            return
+
+        out = self._compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        paths=COMPRESSION_PATHS,
+        level: int = COMPRESSION_LEVEL,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        max_decompressed: int = MAX_DECOMPRESSED_BYTES,
+    ):
+        self.app = app
+        self.paths = tuple(paths)
+        self.level = level
+        self.minimum_size = minimum_size
+        self.max_decompressed = max_decompressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding in ("gzip", "deflate"):
+            scope = dict(scope)
+            # Downstream sees a plain body of unknown length
+            scope["headers"] = [
+                (k, v) for k, v in scope["headers"]
+                if k not in (b"content-encoding", b"content-length")
+            ]
+            receive = _DecompressingReceive(receive, content_encoding, self.max_decompressed)
+        elif content_encoding != "identity":
+            await send({
+                "type": "http.response.start",
+                "status": 415,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            })
+            await send({"type": "http.response.body", "body": b"Unsupported Content-Encoding"})
+            return
+
+        accept = _negotiate(headers.get("accept-encoding", ""))
+        if accept is not None and self.level > 0:
+            send = _CompressingSend(send, accept, self.level, self.minimum_size)
+
+        await self.app(scope, receive, send)
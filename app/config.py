@@ -0,0 +1,171 @@
+import os
+
+
+# -------------------------------------------------
+# ENV HELPERS
+# -------------------------------------------------
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# -------------------------------------------------
+# INFERENCE PARALLELISM
+# -------------------------------------------------
+# Total threads the serving layer may spend on forest inference, shared by
+# every request in the process (defaults to all cores).
+CPU_BUDGET = max(1, _env_int("POWERGRID_CPU_BUDGET", os.cpu_count() or 1))
+
+# Batches smaller than this are predicted inline on the request thread.
+# Tune with `python -m scripts.bench_inference`.
+PARALLEL_MIN_ROWS = _env_int("POWERGRID_PARALLEL_MIN_ROWS", 5000)
+
+
+# -------------------------------------------------
+# EARLY-EXIT REGRESSION
+# -------------------------------------------------
+# Stop adding trees once z * standard error of the running mean <= tolerance.
+EARLY_EXIT_TOLERANCE = _env_float("POWERGRID_EARLY_EXIT_TOLERANCE", 0.05)  # kW
+EARLY_EXIT_Z = _env_float("POWERGRID_EARLY_EXIT_Z", 2.0)
+EARLY_EXIT_MIN_TREES = _env_int("POWERGRID_EARLY_EXIT_MIN_TREES", 5)
+
+
+# -------------------------------------------------
+# DEADLINE CASCADE
+# -------------------------------------------------
+# Share of the forest (first k trees) used by the "truncated" tier.
+CASCADE_TRUNCATED_FRACTION = _env_float("POWERGRID_CASCADE_TRUNCATED_FRACTION", 0.25)
+# A better tier skipped for this long is re-timed in the background, so one
+# slow sample (e.g. a GC pause) cannot keep it out of use for good.
+CASCADE_REPROBE_SECONDS = _env_float("POWERGRID_CASCADE_REPROBE_SECONDS", 5.0)
+
+
+# -------------------------------------------------
+# UPLOAD RESULT CACHE
+# -------------------------------------------------
+RESULT_CACHE_DIR = os.environ.get("POWERGRID_RESULT_CACHE_DIR", "data/cache")
+# Total size of cached payloads on disk; 0 disables caching.
+RESULT_CACHE_MAX_BYTES = _env_int("POWERGRID_RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+
+# -------------------------------------------------
+# BULK UPLOADS / COMPRESSION
+# -------------------------------------------------
+# Rows per chunk when parsing uploaded CSVs.
+UPLOAD_CHUNK_ROWS = _env_int("POWERGRID_UPLOAD_CHUNK_ROWS", 50000)
+
+# Routes that accept gzip/deflate request bodies and compress responses.
+COMPRESSION_PATHS = tuple(
+    p.strip() for p in
+    os.environ.get("POWERGRID_COMPRESSION_PATHS", "/upload-data,/predict-demand/batch").split(",")
+    if p.strip()
+)
+# zlib level 1-9 for responses; 0 disables response compression.
+COMPRESSION_LEVEL = _env_int("POWERGRID_COMPRESSION_LEVEL", 6)
+# Smaller responses are sent uncompressed.
+COMPRESSION_MIN_SIZE = _env_int("POWERGRID_COMPRESSION_MIN_SIZE", 1024)
+# Guard against decompression bombs.
+MAX_DECOMPRESSED_BYTES = _env_int("POWERGRID_MAX_DECOMPRESSED_BYTES", 1024 * 1024 * 1024)
+
+
+# -------------------------------------------------
+# SHADOW EVALUATION
+# -------------------------------------------------
+# Candidate models written by `prefect/flow.py --candidate`.
+CANDIDATE_MODELS_DIR = os.environ.get("POWERGRID_CANDIDATE_MODELS_DIR", "models/candidate")
+SHADOW_QUEUE_SIZE = _env_int("POWERGRID_SHADOW_QUEUE_SIZE", 10000)
+SHADOW_BATCH_SIZE = _env_int("POWERGRID_SHADOW_BATCH_SIZE", 256)
+SHADOW_FLUSH_SECONDS = _env_float("POWERGRID_SHADOW_FLUSH_SECONDS", 1.0)
+
+
+# -------------------------------------------------
+# LOAD-SHEDDING RISK MODE
+# -------------------------------------------------
+# "classifier": the RandomForestClassifier answers /peak-hour.
+# "derived": regression prediction > the threshold stored by
+#            train_classification (models/classifier.json).
+# "rules":   voltage-band rule first, classifier only near the cutoffs
+#            (see RULE-FIRST RISK CASCADE below).
+RISK_MODE = os.environ.get("POWERGRID_RISK_MODE", "classifier").strip().lower()
+# Re-check derived answers against the classifier off the request path
+# (0 disables, and derived mode then does not load the classifier at all).
+RISK_AUDIT = _env_int("POWERGRID_RISK_AUDIT", 1) != 0
+
+
+# -------------------------------------------------
+# RULE-FIRST RISK CASCADE
+# -------------------------------------------------
+# Voltage bands used by refine_models.py (and the frontend explainer):
+#   < 228 V high risk (2), 228-236 V moderate (1), > 236 V low (0).
+# Rows at least RULE_MARGIN volts inside a band are answered by the rule;
+# rows near a cutoff go to the classifier.
+RULE_HIGH_RISK_BELOW = _env_float("POWERGRID_RULE_HIGH_RISK_BELOW", 228.0)
+RULE_LOW_RISK_ABOVE = _env_float("POWERGRID_RULE_LOW_RISK_ABOVE", 236.0)
+RULE_MARGIN = _env_float("POWERGRID_RULE_MARGIN", 1.0)
+
+
+# -------------------------------------------------
+# PRIORITY LANES
+# -------------------------------------------------
+# Inference runs on SCHEDULER_WORKERS threads fed by two lanes. Under
+# contention the lanes share the threads in proportion to their weights
+# (interactive single-row requests vs bulk upload/batch chunks).
+SCHEDULER_WORKERS = max(1, _env_int("POWERGRID_SCHEDULER_WORKERS", CPU_BUDGET))
+LANE_INTERACTIVE_WEIGHT = max(1, _env_int("POWERGRID_LANE_INTERACTIVE_WEIGHT", 16))
+LANE_BULK_WEIGHT = max(1, _env_int("POWERGRID_LANE_BULK_WEIGHT", 1))
+# Bulk work never holds every thread, so an interactive request can start
+# as soon as it arrives (with one worker, an extra interactive-only thread
+# is started).
+LANE_BULK_MAX_RUNNING = max(1, _env_int("POWERGRID_LANE_BULK_MAX_RUNNING", max(1, SCHEDULER_WORKERS - 1)))
+# Bulk batches are split into slices of this many rows; the scheduler can
+# run interactive work between any two slices.
+LANE_BULK_SLICE_ROWS = max(1, _env_int("POWERGRID_LANE_BULK_SLICE_ROWS", PARALLEL_MIN_ROWS))
+
+
+# -------------------------------------------------
+# WORKER AUTOSCALING (python -m app.supervisor)
+# -------------------------------------------------
+SUPERVISOR_MIN_WORKERS = max(1, _env_int("POWERGRID_MIN_WORKERS", 1))
+SUPERVISOR_MAX_WORKERS = max(SUPERVISOR_MIN_WORKERS, _env_int("POWERGRID_MAX_WORKERS", os.cpu_count() or 1))
+SUPERVISOR_INTERVAL_SECONDS = _env_float("POWERGRID_SCALE_INTERVAL_SECONDS", 2.0)
+# Scale up when ANY signal is above its upper bound for SCALE_UP_TICKS
+# consecutive intervals; scale down only when ALL are below their lower
+# bounds for SCALE_DOWN_TICKS intervals. The gap between the bounds and
+# the longer down window are the hysteresis.
+SCALE_UP_QUEUE_PER_WORKER = _env_float("POWERGRID_SCALE_UP_QUEUE", 4.0)
+SCALE_DOWN_QUEUE_PER_WORKER = _env_float("POWERGRID_SCALE_DOWN_QUEUE", 0.5)
+SCALE_UP_CPU = _env_float("POWERGRID_SCALE_UP_CPU", 0.75)        # per-worker CPU share
+SCALE_DOWN_CPU = _env_float("POWERGRID_SCALE_DOWN_CPU", 0.25)
+SCALE_UP_P95_MS = _env_float("POWERGRID_SCALE_UP_P95_MS", 200.0)
+SCALE_DOWN_P95_MS = _env_float("POWERGRID_SCALE_DOWN_P95_MS", 50.0)
+SCALE_UP_TICKS = max(1, _env_int("POWERGRID_SCALE_UP_TICKS", 2))
+SCALE_DOWN_TICKS = max(1, _env_int("POWERGRID_SCALE_DOWN_TICKS", 30))
+# No further change for this long after a worker is added or removed.
+SCALE_COOLDOWN_SECONDS = _env_float("POWERGRID_SCALE_COOLDOWN_SECONDS", 10.0)
+
+
+# -------------------------------------------------
+# HISTORY STORE (/history)
+# -------------------------------------------------
+# Monthly partitions written by `python -m training.store`.
+STORE_DIR = os.environ.get("POWERGRID_STORE_DIR", "data/store")
+# A /history answer never holds more rows than this; wider ranges have to
+# ask for a coarser resolution.
+HISTORY_MAX_ROWS = _env_int("POWERGRID_HISTORY_MAX_ROWS", 200000)
+
+
+# -------------------------------------------------
+# ONLINE LAG FEATURES
+# -------------------------------------------------
+# Feeders whose recent hourly demand is kept for the lag-feature model
+# (least recently used ones are dropped beyond this; ~2.7 KB each).
+LAG_MAX_FEEDERS = _env_int("POWERGRID_LAG_MAX_FEEDERS", 10000)
@@ -0,0 +1,174 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.config import (
+    CPU_BUDGET,
+    EARLY_EXIT_MIN_TREES,
+    EARLY_EXIT_TOLERANCE,
+    EARLY_EXIT_Z,
+    PARALLEL_MIN_ROWS,
+)
+
+
+# -------------------------------------------------
+# SHARED INFERENCE POOL (GLOBAL CPU BUDGET)
+# -------------------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=CPU_BUDGET,
+                    thread_name_prefix="inference"
+                )
+    return _pool
+
+
+# -------------------------------------------------
+# DISABLE PICKLED n_jobs=-1
+# -------------------------------------------------
+def pin_single_threaded(model):
+    # The trainers fit with n_jobs=-1 and that setting is pickled, so every
+    # predict() would fan out to a joblib pool across all cores. The serving
+    # layer decides parallelism itself (see predict below).
+    if model is not None and hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    return model
+
+
+# -------------------------------------------------
+# PREDICT (INLINE FOR SMALL BATCHES, ROW CHUNKS FOR LARGE ONES)
+# -------------------------------------------------
+def predict(model, X, method: str = "predict", min_rows: int = None, workers: int = None):
+    fn = getattr(model, method)
+    min_rows = PARALLEL_MIN_ROWS if min_rows is None else min_rows
+    workers = CPU_BUDGET if workers is None else min(workers, CPU_BUDGET)
+
+    n_rows = len(X)
+    if workers <= 1 or n_rows < min_rows:
+        return fn(X)
+
+    # Never hand a worker fewer than min_rows // 2 rows: below that the
+    # per-chunk overhead eats the gain.
+    n_chunks = int(min(workers, max(1, n_rows // max(1, min_rows // 2))))
+    if n_chunks <= 1:
+        return fn(X)
+
+    bounds = np.linspace(0, n_rows, n_chunks + 1, dtype=int)
+    if hasattr(X, "iloc"):
+        parts = [X.iloc[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+    else:
+        X = np.asarray(X)
+        parts = [X[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    # Tree traversal releases the GIL, so threads give real parallelism
+    # without copying the forest into other processes.
+    results = list(_get_pool().map(fn, parts))
+    return np.concatenate(results)
+
+
+# -------------------------------------------------
+# EARLY-EXIT TREE EVALUATION
+# -------------------------------------------------
+_early_exit_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record_trees(kind: str, trees_used, forest_size: int):
+    with _stats_lock:
+        s = _early_exit_stats.setdefault(kind, {"rows": 0, "trees": 0, "forest_size": 0})
+        s["forest_size"] = forest_size
+        s["rows"] += int(len(trees_used))
+        s["trees"] += int(np.sum(trees_used))
+
+
+def early_exit_stats():
+    with _stats_lock:
+        return {
+            kind: {
+                "rows": s["rows"],
+                "avg_trees_evaluated": s["trees"] / s["rows"] if s["rows"] else 0.0,
+                "forest_size": s["forest_size"],
+            }
+            for kind, s in _early_exit_stats.items()
+        }
+
+
+def classify_early_exit(clf, X):
+    # RandomForestClassifier.predict is a soft vote: argmax of the summed
+    # per-tree class probabilities. Each remaining tree can add at most 1.0
+    # to any class, so once the leader is ahead of the runner-up by more than
+    # the number of trees left, the label can no longer change. Rows are
+    # retired as soon as that happens; the labels equal full evaluation.
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    trees = clf.estimators_
+    n_trees = len(trees)
+    votes = np.zeros((X.shape[0], clf.n_classes_))
+    used = np.zeros(X.shape[0], dtype=np.int64)
+
+    active = np.arange(X.shape[0])
+    for i, tree in enumerate(trees):
+        votes[active] += tree.predict_proba(X[active], check_input=False)
+        used[active] += 1
+
+        remaining = n_trees - i - 1
+        if remaining == 0 or clf.n_classes_ < 2:
+            break
+        top2 = np.partition(votes[active], -2, axis=1)
+        decided = (top2[:, -1] - top2[:, -2]) > remaining
+        active = active[~decided]
+        if active.size == 0:
+            break
+
+    _record_trees("classifier", used, n_trees)
+    return clf.classes_.take(np.argmax(votes, axis=1)), used
+
+
+def regress_early_exit(model, X, tolerance: float = None, z: float = None, min_trees: int = None):
+    # The forest mean is the average over a finite population of trees, so
+    # after k trees the standard error of the running mean is
+    #   s / sqrt(k) * sqrt((N - k) / (N - 1))
+    # A row stops once z * SE <= tolerance (in kW). Unlike the classifier this
+    # is an approximation bounded by the tolerance, not an exact answer.
+    tolerance = EARLY_EXIT_TOLERANCE if tolerance is None else tolerance
+    z = EARLY_EXIT_Z if z is None else z
+    min_trees = EARLY_EXIT_MIN_TREES if min_trees is None else min_trees
+
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    trees = model.estimators_
+    n_trees = len(trees)
+    n_rows = X.shape[0]
+    mean = np.zeros(n_rows)
+    m2 = np.zeros(n_rows)
+    used = np.zeros(n_rows, dtype=np.int64)
+
+    active = np.arange(n_rows)
+    for i, tree in enumerate(trees):
+        k = i + 1
+        y = tree.predict(X[active], check_input=False)
+        if y.ndim > 1:
+            y = y[:, 0]
+        # Welford update of the running mean / variance
+        delta = y - mean[active]
+        mean[active] += delta / k
+        m2[active] += delta * (y - mean[active])
+        used[active] = k
+
+        if k == n_trees:
+            break
+        if k >= max(2, min_trees):
+            std = np.sqrt(m2[active] / (k - 1))
+            se = std / np.sqrt(k) * np.sqrt((n_trees - k) / (n_trees - 1))
+            active = active[z * se > tolerance]
+            if active.size == 0:
+                break
+
+    _record_trees("regression", used, n_trees)
+    return mean, used
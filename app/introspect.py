@@ -0,0 +1,250 @@
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+# -------------------------------------------------
+# RUNTIME MEMORY / MODEL FOOTPRINT INTROSPECTION
+# -------------------------------------------------
+# Backs the /admin/memory* endpoints: what the loaded models hold, how big
+# the process is, what the garbage collector is doing and, on demand, which
+# source lines own the Python-level allocations (tracemalloc). Everything
+# here is read-only except tracemalloc start/stop.
+
+
+# -------------------------------------------------
+# MODEL LOAD DURATIONS (RECORDED BY utils.load_models)
+# -------------------------------------------------
+_loads = {}
+_loads_lock = threading.Lock()
+
+
+def record_load(name: str, seconds: float, file_bytes: int = None):
+    with _loads_lock:
+        _loads[name] = {
+            "seconds": round(seconds, 4),
+            "file_bytes": file_bytes,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+
+def load_durations():
+    with _loads_lock:
+        return {k: dict(v) for k, v in _loads.items()}
+
+
+# -------------------------------------------------
+# MODEL FOOTPRINT
+# -------------------------------------------------
+def _tree_bytes(tree) -> int:
+    # Node table + per-node values: the arrays a fitted tree keeps alive
+    state = tree.__getstate__()
+    return int(state["nodes"].nbytes + state["values"].nbytes)
+
+
+def _array_bytes(obj, seen=None, depth: int = 0) -> int:
+    # Sum of numpy buffers reachable through attributes / containers. Used
+    # for models without a tree structure (statsmodels SARIMAX results keep
+    # their data, filter output and smoothed states as plain arrays).
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or depth > 8:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # Views share their base's memory: count it once
+        base = obj.base if isinstance(obj.base, np.ndarray) else None
+        if base is not None:
+            return _array_bytes(base, seen, depth + 1)
+        return int(obj.nbytes)
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):
+        return int(obj.memory_usage(index=True, deep=False).sum())
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return 0
+    if isinstance(obj, dict):
+        return sum(_array_bytes(v, seen, depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(_array_bytes(v, seen, depth + 1) for v in obj)
+    if hasattr(obj, "__dict__"):
+        return _array_bytes(vars(obj), seen, depth + 1)
+    return 0
+
+
+def model_footprint(model):
+    if model is None:
+        return None
+    if isinstance(model, (int, float)):
+        return {"type": type(model).__name__, "bytes": 0}
+
+    info = {"type": type(model).__name__}
+    estimators = getattr(model, "estimators_", None)
+    if estimators is not None and all(hasattr(e, "tree_") for e in estimators):
+        trees = [e.tree_ for e in estimators]
+        info["trees"] = len(trees)
+        info["nodes"] = int(sum(t.node_count for t in trees))
+        info["max_depth"] = int(max((t.max_depth for t in trees), default=0))
+        info["bytes"] = int(sum(_tree_bytes(t) for t in trees))
+    elif hasattr(model, "tree_"):
+        info["trees"] = 1
+        info["nodes"] = int(model.tree_.node_count)
+        info["bytes"] = _tree_bytes(model.tree_)
+    else:
+        info["bytes"] = _array_bytes(model)
+    info["mib"] = round(info["bytes"] / 2 ** 20, 3)
+    return info
+
+
+# -------------------------------------------------
+# PROCESS MEMORY
+# -------------------------------------------------
+def process_memory():
+    out = {"pid": os.getpid()}
+    try:
+        # Linux: current and peak resident set size
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM", "VmSize", "RssAnon", "RssFile"):
+                    out[key] = int(value.split()[0]) * 1024
+        out["rss_bytes"] = out.get("VmRSS")
+        out["peak_rss_bytes"] = out.get("VmHWM")
+    except OSError:
+        try:
+            import resource
+            # ru_maxrss is KiB on Linux, bytes on macOS; only the peak is known
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            out["peak_rss_bytes"] = peak if os.uname().sysname == "Darwin" else peak * 1024
+            out["rss_bytes"] = None
+        except ImportError:
+            out["rss_bytes"] = None
+    return out
+
+
+def live_frames():
+    # pandas DataFrames still referenced anywhere (e.g. upload chunks)
+    import pandas as pd
+
+    frames = [o for o in gc.get_objects() if isinstance(o, pd.DataFrame)]
+    return {
+        "count": len(frames),
+        "bytes": int(sum(f.memory_usage(index=True, deep=False).sum() for f in frames)),
+    }
+
+
+# -------------------------------------------------
+# GC PAUSES (gc.callbacks)
+# -------------------------------------------------
+_gc_lock = threading.Lock()
+_gc = {
+    gen: {"collections": 0, "collected": 0, "total_ms": 0.0, "max_ms": 0.0, "recent_ms": deque(maxlen=500)}
+    for gen in range(3)
+}
+_gc_start = {}
+
+
+def _gc_callback(phase, info):
+    # Runs on whichever thread triggered the collection
+    tid = threading.get_ident()
+    if phase == "start":
+        _gc_start[tid] = time.perf_counter()
+        return
+    t0 = _gc_start.pop(tid, None)
+    if t0 is None:
+        return
+    ms = (time.perf_counter() - t0) * 1e3
+    with _gc_lock:
+        s = _gc[info["generation"]]
+        s["collections"] += 1
+        s["collected"] += info.get("collected", 0)
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+        s["recent_ms"].append(ms)
+
+
+def install_gc_hooks():
+    if _gc_callback not in gc.callbacks:
+        gc.callbacks.append(_gc_callback)
+
+
+def gc_stats():
+    with _gc_lock:
+        pauses = {
+            f"gen{gen}": {
+                "collections": s["collections"],
+                "collected": s["collected"],
+                "total_ms": round(s["total_ms"], 3),
+                "max_ms": round(s["max_ms"], 3),
+                "p95_ms": float(np.percentile(s["recent_ms"], 95)) if s["recent_ms"] else None,
+            }
+            for gen, s in _gc.items()
+        }
+    return {
+        "enabled": gc.isenabled(),
+        "counts": gc.get_count(),
+        "thresholds": gc.get_threshold(),
+        "stats": gc.get_stats(),
+        "pauses": pauses,
+    }
+
+
+# -------------------------------------------------
+# TRACEMALLOC (ON DEMAND)
+# -------------------------------------------------
+_baseline = None
+
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+
+
+def tracemalloc_control(action: str, limit: int = 20, frames: int = 1):
+    # start: begin tracing (has a CPU/memory cost while on)
+    # snapshot: top allocating lines, plus growth since the previous snapshot
+    # stop: stop tracing and drop the baseline
+    global _baseline
+    if action == "start":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _baseline = _take_snapshot()
+        return {"tracing": True}
+
+    if action == "stop":
+        tracemalloc.stop()
+        _baseline = None
+        return {"tracing": False}
+
+    if action != "snapshot":
+        raise ValueError(f"Unknown tracemalloc action: {action}")
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "detail": "call with action=start first"}
+
+    snap = _take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+
+    def fmt(stat):
+        frame = stat.traceback[0]
+        return {
+            "location": f"{frame.filename}:{frame.lineno}",
+            "bytes": stat.size,
+            "count": stat.count,
+            **({"bytes_diff": stat.size_diff, "count_diff": stat.count_diff} if hasattr(stat, "size_diff") else {}),
+        }
+
+    out = {
+        "tracing": True,
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "top": [fmt(s) for s in snap.statistics("lineno")[:limit]],
+    }
+    if _baseline is not None:
+        out["growth"] = [fmt(s) for s in snap.compare_to(_baseline, "lineno")[:limit]]
+    _baseline = snap
+    return out
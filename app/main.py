@@ -1,84 +1,427 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from typing import List
+import gzip
+import itertools
+import json
+import time
+
+from fastapi import FastAPI, File, Header, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import numpy as np
 import pandas as pd
-from io import StringIO
 
 # Your local imports
-from app.schemas import DemandRequest, PeakRequest
-from app.utils import load_models
+from app.schemas import DemandBatchRequest, DemandRequest, ObservationBatch, PeakRequest
+from app.utils import FEATURES, load_models, model_version, read_feature_chunks
+from app.compression import CompressionMiddleware, compression_stats
+from app.config import (
+    CANDIDATE_MODELS_DIR,
+    HISTORY_MAX_ROWS,
+    LAG_MAX_FEEDERS,
+    RISK_AUDIT,
+    RISK_MODE,
+    STORE_DIR,
+    UPLOAD_CHUNK_ROWS,
+)
+from app.aggregate import DemandSummary
+from app.result_cache import ResultCache
+from app.rules import classify_with_rules, rule_stats, supports_rules
+from app.shadow import ShadowEvaluator
+from app.scheduler import get_scheduler
+from app.introspect import (
+    gc_stats,
+    install_gc_hooks,
+    live_frames,
+    load_durations,
+    model_footprint,
+    process_memory,
+    tracemalloc_control,
+)
+from app.cascade import cascade_stats, get_cascade
+from app.inference import (
+    classify_early_exit,
+    early_exit_stats,
+    predict,
+    regress_early_exit,
+)
+from training.features import LagStateStore, feature_matrix, single_row
+from training.store import TimeSeriesStore
 
 app = FastAPI(title="Electricity Demand Prediction")
+app.add_middleware(CompressionMiddleware)
+install_gc_hooks()
 
 
 _models = None
+_model_version = None
+_result_cache = ResultCache()
+_shadow = ShadowEvaluator({})
+_risk_audit = ShadowEvaluator({})
+_store = TimeSeriesStore(STORE_DIR)
+_lag_state = LagStateStore(LAG_MAX_FEEDERS)
+
+
+def _load():
+    models = load_models()
+    if RISK_MODE == "derived" and not RISK_AUDIT:
+        # Nothing will call the classifier: don't keep it in memory
+        models.pop("classifier", None)
+    # Build the deadline cascades now so the first request carrying
+    # X-Deadline-Ms does not pay for the surrogate table.
+    for kind in ("regression", "classifier"):
+        if kind in models:
+            get_cascade(models[kind], kind)
+    return models, model_version()
+
+
+def _start_shadow():
+    # Candidates from a retrain (models/candidate/) are scored off the
+    # request path against live traffic
+    global _shadow, _risk_audit
+    _shadow.stop()
+    # The served models recompute the full answer for rows that were
+    # answered by an approximation (see _served_exactly)
+    _shadow = ShadowEvaluator(load_models(CANDIDATE_MODELS_DIR), served_models=_models)
+
+    # Derived-mode and rule-answered risk labels are re-checked against the
+    # classifier the same way, which measures how often the methods disagree
+    _risk_audit.stop()
+    audit = {}
+    if RISK_AUDIT and _models.get("classifier") is not None:
+        audit["derived"] = _models["classifier"]
+        audit["rules"] = _models["classifier"]
+    _risk_audit = ShadowEvaluator(audit)
+
+
+def load_serving_models():
+    # Models (and cascades) only, no background threads: the supervisor
+    # calls this before fork(), and each worker starts its own evaluators
+    global _models, _model_version
+    if _models is None:
+        _models, _model_version = _load()
+    return _models
+
 
 def get_models():
-    global _models
     if _models is None:
-        _models = load_models()   # models load ONLY on first request
+        load_serving_models()   # models load ONLY on first request
+        _start_shadow()
     return _models
 
 
+def get_model_version():
+    get_models()
+    return _model_version
+
+
+# -----------------------------
+# HOT-SWAP MODELS
+# -----------------------------
+@app.post("/admin/reload-models")
+def reload_models():
+    global _models, _model_version
+    models, version = _load()
+    previous = _model_version
+    _models, _model_version = models, version
+    # Cached upload results belong to the previous models
+    _result_cache.clear()
+    _start_shadow()
+    return {
+        "previous_version": previous,
+        "model_version": version,
+        "loaded": sorted(models),
+        "shadow_candidates": sorted(_shadow.candidates)
+    }
+
+
+# -----------------------------
+# SINGLE-ROW INFERENCE PATHS
+# -----------------------------
+# A deadline (X-Deadline-Ms) takes precedence over early exit; both report
+# how the answer was produced next to the prediction. The deadline is fixed
+# when the handler starts, so the cascade only gets what is left of it
+# after any wait for a scheduler worker.
+def _deadline_at(deadline_ms: Optional[float]) -> Optional[float]:
+    return None if deadline_ms is None else time.perf_counter() + deadline_ms / 1e3
+
+
+def _budget_left(deadline_at: float) -> float:
+    return max(0.0, (deadline_at - time.perf_counter()) * 1e3)
+
+
+def _run_regression(model, X, early_exit: bool, deadline_at: Optional[float]):
+    if deadline_at is not None:
+        budget = _budget_left(deadline_at)
+        y, tier = get_cascade(model, "regression").predict(X, budget)
+        return float(y[0]), {"tier": tier, "budget_left_ms": round(budget, 3)}
+    if early_exit:
+        y, used = regress_early_exit(model, X)
+        return float(y[0]), {"trees_evaluated": int(used[0])}
+    return float(predict(model, X)[0]), {}
+
+
+def _served_exactly(kind: str, info: dict) -> bool:
+    # Whether the answer is the full model's: cascade tiers below "full"
+    # and early-exit regression (a mean over some of the trees) are not.
+    # Early-exit classification stops only once the vote is decided.
+    if info.get("tier", "full") != "full":
+        return False
+    return kind == "classifier" or "trees_evaluated" not in info
+
+
+def _run_classifier(clf, X, early_exit: bool, deadline_at: Optional[float]):
+    if deadline_at is not None:
+        budget = _budget_left(deadline_at)
+        y, tier = get_cascade(clf, "classifier").predict(X, budget)
+        return y[0], {"tier": tier, "budget_left_ms": round(budget, 3)}
+    if early_exit:
+        y, used = classify_early_exit(clf, X)
+        return y[0], {"trees_evaluated": int(used[0])}
+    return predict(clf, X)[0], {}
+
+
+def _run_rules(clf, X, early_exit: bool, deadline_at: Optional[float]):
+    # A row near a band cutoff reaches the classifier the same way as in
+    # classifier mode (early exit, deadline cascade)
+    info = {}
+
+    def classify(clf, rows):
+        y, info_ = _run_classifier(clf, rows, early_exit, deadline_at)
+        info.update(info_)
+        return [y]
+
+    y, decided = classify_with_rules(clf, X, classify=classify)
+    return y[0], bool(decided[0]), info
+
+
 # -----------------------------
 # PREDICT ELECTRICITY DEMAND
 # -----------------------------
 @app.post("/predict-demand")
-def predict_demand(req: DemandRequest):
+def predict_demand(
+    req: DemandRequest,
+    early_exit: bool = False,
+    x_deadline_ms: Optional[float] = Header(None)
+):
+    deadline_at = _deadline_at(x_deadline_ms)
     models = get_models()
     model = models.get("regression")
 
     if model is None:
         raise HTTPException(status_code=500, detail="Regression model not loaded")
 
-    X = [[
-        req.hour,
-        req.temperature,
-        req.voltage,
-        req.dayofweek
-    ]]
+    row = (req.hour, req.temperature, req.voltage, req.dayofweek)
+    lag_info = {}
+
+    if req.feeder is not None:
+        # Lag-feature model: the feeder's recent demand comes from its ring
+        # buffer (fed by /observe), never from a history query
+        lag_model = models.get("regression_lag")
+        if req.datetime is None:
+            raise HTTPException(status_code=400, detail="feeder requires datetime (the hour to predict)")
+        try:
+            lags = _lag_state.features(req.feeder, req.datetime)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Bad datetime: {e}")
+        if lag_model is None:
+            reason = "no lag model loaded"
+        elif not np.isfinite(lags).all():
+            reason = "incomplete feeder history"
+        elif deadline_at is not None:
+            # The deadline cascade is built for the base features only
+            reason = "X-Deadline-Ms set: the deadline cascade uses the base model"
+        else:
+            lag_row = (*row, *lags)
+            prediction, info = get_scheduler().run(
+                "interactive", _run_regression, lag_model, single_row(*lag_row), early_exit, None
+            )
+            _shadow.submit("regression_lag", lag_row, prediction, _served_exactly("regression", info))
+            return {
+                "predicted_demand": prediction,
+                "lag_features": True,
+                **info
+            }
+        lag_info = {"lag_features": False, "lag_reason": reason}
+
+    X = single_row(*row)
 
-    prediction = model.predict(X)[0]
+    prediction, info = get_scheduler().run(
+        "interactive", _run_regression, model, X, early_exit, deadline_at
+    )
+    _shadow.submit("regression", row, prediction, _served_exactly("regression", info))
 
     return {
-        "predicted_demand": float(prediction)
+        "predicted_demand": prediction,
+        **lag_info,
+        **info
+    }
+
+
+# -----------------------------
+# FEEDER OBSERVATIONS (ONLINE LAG STATE)
+# -----------------------------
+@app.post("/observe")
+def observe(req: ObservationBatch):
+    # Hourly mean demand per feeder, as it is metered
+    for obs in req.observations:
+        try:
+            _lag_state.observe(obs.feeder, obs.datetime, obs.demand)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Bad datetime {obs.datetime!r}: {e}")
+    return {"recorded": len(req.observations)}
+
+
+@app.get("/admin/lag-state")
+def lag_state_stats():
+    return _lag_state.stats()
+
+
+# -----------------------------
+# BATCH DEMAND PREDICTION (JSON)
+# -----------------------------
+@app.post("/predict-demand/batch")
+def predict_demand_many(req: DemandBatchRequest):
+    models = get_models()
+    model = models.get("regression")
+
+    if model is None:
+        raise HTTPException(status_code=500, detail="Regression model not loaded")
+
+    if not req.rows:
+        return {"predictions": []}
+    X = feature_matrix(
+        hour=[r.hour for r in req.rows],
+        temperature=[r.temperature for r in req.rows],
+        voltage=[r.voltage for r in req.rows],
+        dayofweek=[r.dayofweek for r in req.rows]
+    )
+
+    return {
+        "predictions": get_scheduler().predict("bulk", model, X).tolist()
     }
 
 
 # -----------------------------
 # PEAK HOUR / LOAD SHEDDING RISK
 # -----------------------------
+RISK_LABELS = {
+    0: "Normal / Low Risk",
+    1: "High Load Shedding Risk"
+}
+
+# Voltage-band classifier from refine_models.py
+RISK_LABELS_3 = {
+    0: "Low Risk",
+    1: "Moderate Risk",
+    2: "High Load Shedding Risk"
+}
+
+
+def _risk_labels(clf):
+    return RISK_LABELS_3 if len(getattr(clf, "classes_", [])) == 3 else RISK_LABELS
+
+
 @app.post("/peak-hour")
-def peak_hour(req: PeakRequest):
+def peak_hour(
+    req: PeakRequest,
+    early_exit: bool = False,
+    mode: Optional[str] = None,
+    x_deadline_ms: Optional[float] = Header(None)
+):
+    deadline_at = _deadline_at(x_deadline_ms)
     models = get_models()
+    mode = (mode or RISK_MODE).lower()
+
+    row = (req.hour, req.temperature, req.voltage, req.dayofweek)
+    X = single_row(*row)
+
+    if mode == "derived":
+        # train_classification labels high risk as demand > stored threshold,
+        # so the regressor alone answers; the classifier is only consulted
+        # off the request path to measure disagreement.
+        model = models.get("regression")
+        threshold = models.get("risk_threshold")
+        if model is None or threshold is None:
+            raise HTTPException(
+                status_code=500,
+                detail="Derived risk needs the regression model and a stored risk threshold"
+            )
+
+        demand, info = get_scheduler().run(
+            "interactive", _run_regression, model, X, early_exit, deadline_at
+        )
+        y = int(demand > threshold)
+        _shadow.submit("regression", row, demand, _served_exactly("regression", info))
+        _risk_audit.submit("derived", row, y)
+
+        return {
+            "risk": RISK_LABELS[y],
+            "mode": "derived",
+            "predicted_demand": demand,
+            **info
+        }
+
+    if mode not in ("classifier", "rules"):
+        raise HTTPException(status_code=400, detail=f"Unknown risk mode: {mode}")
+
     clf = models.get("classifier")
 
     if clf is None:
         raise HTTPException(status_code=500, detail="Classifier not loaded")
 
-    X = [[
-        req.hour,
-        req.temperature,
-        req.voltage,
-        req.dayofweek
-    ]]
+    labels = _risk_labels(clf)
 
-    y = clf.predict(X)[0]
+    if mode == "rules":
+        if not supports_rules(clf):
+            raise HTTPException(
+                status_code=400,
+                detail="Rule cascade needs the 3-level voltage-band classifier (refine_models.py)"
+            )
+        # Clear-cut voltages are answered by the band rule; only rows near a
+        # cutoff reach the forest
+        y, decided, info = get_scheduler().run(
+            "interactive", _run_rules, clf, X, early_exit, deadline_at
+        )
+        if decided:
+            _risk_audit.submit("rules", row, y)
+        # Rule answers are not the classifier's: the shadow recomputes those
+        _shadow.submit("classifier", row, y, not decided and _served_exactly("classifier", info))
+        return {
+            "risk": labels.get(int(y), "Unknown"),
+            "mode": "rules",
+            "answered_by": "rule" if decided else "classifier",
+            **info
+        }
 
-    labels = {
-        0: "Normal / Low Risk",
-        1: "High Load Shedding Risk"
-    }
+    y, info = get_scheduler().run(
+        "interactive", _run_classifier, clf, X, early_exit, deadline_at
+    )
+    _shadow.submit("classifier", row, y, _served_exactly("classifier", info))
 
     return {
-        "risk": labels.get(int(y), "Unknown")
+        "risk": labels.get(int(y), "Unknown"),
+        **info
     }
 
 
 # -----------------------------
 # BULK CSV PREDICTION
 # -----------------------------
+def _ndjson_predictions(model, chunks, cache_key: str):
+    predictions = []
+    for chunk in chunks:
+        y = get_scheduler().predict("bulk", model, chunk[FEATURES]).tolist()
+        predictions.extend(y)
+        yield json.dumps({"predictions": y}) + "\n"
+    _result_cache.put(cache_key, {"predictions": predictions})
+
+
 @app.post("/upload-data")
-async def upload_data(file: UploadFile = File(...)):
+async def upload_data(
+    file: UploadFile = File(...),
+    aggregate: bool = False,
+    threshold: Optional[float] = None,
+    stream: bool = False
+):
     models = get_models()
     model = models.get("regression")
 
@@ -86,35 +429,194 @@ async def upload_data(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="Regression model not loaded")
 
     try:
-        # Read uploaded CSV
-        contents = await file.read()
-        csv_text = contents.decode("utf-8")
-
-        df = pd.read_csv(StringIO(csv_text))
+        # The upload is already spooled by the multipart parser (inflated
+        # on the way in by CompressionMiddleware); hash it in blocks.
+        raw = file.file
 
-        # Normalize column names
-        df.columns = df.columns.str.strip().str.lower()
+        # Repeat uploads are answered from the result cache
+        namespace = f"upload-data:aggregate:{threshold}" if aggregate else "upload-data"
+        cache_key = ResultCache.key(namespace, get_model_version(), raw)
+        cached = _result_cache.get(cache_key)
+        if cached is not None and not stream:
+            return cached
 
-        required_cols = ["hour", "temperature", "voltage", "dayofweek"]
-        missing = [c for c in required_cols if c not in df.columns]
+        # Field gateways may also send the CSV itself gzipped
+        if (file.filename or "").lower().endswith(".gz"):
+            raw = gzip.GzipFile(fileobj=raw, mode="rb")
 
-        if missing:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {missing}"
-            )
+        if stream and not aggregate:
+            # NDJSON, one {"predictions": [...]} line per parsed chunk. The
+            # first chunk is parsed here so bad uploads still get a 400.
+            if cached is not None:
+                lines = iter([json.dumps(cached) + "\n"])
+            else:
+                chunks = read_feature_chunks(raw, UPLOAD_CHUNK_ROWS)
+                first = next(chunks, None)
+                chunks = itertools.chain([first] if first is not None else [], chunks)
+                lines = _ndjson_predictions(model, chunks, cache_key)
+            return StreamingResponse(lines, media_type="application/x-ndjson")
 
-        # Ensure correct column order
-        X = df[required_cols]
+        # Chunks go to the bulk lane, so interactive requests arriving
+        # meanwhile run between slices instead of queueing behind the file
+        lanes = get_scheduler()
 
-        predictions = model.predict(X)
+        if aggregate:
+            # Summaries only: high-risk hours come from the stored threshold
+            # when there is one, otherwise from the classifier
+            risk_threshold = models.get("risk_threshold")
+            clf = models.get("classifier") if risk_threshold is None else None
+            summary = DemandSummary(
+                threshold=threshold,
+                risk_threshold=risk_threshold,
+                # Same label map as /peak-hour: the highest label is high risk
+                high_risk_class=max(_risk_labels(clf)) if clf is not None else 1
+            )
+            for chunk in read_feature_chunks(raw, UPLOAD_CHUNK_ROWS):
+                X = chunk[FEATURES]
+                risk = await lanes.apredict("bulk", clf, X) if clf is not None else None
+                summary.update(chunk, await lanes.apredict("bulk", model, X), risk)
+            result = summary.result()
+        else:
+            predictions = []
+            for chunk in read_feature_chunks(raw, UPLOAD_CHUNK_ROWS):
+                # Ensure correct column order
+                y = await lanes.apredict("bulk", model, chunk[FEATURES])
+                predictions.extend(y.tolist())
 
-        return {
-            "predictions": predictions.tolist()
-        }
+            result = {
+                "predictions": predictions
+            }
+        _result_cache.put(cache_key, result)
+        return result
 
     except pd.errors.EmptyDataError:
         raise HTTPException(status_code=400, detail="Uploaded CSV is empty")
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Processing error: {str(e)}")
+
+
+# -----------------------------
+# HISTORY (PARTITIONED STORE)
+# -----------------------------
+@app.get("/history")
+def history(start: str, end: str, resolution: str = "auto"):
+    # Demand / voltage for start <= datetime < end from the monthly
+    # partitions; "auto" uses minutes for ranges up to two days
+    try:
+        t0, t1 = pd.Timestamp(start), pd.Timestamp(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Bad timestamp: {e}")
+    if t1 <= t0:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if resolution == "auto":
+        resolution = "minute" if t1 - t0 <= pd.Timedelta(days=2) else "hourly"
+    if resolution not in ("minute", "hourly"):
+        raise HTTPException(status_code=400, detail="resolution must be minute, hourly or auto")
+
+    step = pd.Timedelta(minutes=1) if resolution == "minute" else pd.Timedelta(hours=1)
+    if (t1 - t0) / step > HISTORY_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range exceeds {HISTORY_MAX_ROWS} {resolution} rows; narrow it or use a coarser resolution"
+        )
+
+    df = _store.read(resolution, t0, t1)
+    # NaN (gaps in the meter data) is not valid JSON
+    values = df[["demand", "voltage"]].astype("float64").round(6)
+    values = values.astype(object).where(values.notna(), None)
+    return {
+        "resolution": resolution,
+        "start": t0.isoformat(),
+        "end": t1.isoformat(),
+        "rows": len(df),
+        "partitions_scanned": df.attrs["partitions_scanned"],
+        "datetime": df["datetime"].dt.strftime("%Y-%m-%dT%H:%M:%S").tolist(),
+        "demand": values["demand"].tolist(),
+        "voltage": values["voltage"].tolist()
+    }
+
+
+# -----------------------------
+# ADMIN: INFERENCE STATISTICS
+# -----------------------------
+@app.get("/admin/inference-stats")
+def inference_stats():
+    return {
+        "early_exit": early_exit_stats(),
+        "cascade": cascade_stats()
+    }
+
+
+@app.get("/admin/lanes")
+def lane_stats():
+    return get_scheduler().stats()
+
+
+@app.get("/admin/shadow-stats")
+def shadow_stats():
+    return _shadow.stats()
+
+
+@app.get("/admin/risk-stats")
+def risk_stats():
+    audit = _risk_audit.stats()
+    derived = audit.get("derived", {})
+    rules = audit.get("rules", {})
+    agreement = derived.get("agreement")
+    return {
+        "mode": RISK_MODE,
+        "threshold": (_models or {}).get("risk_threshold"),
+        "derived_rows_checked": derived.get("rows", 0),
+        "disagreement_rate": None if agreement is None else 1.0 - agreement,
+        "rules": {
+            **rule_stats(),
+            "rows_checked": rules.get("rows", 0),
+            "agreement_rate": rules.get("agreement")
+        },
+        "dropped": audit["dropped"]
+    }
+
+
+# -----------------------------
+# ADMIN: MEMORY INTROSPECTION
+# -----------------------------
+@app.get("/admin/memory")
+def memory_stats(frames: bool = False):
+    # frames=true also walks the heap for live pandas DataFrames (slower)
+    models = _models or {}
+    footprints = {k: model_footprint(m) for k, m in models.items() if k != "risk_threshold"}
+    out = {
+        "process": process_memory(),
+        "models": footprints,
+        "models_total_bytes": sum(f["bytes"] for f in footprints.values() if f),
+        "model_load": load_durations(),
+        "gc": gc_stats(),
+    }
+    if frames:
+        out["pandas_frames"] = live_frames()
+    return out
+
+
+@app.post("/admin/memory/tracemalloc")
+def memory_tracemalloc(action: str = "snapshot", limit: int = 20):
+    try:
+        return tracemalloc_control(action, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/admin/compression-stats")
+def get_compression_stats():
+    return compression_stats()
+
+
+@app.get("/admin/cache-stats")
+def cache_stats():
+    return {
+        "model_version": _model_version,
+        **_result_cache.stats()
+    }
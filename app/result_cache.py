@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES
+
+# -------------------------------------------------
+# CONTENT-HASH RESULT CACHE (ON DISK, LRU, SIZE-BOUNDED)
+# -------------------------------------------------
+# Keys are sha256(namespace, model version, upload bytes), values are the
+# JSON payload that was returned for that upload. A repeated upload is served
+# from disk without parsing the CSV or running the models.
+#
+# Several processes share one directory (supervisor workers, the Streamlit
+# frontend), so the disk is the source of truth: every put() re-reads the
+# directory (sizes, and mtimes touched on every hit) before evicting least
+# recently used entries, which keeps the byte limit for the directory as a
+# whole, and clear() removes every entry on disk, not just this process'.
+
+
+class ResultCache:
+    def __init__(self, directory: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.dir = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = OrderedDict()   # key -> size in bytes, least recent first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    @staticmethod
+    def key(namespace: str, model_version: str, contents) -> str:
+        # `contents` is bytes or a seekable binary file (hashed in blocks,
+        # then rewound for the parser)
+        h = hashlib.sha256()
+        h.update(namespace.encode())
+        h.update(b"\0")
+        h.update(str(model_version).encode())
+        h.update(b"\0")
+        if hasattr(contents, "read"):
+            for block in iter(lambda: contents.read(1 << 20), b""):
+                h.update(block)
+            contents.seek(0)
+        else:
+            h.update(contents)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.json"
+
+    def _load_index(self):
+        # Rebuild recency order from file mtimes (touched on every hit);
+        # call with self._lock held (or before the cache is shared)
+        entries = []
+        if self.dir.exists():
+            for p in self.dir.glob("*.json"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue   # evicted by another process meanwhile
+                entries.append((st.st_mtime_ns, p.stem, st.st_size))
+        # Equal mtimes (coarse clocks) keep this process' recency order
+        rank = {key: i for i, key in enumerate(self._index)}
+        entries.sort(key=lambda e: (e[0], rank.get(e[1], -1)))
+        self._index.clear()
+        self._bytes = 0
+        for _, key, size in entries:
+            self._index[key] = size
+            self._bytes += size
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self._bytes -= size
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return payload
+
+    def put(self, key: str, payload):
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            # Includes what other processes wrote or evicted since
+            self._load_index()
+            if key in self._index:
+                self._index.move_to_end(key)
+            victims = []
+            while self._bytes > self.max_bytes and self._index:
+                victim, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                victims.append(victim)
+
+        for victim in victims:
+            try:
+                self._path(victim).unlink()
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            keys = list(self._index)
+            self._index.clear()
+            self._bytes = 0
+        for key in keys:
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,63 @@
+import threading
+
+import numpy as np
+
+from app.config import RULE_HIGH_RISK_BELOW, RULE_LOW_RISK_ABOVE, RULE_MARGIN
+from app.inference import predict
+
+# -------------------------------------------------
+# RULE-FIRST CASCADE FOR THE RISK CLASSIFIER
+# -------------------------------------------------
+# The 3-level classifier (refine_models.py) learns voltage bands. Rows whose
+# voltage is clearly inside a band are labelled by a vectorised comparison;
+# only rows within `margin` volts of a cutoff are sent to the forest.
+
+LOW, MODERATE, HIGH = 0, 1, 2
+VOLTAGE = 2   # column index in [hour, temperature, voltage, dayofweek]
+
+_stats = {"rows": 0, "short_circuited": 0}
+_stats_lock = threading.Lock()
+
+
+def supports_rules(clf) -> bool:
+    # Only meaningful for the voltage-band classifier (classes 0, 1, 2)
+    return clf is not None and list(getattr(clf, "classes_", [])) == [LOW, MODERATE, HIGH]
+
+
+def rule_labels(voltage, high_below: float = RULE_HIGH_RISK_BELOW,
+                low_above: float = RULE_LOW_RISK_ABOVE, margin: float = RULE_MARGIN):
+    # Returns (labels, decided); undecided rows carry label -1
+    v = np.asarray(voltage, dtype=np.float64)
+    labels = np.full(v.shape, -1, dtype=np.int64)
+    labels[v < high_below - margin] = HIGH
+    labels[(v >= high_below + margin) & (v <= low_above - margin)] = MODERATE
+    labels[v > low_above + margin] = LOW
+    return labels, labels >= 0
+
+
+def classify_with_rules(clf, X, classify=predict, **bands):
+    # classify(clf, rows) answers the undecided rows (default: the full forest)
+    X = np.asarray(X, dtype=np.float64)
+    labels, decided = rule_labels(X[:, VOLTAGE], **bands)
+    if not decided.all():
+        labels[~decided] = classify(clf, X[~decided])
+
+    with _stats_lock:
+        _stats["rows"] += len(labels)
+        _stats["short_circuited"] += int(decided.sum())
+    return labels, decided
+
+
+def rule_stats():
+    with _stats_lock:
+        rows = _stats["rows"]
+        return {
+            "rows": rows,
+            "short_circuited": _stats["short_circuited"],
+            "short_circuit_fraction": _stats["short_circuited"] / rows if rows else 0.0,
+            "bands": {
+                "high_risk_below": RULE_HIGH_RISK_BELOW,
+                "low_risk_above": RULE_LOW_RISK_ABOVE,
+                "margin": RULE_MARGIN,
+            },
+        }
@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.config import (
+    LANE_BULK_MAX_RUNNING,
+    LANE_BULK_SLICE_ROWS,
+    LANE_BULK_WEIGHT,
+    LANE_INTERACTIVE_WEIGHT,
+    SCHEDULER_WORKERS,
+)
+from app.inference import predict
+
+# -------------------------------------------------
+# PRIORITY LANES FOR INFERENCE WORK
+# -------------------------------------------------
+# Single-row dashboard requests ("interactive") and upload / batch chunks
+# ("bulk") are queued in separate lanes and executed by one set of worker
+# threads. A free worker takes the next task from the non-empty lane with
+# the lowest pass value (stride scheduling); each dispatch advances that
+# lane by 1/weight, so under contention the lanes get threads in
+# proportion to their weights. Ties go to the interactive lane, and a lane
+# that was idle does not bank credit, so a new interactive request is the
+# next thing to run ahead of every queued bulk slice.
+#
+# Bulk batches are cut into LANE_BULK_SLICE_ROWS slices, each its own task:
+# bulk work is preempted at slice boundaries, never mid-predict.
+#
+# Bulk never holds every thread: with a single worker (CPU_BUDGET=1) one
+# extra thread is started that only serves the interactive lane. A blocking
+# interactive run() while the bulk lane is idle skips the hand-off and runs
+# on the calling thread, taking a worker slot like a dispatched task would.
+
+LANES = ("interactive", "bulk")
+
+
+class _Lane:
+    def __init__(self, name: str, weight: int, max_running: int):
+        self.name = name
+        self.weight = weight
+        self.max_running = max_running
+        self.queue = deque()
+        self.running = 0
+        self.pass_value = 0.0
+        self.submitted = 0
+        self.completed = 0
+        self.inline = 0
+        self.wait_ms = deque(maxlen=1000)      # queued -> started
+        self.latency_ms = deque(maxlen=1000)   # queued -> finished
+
+    def eligible(self) -> bool:
+        return bool(self.queue) and self.running < self.max_running
+
+    def idle(self) -> bool:
+        return not self.queue and self.running == 0
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None}
+    arr = np.array(values)
+    return {"p50": float(np.percentile(arr, 50)), "p95": float(np.percentile(arr, 95))}
+
+
+class LaneScheduler:
+    def __init__(
+        self,
+        workers: int = SCHEDULER_WORKERS,
+        weights: dict = None,
+        bulk_max_running: int = LANE_BULK_MAX_RUNNING,
+        slice_rows: int = LANE_BULK_SLICE_ROWS,
+    ):
+        weights = weights or {"interactive": LANE_INTERACTIVE_WEIGHT, "bulk": LANE_BULK_WEIGHT}
+        self.workers = workers
+        self.slice_rows = slice_rows
+        bulk_max_running = min(bulk_max_running, workers)
+        # One thread only for interactive work when bulk may take them all
+        self.reserved = 1 if bulk_max_running >= workers else 0
+        self._slots = workers + self.reserved
+        self._lanes = {
+            "interactive": _Lane("interactive", weights["interactive"], self._slots),
+            "bulk": _Lane("bulk", weights["bulk"], bulk_max_running),
+        }
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def _ensure_started(self):
+        # Threads start with the first task (like inference._get_pool)
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, args=(LANES,), name=f"lane-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        if self.reserved:
+            t = threading.Thread(target=self._run, args=(("interactive",),), name="lane-worker-interactive", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    # -- submission -------------------------------
+    def submit(self, lane: str, fn, *args, **kwargs) -> Future:
+        fut = Future()
+        with self._cond:
+            self._ensure_started()
+            ln = self._lanes[lane]
+            if not ln.queue and ln.running == 0:
+                # Idle lanes rejoin at the current virtual time
+                busy = [l.pass_value for l in self._lanes.values() if l.queue or l.running]
+                ln.pass_value = max(ln.pass_value, min(busy, default=ln.pass_value))
+            ln.queue.append((fut, fn, args, kwargs, time.perf_counter()))
+            ln.submitted += 1
+            self._cond.notify_all()
+        return fut
+
+    def run(self, lane: str, fn, *args, **kwargs):
+        # Blocking call for sync route handlers
+        if lane == "interactive":
+            with self._cond:
+                ln = self._lanes[lane]
+                inline = (
+                    self._lanes["bulk"].idle() and not ln.queue
+                    and self._running() < self._slots
+                )
+                if inline:
+                    ln.running += 1
+                    ln.submitted += 1
+                    ln.inline += 1
+            if inline:
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._finished(ln, started, started, time.perf_counter())
+        return self.submit(lane, fn, *args, **kwargs).result()
+
+    def _slices(self, lane: str, model, X, method: str):
+        n = len(X)
+        if n <= self.slice_rows:
+            return [self.submit(lane, predict, model, X, method, workers=1)]
+        if not hasattr(X, "iloc"):
+            X = np.asarray(X)
+        futures = []
+        for a in range(0, n, self.slice_rows):
+            part = X.iloc[a:a + self.slice_rows] if hasattr(X, "iloc") else X[a:a + self.slice_rows]
+            futures.append(self.submit(lane, predict, model, part, method, workers=1))
+        return futures
+
+    def predict(self, lane: str, model, X, method: str = "predict"):
+        # Slices run in parallel on the lane's share of the workers
+        results = [f.result() for f in self._slices(lane, model, X, method)]
+        return np.concatenate(results) if len(results) > 1 else results[0]
+
+    async def apredict(self, lane: str, model, X, method: str = "predict"):
+        # Same as predict() without blocking the event loop
+        futures = [asyncio.wrap_future(f) for f in self._slices(lane, model, X, method)]
+        results = await asyncio.gather(*futures)
+        return np.concatenate(results) if len(results) > 1 else results[0]
+
+    # -- workers ----------------------------------
+    def _running(self) -> int:
+        return sum(l.running for l in self._lanes.values())
+
+    def _next(self, lanes):
+        # Inline runs hold slots too: never more running tasks than threads
+        if self._running() >= self._slots:
+            return None
+        eligible = [self._lanes[name] for name in lanes if self._lanes[name].eligible()]
+        if not eligible:
+            return None
+        ln = min(eligible, key=lambda l: l.pass_value)   # stable: interactive wins ties
+        ln.pass_value += 1.0 / ln.weight
+        ln.running += 1
+        return ln, ln.queue.popleft()
+
+    def _finished(self, ln, queued, started, finished):
+        with self._cond:
+            ln.running -= 1
+            ln.completed += 1
+            ln.wait_ms.append((started - queued) * 1e3)
+            ln.latency_ms.append((finished - queued) * 1e3)
+            # A slot in a capped lane may have freed up
+            self._cond.notify_all()
+
+    def _run(self, lanes):
+        while True:
+            with self._cond:
+                picked = self._next(lanes)
+                while picked is None:
+                    self._cond.wait()
+                    picked = self._next(lanes)
+            ln, (fut, fn, args, kwargs, queued) = picked
+
+            started = time.perf_counter()
+            if fut.set_running_or_notify_cancel():
+                try:
+                    fut.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    fut.set_exception(e)
+            self._finished(ln, queued, started, time.perf_counter())
+
+    def snapshot(self):
+        # Raw counters for the autoscaler (app/supervisor.py)
+        with self._cond:
+            return {
+                name: {
+                    "queued": len(ln.queue),
+                    "running": ln.running,
+                    "completed": ln.completed,
+                    "latency_ms": list(ln.latency_ms),
+                }
+                for name, ln in self._lanes.items()
+            }
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "reserved_interactive_workers": self.reserved,
+                "slice_rows": self.slice_rows,
+                **{
+                    name: {
+                        "weight": ln.weight,
+                        "max_running": ln.max_running,
+                        "queue_depth": len(ln.queue),
+                        "running": ln.running,
+                        "submitted": ln.submitted,
+                        "completed": ln.completed,
+                        "inline": ln.inline,
+                        "wait_ms": _percentiles(ln.wait_ms),
+                        "latency_ms": _percentiles(ln.latency_ms),
+                    }
+                    for name, ln in self._lanes.items()
+                },
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LaneScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LaneScheduler()
+    return _scheduler
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 class DemandRequest(BaseModel):
@@ -5,9 +7,23 @@ class DemandRequest(BaseModel):
     temperature: float
     voltage: float
     dayofweek: int  # Added to match training data
+    # Both set: use the lag-feature model with this feeder's recent demand
+    feeder: Optional[str] = None
+    datetime: Optional[str] = None
 
 class PeakRequest(BaseModel):
     hour: int
     temperature: float
     voltage: float
-    dayofweek: int  # Added to match training data
\ No newline at end of file
+    dayofweek: int  # Added to match training data
+
+class DemandBatchRequest(BaseModel):
+    rows: List[DemandRequest]
+
+class Observation(BaseModel):
+    feeder: str
+    datetime: str  # the hour this mean demand belongs to
+    demand: float
+
+class ObservationBatch(BaseModel):
+    observations: List[Observation]
@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from sklearn.base import is_classifier, is_regressor
+
+from app.config import SHADOW_BATCH_SIZE, SHADOW_FLUSH_SECONDS, SHADOW_QUEUE_SIZE
+from app.inference import predict
+
+# -------------------------------------------------
+# SHADOW EVALUATION OF CANDIDATE MODELS
+# -------------------------------------------------
+# The request path only does a non-blocking put of (kind, features, served
+# answer) into a bounded queue; when the queue is full the row is dropped
+# and counted. A daemon thread drains the queue, scores batches with the
+# candidate models and accumulates agreement / error / latency statistics.
+#
+# Candidates are compared with what the full served model says. An answer
+# that came from an approximation (a cascade tier below "full", early-exit
+# regression) is submitted with exact=False; the worker recomputes the
+# served model's full answer for those rows, or skips them (counted) when
+# it was not given the served models. stop() scores everything already
+# queued before the thread exits; rows submitted after it are dropped.
+
+
+class ShadowEvaluator:
+    def __init__(
+        self,
+        candidates: dict,
+        capacity: int = SHADOW_QUEUE_SIZE,
+        batch_size: int = SHADOW_BATCH_SIZE,
+        flush_seconds: float = SHADOW_FLUSH_SECONDS,
+        served_models: dict = None,
+    ):
+        # Only sklearn estimators (skips timeseries / thresholds in a models dict)
+        self.candidates = {
+            k: m for k, m in candidates.items()
+            if is_classifier(m) or is_regressor(m)
+        }
+        self.served_models = served_models or {}
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=capacity)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.enqueued = 0
+        self.dropped = 0
+        self._stats = {
+            kind: {
+                "rows": 0,
+                "batches": 0,
+                "recomputed": 0,
+                "skipped_inexact": 0,
+                "agree": 0,
+                "abs_err_sum": 0.0,
+                "sq_err_sum": 0.0,
+                "max_abs_err": 0.0,
+                "latency_ms": deque(maxlen=1000),   # per-row scoring latency
+            }
+            for kind in self.candidates
+        }
+        self._thread = None
+        if self.candidates:
+            self._thread = threading.Thread(target=self._run, name="shadow-eval", daemon=True)
+            self._thread.start()
+
+    # -- request path -----------------------------
+    def submit(self, kind: str, row, served, exact: bool = True) -> bool:
+        if kind not in self.candidates:
+            return False
+        # Under the lock so no row lands in the queue after stop()
+        with self._lock:
+            if self._stop.is_set():
+                self.dropped += 1
+                return False
+            try:
+                self._queue.put_nowait((kind, row, served, exact))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self.enqueued += 1
+        return True
+
+    # -- background worker ------------------------
+    def _run(self):
+        pending = {kind: [] for kind in self.candidates}
+        deadline = time.monotonic() + self.flush_seconds
+        while not self._stop.is_set():
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is not None:     # None: woken up by stop()
+                    kind, row, served, exact = item
+                    pending[kind].append((row, served, exact))
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for kind, items in pending.items():
+                if items and (len(items) >= self.batch_size or now >= deadline):
+                    self._score(kind, items)
+                    pending[kind] = []
+            if now >= deadline:
+                deadline = now + self.flush_seconds
+
+        # Stopped: score what was already queued
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                kind, row, served, exact = item
+                pending[kind].append((row, served, exact))
+        for kind, items in pending.items():
+            for a in range(0, len(items), self.batch_size):
+                self._score(kind, items[a:a + self.batch_size])
+
+    def _reference(self, kind: str, X, served, exact):
+        # The full served model's answers, in place of approximate ones
+        if exact.all():
+            return X, served, 0
+        model = self.served_models.get(kind)
+        if model is None:
+            with self._lock:
+                self._stats[kind]["skipped_inexact"] += int((~exact).sum())
+            return X[exact], served[exact], 0
+        served = served.copy()
+        served[~exact] = predict(model, X[~exact])
+        return X, served, int((~exact).sum())
+
+    def _score(self, kind: str, items):
+        X = np.array([row for row, _, _ in items], dtype=float)
+        served = np.array([s for _, s, _ in items])
+        exact = np.array([e for _, _, e in items], dtype=bool)
+        try:
+            X, served, recomputed = self._reference(kind, X, served, exact)
+        except Exception as e:
+            print(f"[Shadow Error] {kind} (served model): {e}")
+            return
+        if len(X) == 0:
+            return
+
+        t0 = time.perf_counter()
+        try:
+            y = predict(self.candidates[kind], X)
+        except Exception as e:
+            print(f"[Shadow Error] {kind}: {e}")
+            return
+        per_row_ms = (time.perf_counter() - t0) * 1e3 / len(X)
+
+        with self._lock:
+            s = self._stats[kind]
+            s["rows"] += len(X)
+            s["batches"] += 1
+            s["recomputed"] += recomputed
+            s["latency_ms"].append(per_row_ms)
+            if is_classifier(self.candidates[kind]):
+                s["agree"] += int(np.sum(y == served))
+            else:
+                err = np.abs(y - served.astype(float))
+                s["abs_err_sum"] += float(err.sum())
+                s["sq_err_sum"] += float(np.square(err).sum())
+                s["max_abs_err"] = max(s["max_abs_err"], float(err.max()))
+
+    def stop(self):
+        # The worker scores the queued rows, then exits (join _thread to wait)
+        with self._lock:
+            self._stop.set()
+        try:
+            # Wake a worker waiting on an empty queue (a full one has work)
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def stats(self):
+        with self._lock:
+            out = {
+                "enabled": bool(self.candidates),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "queue_depth": self._queue.qsize(),
+            }
+            for kind, s in self._stats.items():
+                n = s["rows"]
+                lat = np.array(s["latency_ms"]) if s["latency_ms"] else None
+                entry = {
+                    "rows": n,
+                    "batches": s["batches"],
+                    "recomputed_reference": s["recomputed"],
+                    "skipped_inexact": s["skipped_inexact"],
+                    "latency_ms_per_row": {
+                        "p50": float(np.percentile(lat, 50)) if lat is not None else None,
+                        "p95": float(np.percentile(lat, 95)) if lat is not None else None,
+                    },
+                }
+                if is_classifier(self.candidates[kind]):
+                    entry["agreement"] = s["agree"] / n if n else None
+                else:
+                    entry["mae"] = s["abs_err_sum"] / n if n else None
+                    entry["rmse"] = float(np.sqrt(s["sq_err_sum"] / n)) if n else None
+                    entry["max_abs_err"] = s["max_abs_err"]
+                out[kind] = entry
+            return out
@@ -0,0 +1,307 @@
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from multiprocessing import Pipe
+
+import numpy as np
+
+from app.config import (
+    SCALE_COOLDOWN_SECONDS,
+    SCALE_DOWN_CPU,
+    SCALE_DOWN_P95_MS,
+    SCALE_DOWN_QUEUE_PER_WORKER,
+    SCALE_DOWN_TICKS,
+    SCALE_UP_CPU,
+    SCALE_UP_P95_MS,
+    SCALE_UP_QUEUE_PER_WORKER,
+    SCALE_UP_TICKS,
+    SUPERVISOR_INTERVAL_SECONDS,
+    SUPERVISOR_MAX_WORKERS,
+    SUPERVISOR_MIN_WORKERS,
+)
+
+# -------------------------------------------------
+# AUTOSCALING UVICORN WORKERS IN ONE CONTAINER
+# -------------------------------------------------
+# Usage:
+#   python -m app.supervisor --host 0.0.0.0 --port 8000 --min-workers 1 --max-workers 4
+#
+# The supervisor binds the listening socket and loads the models once, then
+# forks uvicorn workers that share both. fork() copies only the calling
+# thread, so the parent never starts one: it loads the models without the
+# shadow / risk-audit evaluators and refuses to fork while any other thread
+# is alive (a lock held by a thread that does not exist in the child would
+# never be released there). A forked worker starts with the forests
+# already in memory (copy-on-write), starts its own lane workers and
+# evaluators, and runs one warm-up prediction through the lanes before it
+# starts accepting connections on the shared socket, so it never serves a
+# cold first request.
+#
+# Every interval each worker reports its lane queue depth, CPU time and
+# recent interactive latency over a pipe; ScalingPolicy turns those into a
+# target worker count between --min-workers and --max-workers (e.g. more
+# workers for the 17:00-22:00 peak, back to the minimum overnight).
+# Removed workers get SIGTERM and finish their in-flight requests.
+
+
+# -------------------------------------------------
+# SCALING POLICY (PURE, NO PROCESSES)
+# -------------------------------------------------
+class ScalingPolicy:
+    def __init__(
+        self,
+        min_workers: int = SUPERVISOR_MIN_WORKERS,
+        max_workers: int = SUPERVISOR_MAX_WORKERS,
+        up_queue: float = SCALE_UP_QUEUE_PER_WORKER,
+        down_queue: float = SCALE_DOWN_QUEUE_PER_WORKER,
+        up_cpu: float = SCALE_UP_CPU,
+        down_cpu: float = SCALE_DOWN_CPU,
+        up_p95_ms: float = SCALE_UP_P95_MS,
+        down_p95_ms: float = SCALE_DOWN_P95_MS,
+        up_ticks: int = SCALE_UP_TICKS,
+        down_ticks: int = SCALE_DOWN_TICKS,
+        cooldown_seconds: float = SCALE_COOLDOWN_SECONDS,
+    ):
+        self.min_workers = min_workers
+        self.max_workers = max(min_workers, max_workers)
+        self.up_queue = up_queue
+        self.down_queue = down_queue
+        self.up_cpu = up_cpu
+        self.down_cpu = down_cpu
+        self.up_p95_ms = up_p95_ms
+        self.down_p95_ms = down_p95_ms
+        self.up_ticks = up_ticks
+        self.down_ticks = down_ticks
+        self.cooldown_seconds = cooldown_seconds
+        self._hot = 0
+        self._cold = 0
+        self._last_change = -float("inf")
+
+    def decide(self, workers: int, queue_per_worker: float, cpu: float, p95_ms, now: float) -> int:
+        # p95_ms is None when no request finished during the interval
+        p95 = p95_ms or 0.0
+        hot = queue_per_worker > self.up_queue or cpu > self.up_cpu or p95 > self.up_p95_ms
+        cold = queue_per_worker < self.down_queue and cpu < self.down_cpu and p95 < self.down_p95_ms
+
+        self._hot = self._hot + 1 if hot else 0
+        self._cold = self._cold + 1 if cold else 0
+
+        target = min(max(workers, self.min_workers), self.max_workers)
+        if target != workers or now - self._last_change < self.cooldown_seconds:
+            # Out-of-bounds counts are corrected immediately; otherwise wait
+            # for the cooldown after the previous change
+            return target
+
+        if self._hot >= self.up_ticks and workers < self.max_workers:
+            target = workers + 1
+        elif self._cold >= self.down_ticks and workers > self.min_workers:
+            target = workers - 1
+        if target != workers:
+            self._hot = self._cold = 0
+            self._last_change = now
+        return target
+
+
+# -------------------------------------------------
+# WORKER PROCESS
+# -------------------------------------------------
+def _report_loop(conn, interval: float):
+    from app.scheduler import get_scheduler
+
+    lanes = get_scheduler()
+    last_completed = 0
+    while True:
+        time.sleep(interval)
+        snap = lanes.snapshot()
+        interactive = snap["interactive"]
+        # Latency of requests finished since the previous report only, so
+        # an idle worker does not keep reporting the last peak
+        fresh = interactive["completed"] - last_completed
+        last_completed = interactive["completed"]
+        recent = interactive["latency_ms"][-fresh:] if fresh > 0 else []
+        try:
+            conn.send({
+                "queued": sum(s["queued"] for s in snap.values()),
+                "cpu_seconds": time.process_time(),
+                "p95_ms": float(np.percentile(recent, 95)) if recent else None,
+            })
+        except (BrokenPipeError, OSError):
+            return
+
+
+def _worker_main(sock, conn, host: str, port: int, interval: float):
+    import uvicorn
+
+    import app.main as main
+    import app.scheduler as scheduler
+
+    # Threads do not survive fork(): start this process' own lane workers
+    # and shadow evaluator instead of the parent's.
+    scheduler._scheduler = None
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    main._start_shadow()
+
+    # Warm up before the first accept(): models are already loaded by the
+    # parent, this also starts the lane threads and touches every tree.
+    models = main.get_models()
+    X = [[18, 30.0, 230.0, 1]]
+    for kind in ("regression", "classifier"):
+        if models.get(kind) is not None:
+            scheduler.get_scheduler().run("interactive", models[kind].predict, X)
+
+    threading.Thread(target=_report_loop, args=(conn, interval), daemon=True).start()
+
+    config = uvicorn.Config(main.app, host=host, port=port, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+# -------------------------------------------------
+# SUPERVISOR
+# -------------------------------------------------
+class Supervisor:
+    def __init__(self, host: str, port: int, policy: ScalingPolicy, interval: float):
+        self.host = host
+        self.port = port
+        self.policy = policy
+        self.interval = interval
+        self.workers = {}    # pid -> {"conn", "report", "cpu_seconds", "started"}
+        self.sock = None
+        self._stopping = False
+
+    def _bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _prepare(self):
+        import app.main as main
+
+        print("[Supervisor] loading models...")
+        main.load_serving_models()
+
+    def _spawn(self):
+        others = [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+        if others:
+            raise RuntimeError(f"Refusing to fork with other threads running: {others}")
+        parent_conn, child_conn = Pipe(duplex=False)
+        pid = os.fork()
+        if pid == 0:
+            parent_conn.close()
+            code = 0
+            try:
+                _worker_main(self.sock, child_conn, self.host, self.port, self.interval)
+            except Exception as e:
+                print(f"[Worker Error] {e}")
+                code = 1
+            os._exit(code)
+        child_conn.close()
+        self.workers[pid] = {"conn": parent_conn, "report": None, "cpu_seconds": 0.0, "started": time.time()}
+        print(f"[Supervisor] started worker {pid} ({len(self.workers)} running)")
+
+    def _retire(self):
+        # Newest first: the oldest workers have the warmest caches
+        pid = max(self.workers, key=lambda p: self.workers[p]["started"])
+        os.kill(pid, signal.SIGTERM)
+        self.workers.pop(pid)["conn"].close()
+        print(f"[Supervisor] stopping worker {pid} ({len(self.workers)} running)")
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                print(f"[Supervisor] worker {pid} exited with status {status}")
+                self.workers.pop(pid)["conn"].close()
+
+    def _collect(self):
+        # Aggregate the latest report of every worker
+        queued, cpu, p95 = 0, 0.0, []
+        for w in self.workers.values():
+            while w["conn"].poll():
+                try:
+                    w["report"] = w["conn"].recv()
+                except EOFError:
+                    break
+            r = w["report"]
+            if r is None:
+                continue
+            queued += r["queued"]
+            cpu += max(0.0, r["cpu_seconds"] - w["cpu_seconds"])
+            w["cpu_seconds"] = r["cpu_seconds"]
+            if r["p95_ms"] is not None:
+                p95.append(r["p95_ms"])
+        n = max(1, len(self.workers))
+        return {
+            "queue_per_worker": queued / n,
+            "cpu": cpu / (self.interval * n),
+            "p95_ms": max(p95) if p95 else None,
+        }
+
+    def _stop(self, *_):
+        self._stopping = True
+
+    def run(self):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("The supervisor needs fork(); run uvicorn directly on this platform.")
+
+        self.sock = self._bind()
+        self._prepare()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for _ in range(self.policy.min_workers):
+            self._spawn()
+
+        while not self._stopping:
+            time.sleep(self.interval)
+            self._reap()
+            m = self._collect()
+            target = self.policy.decide(len(self.workers), m["queue_per_worker"], m["cpu"], m["p95_ms"], time.monotonic())
+            while len(self.workers) < target:
+                self._spawn()
+            while len(self.workers) > target:
+                self._retire()
+
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with an autoscaling pool of uvicorn workers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--min-workers", type=int, default=SUPERVISOR_MIN_WORKERS)
+    parser.add_argument("--max-workers", type=int, default=SUPERVISOR_MAX_WORKERS)
+    parser.add_argument("--interval", type=float, default=SUPERVISOR_INTERVAL_SECONDS)
+    args = parser.parse_args(argv)
+
+    policy = ScalingPolicy(min_workers=max(1, args.min_workers), max_workers=args.max_workers)
+    try:
+        Supervisor(args.host, args.port, policy, args.interval).run()
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,26 @@
+import hashlib
 import io
+import json
+import time
 import pandas as pd
 import joblib
 from pathlib import Path
 
+from app.inference import pin_single_threaded, predict
+from app.introspect import record_load
+from training.features import FEATURES, add_features, missing_features
+
 # -------------------------------------------------
 # LOAD MODELS (NO TRAINING, LOAD ONLY WHEN CALLED)
 # -------------------------------------------------
+def _timed_load(path: Path):
+    t0 = time.perf_counter()
+    obj = joblib.load(path)
+    # Keyed by path so candidate models don't overwrite the served ones
+    record_load(path.as_posix(), time.perf_counter() - t0, path.stat().st_size)
+    return obj
+
+
 def load_models(models_dir: str = "models"):
     models = {}
     base = Path(models_dir)
@@ -13,15 +28,26 @@ def load_models(models_dir: str = "models"):
     try:
         reg_path = base / "regression.pkl"
         if reg_path.exists():
-            models["regression"] = joblib.load(reg_path)
+            models["regression"] = pin_single_threaded(_timed_load(reg_path))
+
+        # Optional: regressor with lag / rolling demand features
+        lag_path = base / "regression_lag.pkl"
+        if lag_path.exists():
+            models["regression_lag"] = pin_single_threaded(_timed_load(lag_path))
 
         clf_path = base / "classifier.pkl"
         if clf_path.exists():
-            models["classifier"] = joblib.load(clf_path)
+            models["classifier"] = pin_single_threaded(_timed_load(clf_path))
+
+        # Threshold the classifier's labels were built from (demand > thresh)
+        meta_path = base / "classifier.json"
+        if meta_path.exists():
+            with open(meta_path) as f:
+                models["risk_threshold"] = float(json.load(f)["threshold"])
 
         ts_path = base / "timeseries.pkl"
         if ts_path.exists():
-            models["timeseries"] = joblib.load(ts_path)
+            models["timeseries"] = _timed_load(ts_path)
 
     except Exception as e:
         # Fail gracefully instead of crashing deployment
@@ -30,6 +56,33 @@ def load_models(models_dir: str = "models"):
     return models
 
 
+# -------------------------------------------------
+# MODEL VERSION (CONTENT HASH OF THE PICKLES)
+# -------------------------------------------------
+def models_stamp(models_dir: str = "models") -> tuple:
+    # Cheap change detector (name, size, mtime) for callers that cache the
+    # loaded models or their version, e.g. the Streamlit frontend
+    stamp = []
+    for name in ("regression.pkl", "regression_lag.pkl", "classifier.pkl", "timeseries.pkl"):
+        path = Path(models_dir) / name
+        if path.exists():
+            st = path.stat()
+            stamp.append((name, st.st_size, st.st_mtime_ns))
+    return tuple(stamp)
+
+
+def model_version(models_dir: str = "models") -> str:
+    h = hashlib.sha256()
+    for name in ("regression.pkl", "regression_lag.pkl", "classifier.pkl", "timeseries.pkl"):
+        path = Path(models_dir) / name
+        if path.exists():
+            h.update(name.encode())
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()[:16]
+
+
 # -------------------------------------------------
 # DETECT CSV SEPARATOR
 # -------------------------------------------------
@@ -41,6 +94,22 @@ def _detect_sep(contents: bytes) -> str:
         return ","
 
 
+# -------------------------------------------------
+# CHUNKED CSV PARSER FOR UPLOADS
+# -------------------------------------------------
+def read_feature_chunks(fileobj, chunksize: int, required=FEATURES):
+    # Yields DataFrames of at most `chunksize` rows with normalised column
+    # names, so an upload is never materialised as one frame. hour and
+    # dayofweek may come from a datetime (or date + time) column instead.
+    reader = pd.read_csv(fileobj, chunksize=chunksize)
+    for chunk in reader:
+        chunk = add_features(chunk, synthesize=False)
+        missing = [c for c in required if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        yield chunk
+
+
 # -------------------------------------------------
 # BATCH DEMAND PREDICTION
 # -------------------------------------------------
@@ -53,26 +122,11 @@ def predict_demand_batch(contents: bytes, models: dict):
         na_values=["?", "", "NA"]
     )
 
-    # Normalize column names
-    df.columns = df.columns.str.strip().str.lower()
-
-    required = ["hour", "temperature", "voltage"]
-
-    # Attempt to derive hour if missing
-    if "hour" not in df.columns:
-        if "date" in df.columns and "time" in df.columns:
-            df["datetime"] = pd.to_datetime(
-                df["date"].astype(str) + " " + df["time"].astype(str),
-                errors="coerce"
-            )
-            df["hour"] = df["datetime"].dt.hour
-
-        elif "datetime" in df.columns:
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-            df["hour"] = df["datetime"].dt.hour
+    # Normalised names; hour / dayofweek from date + time or datetime, and
+    # the same synthetic temperature / voltage as training when absent
+    df = add_features(df)
 
-    # Final validation
-    missing = [c for c in required if c not in df.columns]
+    missing = missing_features(df)
     if missing:
         raise ValueError(f"CSV missing required columns: {missing}")
 
@@ -80,7 +134,7 @@ def predict_demand_batch(contents: bytes, models: dict):
     if model is None:
         raise ValueError("Regression model not loaded")
 
-    X = df[required]
-    predictions = model.predict(X)
+    X = df[FEATURES]
+    predictions = predict(model, X)
 
     return predictions.tolist()
@@ -0,0 +1,341 @@
+import asyncio
+import gzip
+import json
+import random
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+# -------------------------------------------------
+# PYTHON CLIENT FOR THE DEMAND PREDICTION API
+# -------------------------------------------------
+# Usage:
+#   with PowerGridClient("http://localhost:8000") as api:
+#       api.predict_demand(hour=18, temperature=32.0, voltage=230.0, dayofweek=1)
+#
+#   async with AsyncPowerGridClient("http://localhost:8000") as api:
+#       await asyncio.gather(*(api.predict_demand(**row) for row in rows))
+#
+# Both clients keep one pooled keep-alive connection set. predict_demand()
+# calls issued concurrently (threads or tasks) within `batch_window` seconds
+# are coalesced into a single POST /predict-demand/batch. Requests are
+# retried with exponential backoff on connection errors and 429/5xx.
+#
+# A POST is not idempotent in general, so by default it is only retried
+# when the server cannot have acted on it: the connection was never made,
+# or the answer was 429/503. retry_posts=True retries it like a GET (the
+# prediction endpoints have no side effects).
+
+RETRY_STATUS = {429, 502, 503, 504}
+REFUSED_STATUS = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+FEATURES = ["hour", "temperature", "voltage", "dayofweek"]
+
+
+class PowerGridError(Exception):
+    def __init__(self, status_code: int, detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _row(hour, temperature, voltage, dayofweek):
+    return {"hour": int(hour), "temperature": float(temperature),
+            "voltage": float(voltage), "dayofweek": int(dayofweek)}
+
+
+def _upload_file(data, filename: str, compress: bool):
+    # data: path, bytes or binary file object
+    if isinstance(data, (str, Path)):
+        filename = Path(data).name
+        data = Path(data).read_bytes()
+    elif hasattr(data, "read"):
+        data = data.read()
+    if compress and not filename.endswith(".gz"):
+        # The server inflates *.gz uploads while parsing
+        data, filename = gzip.compress(data), filename + ".gz"
+    return {"file": (filename, data, "text/csv")}
+
+
+def _check(resp: httpx.Response):
+    if resp.status_code >= 400:
+        try:
+            detail = resp.json().get("detail")
+        except ValueError:
+            detail = resp.text
+        raise PowerGridError(resp.status_code, detail)
+    return resp
+
+
+def _backoff(backoff: float, attempt: int) -> float:
+    return backoff * (2 ** attempt) * (0.5 + random.random())
+
+
+def _retryable(method: str, retry_posts: bool, error: Exception = None, status: int = None) -> bool:
+    if method.upper() in IDEMPOTENT_METHODS or retry_posts:
+        return error is not None or status in RETRY_STATUS
+    return isinstance(error, NOT_SENT_ERRORS) or status in REFUSED_STATUS
+
+
+# -------------------------------------------------
+# SYNC CLIENT
+# -------------------------------------------------
+class _Slot:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PowerGridClient:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.1,
+        batch_window: float = 0.005,
+        max_batch: int = 256,
+        max_connections: int = 20,
+        retry_posts: bool = False,
+        client: httpx.Client = None,
+    ):
+        # `client` lets callers (and tests) supply their own httpx.Client,
+        # e.g. starlette's TestClient wrapping the app in-process
+        self._http = client or httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.retries = retries
+        self.retry_posts = retry_posts
+        self.backoff = backoff
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = []
+        self._leader = False
+        self._full = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._http.close()
+
+    def _request(self, method: str, url: str, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self._http.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.retries or not _retryable(method, self.retry_posts, error=e):
+                    raise
+            else:
+                if attempt == self.retries or not _retryable(method, self.retry_posts, status=resp.status_code):
+                    return _check(resp)
+            time.sleep(_backoff(self.backoff, attempt))
+
+    # -- endpoints --------------------------------
+    def predict_demand_many(self, rows):
+        rows = [r if isinstance(r, dict) else dict(zip(FEATURES, r)) for r in rows]
+        out = []
+        for i in range(0, len(rows), self.max_batch):
+            resp = self._request("POST", "/predict-demand/batch", json={"rows": rows[i:i + self.max_batch]})
+            out.extend(resp.json()["predictions"])
+        return out
+
+    def predict_demand(self, hour, temperature, voltage, dayofweek) -> float:
+        # The first caller in a window becomes the leader: it waits for the
+        # window (or a full batch), then sends everyone's rows at once.
+        slot = _Slot()
+        with self._lock:
+            self._pending.append((_row(hour, temperature, voltage, dayofweek), slot))
+            lead = not self._leader
+            self._leader = True
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+
+        if lead:
+            self._full.wait(self.batch_window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._leader = False
+                self._full.clear()
+            try:
+                results = self.predict_demand_many([r for r, _ in batch])
+                for (_, s), y in zip(batch, results):
+                    s.result = y
+            except Exception as e:
+                for _, s in batch:
+                    s.error = e
+            for _, s in batch:
+                s.event.set()
+
+        slot.event.wait()
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def peak_hour(self, hour, temperature, voltage, dayofweek, mode: str = None, deadline_ms: float = None):
+        params = {"mode": mode} if mode else None
+        headers = {"X-Deadline-Ms": str(deadline_ms)} if deadline_ms is not None else None
+        return self._request("POST", "/peak-hour", json=_row(hour, temperature, voltage, dayofweek),
+                             params=params, headers=headers).json()
+
+    def upload(self, data, aggregate: bool = False, threshold: float = None,
+               filename: str = "upload.csv", compress: bool = False):
+        params = {"aggregate": "true"} if aggregate else {}
+        if threshold is not None:
+            params["threshold"] = threshold
+        return self._request("POST", "/upload-data", params=params,
+                             files=_upload_file(data, filename, compress)).json()
+
+    def iter_upload(self, data, filename: str = "upload.csv", compress: bool = False):
+        # Yields one prediction per row as the server finishes each chunk
+        with self._http.stream("POST", "/upload-data", params={"stream": "true"},
+                               files=_upload_file(data, filename, compress)) as resp:
+            if resp.status_code >= 400:
+                resp.read()
+                _check(resp)
+            for line in resp.iter_lines():
+                if line:
+                    yield from json.loads(line)["predictions"]
+
+
+# -------------------------------------------------
+# ASYNC CLIENT
+# -------------------------------------------------
+class AsyncPowerGridClient:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.1,
+        batch_window: float = 0.005,
+        max_batch: int = 256,
+        max_connections: int = 20,
+        retry_posts: bool = False,
+        client: httpx.AsyncClient = None,
+    ):
+        # `client` lets callers (and tests) supply their own AsyncClient,
+        # e.g. one built on httpx.ASGITransport(app=...)
+        self._http = client or httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.retries = retries
+        self.retry_posts = retry_posts
+        self.backoff = backoff
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_task = None
+        self._tasks = set()     # every scheduled flush, awaited by aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        # Flushes in flight finish (and resolve their callers) first
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._http.aclose()
+
+    def _schedule(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _request(self, method: str, url: str, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self._http.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.retries or not _retryable(method, self.retry_posts, error=e):
+                    raise
+            else:
+                if attempt == self.retries or not _retryable(method, self.retry_posts, status=resp.status_code):
+                    return _check(resp)
+            await asyncio.sleep(_backoff(self.backoff, attempt))
+
+    # -- endpoints --------------------------------
+    async def predict_demand_many(self, rows):
+        rows = [r if isinstance(r, dict) else dict(zip(FEATURES, r)) for r in rows]
+        out = []
+        for i in range(0, len(rows), self.max_batch):
+            resp = await self._request("POST", "/predict-demand/batch", json={"rows": rows[i:i + self.max_batch]})
+            out.extend(resp.json()["predictions"])
+        return out
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        self._flush_task = None
+        if not batch:
+            return
+        try:
+            results = await self.predict_demand_many([r for r, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), y in zip(batch, results):
+            if not fut.done():
+                fut.set_result(y)
+
+    async def predict_demand(self, hour, temperature, voltage, dayofweek) -> float:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((_row(hour, temperature, voltage, dayofweek), fut))
+        if len(self._pending) >= self.max_batch:
+            if self._flush_task is not None:
+                # Still sleeping: _flush() clears it before it sends
+                self._flush_task.cancel()
+            self._schedule(self._flush())
+        elif self._flush_task is None:
+            self._flush_task = self._schedule(self._flush_later())
+        return await fut
+
+    async def peak_hour(self, hour, temperature, voltage, dayofweek, mode: str = None, deadline_ms: float = None):
+        params = {"mode": mode} if mode else None
+        headers = {"X-Deadline-Ms": str(deadline_ms)} if deadline_ms is not None else None
+        resp = await self._request("POST", "/peak-hour", json=_row(hour, temperature, voltage, dayofweek),
+                                   params=params, headers=headers)
+        return resp.json()
+
+    async def upload(self, data, aggregate: bool = False, threshold: float = None,
+                     filename: str = "upload.csv", compress: bool = False):
+        params = {"aggregate": "true"} if aggregate else {}
+        if threshold is not None:
+            params["threshold"] = threshold
+        resp = await self._request("POST", "/upload-data", params=params,
+                                   files=_upload_file(data, filename, compress))
+        return resp.json()
+
+    async def iter_upload(self, data, filename: str = "upload.csv", compress: bool = False):
+        async with self._http.stream("POST", "/upload-data", params={"stream": "true"},
+                                     files=_upload_file(data, filename, compress)) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                _check(resp)
+            async for line in resp.aiter_lines():
+                if line:
+                    for y in json.loads(line)["predictions"]:
+                        yield y
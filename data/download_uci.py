@@ -1,32 +1,235 @@
-import requests
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
 import zipfile
 from pathlib import Path
-import io
+from urllib.parse import unquote, urlparse
+
+import requests
 
 URL = 'https://archive.ics.uci.edu/ml/machine-learning-databases/00235/household_power_consumption.zip'
 OUT = Path('data/raw/household_power_consumption.txt')
+MEMBER = 'household_power_consumption.txt'
+CHUNK_BYTES = 64 * 1024
+
+# -------------------------------------------------
+# STREAMING, RESUMABLE DOWNLOAD
+# -------------------------------------------------
+# The ZIP (~20 MB, ~130 MB unpacked) is never held in memory:
+#
+#   1. it is streamed to <zip>.part in CHUNK_BYTES pieces; an interrupted
+#      download (dropped connection, killed container, a stream that just
+#      ends early) resumes from the bytes already on disk with an HTTP Range
+#      request, on the next retry or the next run. A server that ignores
+#      Range (200) restarts it.
+#   2. the server's ETag / Last-Modified is kept in <zip>.part.json. A
+#      resume sends it as If-Range, and a .part whose source has changed
+#      since (a 200 to If-Range, or a different validator) is discarded and
+#      downloaded again, so two versions are never spliced together.
+#   3. the finished file's size is checked against the server's length and,
+#      when one is given, its sha256 against the expected digest, before
+#      <zip>.part is renamed to <zip>.
+#      A <zip> already on disk is reused only if it matches that digest;
+#      otherwise it is deleted and downloaded again.
+#   4. the member is copied out of the ZIP on disk in chunks (zipfile checks
+#      its CRC as it goes) to <out>.tmp, then renamed to <out>.
+#
+# file:// URLs are read straight from disk, so the whole flow can be tested
+# (and the dataset installed from a mirror) without a network.
+
+
+class ChecksumError(RuntimeError):
+    pass
+
+
+def _file_hash(path: Path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b''):
+            h.update(block)
+    return h
+
+
+def _validator_path(part: Path) -> Path:
+    return part.with_name(part.name + '.json')
+
+
+def _read_validator(part: Path):
+    try:
+        with open(_validator_path(part)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_validator(part: Path, validator):
+    path = _validator_path(part)
+    if validator:
+        with open(path, 'w') as f:
+            json.dump(validator, f)
+    elif path.exists():
+        path.unlink()
+
 
+def _same_source(saved, current) -> bool:
+    # Unknown on either side counts as the same (nothing to compare)
+    if not saved or not current:
+        return True
+    for key in ('etag', 'last_modified'):
+        if saved.get(key) and current.get(key):
+            return saved[key] == current[key]
+    return True
 
-def download_and_extract(url: str = URL, out: Path = OUT):
+
+def _if_range(saved):
+    # Weak ETags are not allowed in If-Range
+    etag = saved.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return saved.get('last_modified')
+
+
+def _open_source(url: str, offset: int, timeout: float, saved=None):
+    # (chunks, total size or None, resumed?, validator) for bytes offset..
+    # of url; resumed is False when the source changed since `saved`
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        path = Path(unquote(parsed.path))
+        st = path.stat()
+        validator = {'last_modified': str(st.st_mtime_ns)}
+        if offset and not _same_source(saved, validator):
+            offset = 0
+
+        def chunks():
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                yield from iter(lambda: f.read(CHUNK_BYTES), b'')
+        return chunks(), st.st_size, offset > 0, validator
+
+    headers = {}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        if saved and _if_range(saved):
+            headers['If-Range'] = _if_range(saved)
+    resp = requests.get(url, stream=True, headers=headers, timeout=timeout)
+    if resp.status_code == 416:
+        # Range starts at the end: nothing left to fetch
+        resp.close()
+        return iter(()), offset, True, saved
+    resp.raise_for_status()
+    validator = {k: resp.headers[h] for k, h in (('etag', 'ETag'), ('last_modified', 'Last-Modified')) if h in resp.headers}
+    resumed = resp.status_code == 206
+    if resumed and not _same_source(saved, validator):
+        # Server ignored If-Range: fetch the new version from the start
+        resp.close()
+        chunks, total, _, validator = _open_source(url, 0, timeout)
+        return chunks, total, False, validator
+    total = None
+    if resumed and '/' in resp.headers.get('Content-Range', ''):
+        total = resp.headers['Content-Range'].rsplit('/', 1)[1]
+        total = int(total) if total.isdigit() else None
+    elif not resumed and resp.headers.get('Content-Length', '').isdigit():
+        total = int(resp.headers['Content-Length'])
+    return resp.iter_content(CHUNK_BYTES), total, resumed, validator
+
+
+def download(url: str, dest: Path, sha256: str = None, retries: int = 3, timeout: float = 60):
+    # Streams url to dest (resuming dest.part) and verifies it; returns dest.
+    # An existing dest is kept only if it matches sha256 (when one is given)
+    dest = Path(dest)
+    if dest.exists():
+        if sha256 is None:
+            return dest
+        digest = _file_hash(dest).hexdigest()
+        if digest == sha256.lower():
+            return dest
+        print(f'{dest} has sha256 {digest}, expected {sha256}; downloading again')
+        dest.unlink()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + '.part')
+
+    for attempt in range(retries + 1):
+        offset = part.stat().st_size if part.exists() else 0
+        try:
+            chunks, total, resumed, validator = _open_source(url, offset, timeout, _read_validator(part))
+            if offset and not resumed:
+                print('Source changed or ignored the range request, restarting download')
+                offset = 0
+            elif offset:
+                print(f'Resuming download at {offset} bytes')
+            _write_validator(part, validator)
+            with open(part, 'ab' if offset else 'wb') as f:
+                for block in chunks:
+                    f.write(block)
+            size = part.stat().st_size
+            if total is None or size == total:
+                break
+            if size > total:
+                # Cannot be resumed: start over on the next attempt
+                part.unlink()
+            problem = f'stopped at {size} of {total} bytes'
+            if attempt == retries:
+                raise IOError(f'Download of {url} {problem}; run again to resume')
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == retries:
+                raise
+            problem = f'interrupted ({e})'
+        print(f'Download {problem}; retrying...')
+        time.sleep(min(2 ** attempt, 30))
+
+    digest = _file_hash(part).hexdigest()
+    if sha256 is not None and digest != sha256.lower():
+        part.unlink()
+        _write_validator(part, None)
+        raise ChecksumError(f'sha256 of {url} is {digest}, expected {sha256}')
+    print(f'Downloaded {size} bytes, sha256 {digest}')
+    os.replace(part, dest)
+    _write_validator(part, None)
+    return dest
+
+
+def extract_member(zip_path: Path, out: Path, member: str = MEMBER):
+    # Copies the ZIP entry ending in `member` to out without loading it
+    with zipfile.ZipFile(zip_path) as z:
+        names = [n for n in z.namelist() if n.endswith(member)]
+        if not names:
+            raise RuntimeError('Expected file not found in zip')
+        tmp = out.with_name(out.name + '.tmp')
+        with z.open(names[0]) as src, open(tmp, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_BYTES)
+    os.replace(tmp, out)
+    return out
+
+
+def download_and_extract(url: str = URL, out: Path = OUT, sha256: str = None, keep_zip: bool = False):
+    out = Path(out)
     out.parent.mkdir(parents=True, exist_ok=True)
     if out.exists():
         print('Dataset already present at', out)
         return out
-    resp = requests.get(url, stream=True)
-    resp.raise_for_status()
-    z = zipfile.ZipFile(io.BytesIO(resp.content))
-    # list of files; look for the household file
-    for name in z.namelist():
-        if 'household_power_consumption.txt' in name:
-            z.extract(name, out.parent)
-            # move to expected name
-            extracted = out.parent / name
-            extracted.rename(out)
-            print('Extracted to', out)
-            return out
-    raise RuntimeError('Expected file not found in zip')
+    zip_path = download(url, out.with_suffix('.zip'), sha256)
+    extract_member(zip_path, out)
+    if not keep_zip:
+        zip_path.unlink()
+    print('Extracted to', out)
+    return out
 
 
 if __name__ == '__main__':
+    # python data/download_uci.py [--url URL|file:///path.zip] [--sha256 HEX] [--keep-zip]
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default=URL)
+    parser.add_argument('--out', default=str(OUT))
+    parser.add_argument('--sha256', default=None, help='expected sha256 of the ZIP')
+    parser.add_argument('--keep-zip', action='store_true')
+    args = parser.parse_args()
     print('Downloading UCI dataset...')
-    print(download_and_extract())
+    try:
+        print(download_and_extract(args.url, Path(args.out), args.sha256, args.keep_zip))
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
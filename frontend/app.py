@@ -7,8 +7,18 @@ import requests
 from io import BytesIO
 from fpdf import FPDF
 import joblib
+import sys
 from pathlib import Path
 
+# Make the project packages (app/, training/) importable under `streamlit run`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.result_cache import ResultCache
+from app.utils import model_version, models_stamp
+from training.features import FEATURES, add_features, calendar_of, missing_features, single_row
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="PowerGrid AI", page_icon="⚡", layout="wide")
 
@@ -23,8 +33,10 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- HELPER: LOAD MODELS (ROBUST PATH FIX) ---
-@st.cache_resource
-def load_models():
+# Cached per models_stamp() (size / mtime of the pickles), so a retrain is
+# picked up on the next rerun and the previous models are released
+@st.cache_resource(max_entries=1)
+def load_models(stamp=()):
     # 1. Get the directory where THIS file (app.py) is located
     current_file_dir = Path(__file__).resolve().parent
     
@@ -54,8 +66,19 @@ def load_models():
         
     return loaded_models
 
-# Load models once
-models = load_models()
+# Load models once per version of the pickles
+MODELS_STAMP = models_stamp(str(PROJECT_ROOT / "models"))
+models = load_models(MODELS_STAMP)
+
+# --- HELPER: BATCH RESULT CACHE ---
+# Shared with the API: the cache keeps one byte limit for the directory
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(directory=str(PROJECT_ROOT / "data" / "cache"))
+
+@st.cache_resource(max_entries=1)
+def get_model_version(stamp=()):
+    return model_version(str(PROJECT_ROOT / "models"))
 
 # --- HELPER: LIVE WEATHER API ---
 def get_live_weather(lat=34.07, lon=72.68):
@@ -126,7 +149,7 @@ if page == "Real-time Dashboard (Manual)":
         if 'regression' in models and 'classifier' in models:
             try:
                 # Prepare Input
-                X = [[hour, temp, volt, day_int]]
+                X = single_row(hour, temp, volt, day_int)
                 
                 # Predict
                 d_val = models['regression'].predict(X)[0]
@@ -199,9 +222,8 @@ elif page == "Live Grid Monitor (API)":
     except: tz = pytz.utc
         
     now = datetime.now(tz)
-    current_hour = now.hour
+    current_hour, current_day_int = calendar_of(now.strftime("%Y-%m-%d %H:00"))
     current_minute = now.minute
-    current_day_int = now.weekday()
     day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
     time_str = f"{current_hour:02d}:{current_minute:02d}"
     
@@ -221,7 +243,7 @@ elif page == "Live Grid Monitor (API)":
     if st.button("RUN LIVE ANALYSIS", type="primary"):
         if 'regression' in models and 'classifier' in models:
             # Prepare Input
-            X = [[current_hour, current_temp, live_volt, current_day_int]]
+            X = single_row(current_hour, current_temp, live_volt, current_day_int)
             
             # Predict
             dem = models['regression'].predict(X)[0]
@@ -265,25 +287,38 @@ elif page == "Batch Analytics":
     
     if up_file and st.button("Process Batch File"):
         try:
-            df = pd.read_csv(up_file)
-            # Standardize columns
-            df.columns = df.columns.str.strip().str.lower()
+            # Same export uploaded again? Serve the stored result instead of
+            # parsing and predicting it a second time.
+            cache = get_result_cache()
+            cache_key = ResultCache.key("batch-analytics", get_model_version(MODELS_STAMP), up_file.getvalue())
+            cached = cache.get(cache_key)
+            if cached is not None:
+                df = pd.DataFrame(**cached)
+                st.success(f"Loaded {len(df)} cached rows (identical upload).")
+                st.dataframe(df)
+                st.markdown("### 📈 Batch Trend")
+                st.line_chart(df.set_index('hour')['Predicted_Demand'])
+            else:
+                df = pd.read_csv(up_file)
+                # Standardize columns; hour / dayofweek from a datetime column
+                df = add_features(df, synthesize=False)
             
-            required = ['hour', 'temperature', 'voltage', 'dayofweek']
-            if all(col in df.columns for col in required):
-                if 'regression' in models:
-                    X = df[required]
-                    df['Predicted_Demand'] = models['regression'].predict(X)
+                required = FEATURES
+                if not missing_features(df):
+                    if 'regression' in models:
+                        X = df[required]
+                        df['Predicted_Demand'] = models['regression'].predict(X)
+                        cache.put(cache_key, df.to_dict(orient="split", index=False))
                     
-                    st.success(f"Processed {len(df)} rows successfully!")
-                    st.dataframe(df)
+                        st.success(f"Processed {len(df)} rows successfully!")
+                        st.dataframe(df)
                     
-                    if 'hour' in df.columns: 
-                        st.markdown("### 📈 Batch Trend")
-                        st.line_chart(df.set_index('hour')['Predicted_Demand'])
+                        if 'hour' in df.columns: 
+                            st.markdown("### 📈 Batch Trend")
+                            st.line_chart(df.set_index('hour')['Predicted_Demand'])
+                    else:
+                        st.error("Regression model missing.")
                 else:
-                    st.error("Regression model missing.")
-            else:
-                st.error(f"CSV must contain columns: {required}")
+                    st.error(f"CSV must contain columns: {required}")
         except Exception as e:
             st.error(f"Error: {e}")
\ No newline at end of file
@@ -1,8 +1,11 @@
+import os
+
 from prefect import flow, task
 from prefect.tasks import task_input_hash
 from datetime import timedelta
 
 from training.preprocess import preprocess
+from training.store import ingest
 from training.train_regression import train_regression
 from training.train_classification import train_classification
 from training.train_timeseries import train_timeseries
@@ -10,33 +13,56 @@ from training.train_timeseries import train_timeseries
 
 @task(retries=2, retry_delay_seconds=10)
 def t_preprocess():
-    return preprocess()
+    # Daily runs only parse the rows appended to the raw file since the
+    # previous run (full rebuild when there is no valid watermark). Measured
+    # temperature is joined in when a weather file has been dropped in place.
+    weather = 'data/raw/weather.csv'
+    return preprocess(incremental=True, weather_path=weather if os.path.exists(weather) else None)
+
+
+@task(retries=2, retry_delay_seconds=10)
+def t_ingest_store():
+    # Appends the new minute rows and completed hours to data/store (/history)
+    return ingest()
+
+
+@task
+def t_train_regression(models_dir: str):
+    return train_regression(model_path=f"{models_dir}/regression.pkl")
 
 
 @task
-def t_train_regression():
-    return train_regression()
+def t_train_regression_lag(models_dir: str):
+    return train_regression(model_path=f"{models_dir}/regression_lag.pkl", lags=True)
 
 
 @task
-def t_train_classification():
-    return train_classification()
+def t_train_classification(models_dir: str):
+    return train_classification(model_path=f"{models_dir}/classifier.pkl")
 
 
 @task
-def t_train_timeseries():
-    return train_timeseries()
+def t_train_timeseries(models_dir: str):
+    return train_timeseries(model_path=f"{models_dir}/timeseries.pkl")
 
 
 @flow(name="train-all")
-def train_all():
+def train_all(candidate: bool = False):
+    # candidate=True writes to models/candidate/ instead of replacing the
+    # served models; the API scores candidates in shadow against live
+    # traffic (see /admin/shadow-stats) until they are promoted.
+    models_dir = "models/candidate" if candidate else "models"
     t_preprocess()
-    r = t_train_regression()
-    c = t_train_classification()
-    ts = t_train_timeseries()
-    return {"regression": r, "classification": c, "timeseries": ts}
+    t_ingest_store()
+    r = t_train_regression(models_dir)
+    rl = t_train_regression_lag(models_dir)
+    c = t_train_classification(models_dir)
+    ts = t_train_timeseries(models_dir)
+    return {"regression": r, "regression_lag": rl, "classification": c, "timeseries": ts}
 
 
 if __name__ == '__main__':
-    print("Running Prefect flow to train models")
-    print(train_all())
+    import sys
+    candidate = "--candidate" in sys.argv[1:]
+    print("Running Prefect flow to train " + ("candidate models" if candidate else "models"))
+    print(train_all(candidate=candidate))
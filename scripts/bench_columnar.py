@@ -0,0 +1,61 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from training.columnar import FEATURES, load_columnar, write_columnar
+
+# Usage: python -m scripts.bench_columnar [processed.csv]
+#
+# Compares what every trainer did before (read processed.csv, parse the
+# datetime column, derive hour / dayofweek, dropna) with memory-mapping the
+# columnar arrays, and checks both give the same feature matrix. Run
+# `python -m training.preprocess` on a full-size raw file first (see
+# scripts/bench_uci_reader.py for a synthetic one).
+
+
+def csv_load(path):
+    df = pd.read_csv(path)
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    df['hour'] = df['datetime'].dt.hour
+    df['dayofweek'] = df['datetime'].dt.dayofweek
+    df = df.dropna(subset=FEATURES + ['demand'])
+    return df[FEATURES].to_numpy(dtype=np.float32)
+
+
+def columnar_load(path):
+    data = load_columnar(path)
+    return data['X']
+
+
+def timed(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main(path: str = 'data/processed/processed.csv'):
+    if load_columnar(path) is None:
+        print(f"Writing columnar arrays for {path}...")
+        write_columnar(path)
+
+    old, t_old = timed(csv_load, path)
+    new, t_new = timed(columnar_load, path)
+    # Touch every page so the mmap side pays for its reads too
+    _, t_touch = timed(lambda p: float(columnar_load(p).sum()), path)
+
+    print(f"rows={len(new)}  csv={Path(path).stat().st_size / 2 ** 20:.1f} MiB")
+    print(f"{'loader':>16} {'seconds':>8}")
+    print(f"{'csv + derive':>16} {t_old:>8.3f}")
+    print(f"{'columnar mmap':>16} {t_new:>8.4f}")
+    print(f"{'mmap + full read':>16} {t_touch:>8.4f}")
+    print(f"speed-up x{t_old / t_touch:.0f} (full read), same features: {bool(np.array_equal(old, new))}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
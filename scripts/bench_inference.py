@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from app.inference import predict
+
+# Usage: python -m scripts.bench_inference [max_rows]
+#
+# Compares three ways of running the served forest:
+#   pickled  - n_jobs=-1 as saved by the trainers (joblib pool per call)
+#   inline   - n_jobs=1 on the calling thread
+#   chunked  - n_jobs=1, rows split across the shared inference pool
+# and reports the smallest batch where chunking beats inline prediction,
+# which is the value to use for POWERGRID_PARALLEL_MIN_ROWS.
+
+ROW_COUNTS = [1, 10, 100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000]
+
+
+def make_model(n=10000, seed=42):
+    rng = np.random.default_rng(seed)
+    hours = rng.integers(0, 24, n)
+    days = rng.integers(0, 7, n)
+    temps = 20 + 8 * np.sin((hours - 6) * np.pi / 12) + rng.normal(0, 2, n)
+    demand = 1.5 + 2.0 * np.exp(-(hours - 19) ** 2 / 10) + 0.2 * np.maximum(0, temps - 22)
+    voltage = 242 - 3.0 * demand + rng.normal(0, 0.5, n)
+    X = np.column_stack([hours, temps, voltage, days]).astype(float)
+    # Same settings as training/train_regression.py
+    model = RandomForestRegressor(n_estimators=20, max_depth=10, n_jobs=-1, random_state=42)
+    model.fit(X, demand)
+    return model, X
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(max_rows: int = ROW_COUNTS[-1]):
+    model, X_train = make_model()
+    rng = np.random.default_rng(0)
+    cores = os.cpu_count() or 1
+
+    print(f"cores={cores}  trees={model.n_estimators}  max_depth={model.max_depth}")
+    print(f"{'rows':>8} {'pickled ms':>11} {'inline ms':>10} {'chunked ms':>11}")
+
+    crossover = None
+    for rows in [r for r in ROW_COUNTS if r <= max_rows]:
+        X = X_train[rng.integers(0, len(X_train), rows)]
+        repeats = 20 if rows <= 1000 else 5
+
+        model.n_jobs = -1
+        t_pickled = best_of(lambda: model.predict(X), repeats)
+
+        model.n_jobs = 1
+        t_inline = best_of(lambda: model.predict(X), repeats)
+        t_chunked = best_of(lambda: predict(model, X, min_rows=2), repeats)
+
+        print(f"{rows:>8} {t_pickled * 1e3:>11.2f} {t_inline * 1e3:>10.2f} {t_chunked * 1e3:>11.2f}")
+        if crossover is None and t_chunked < 0.9 * t_inline:
+            crossover = rows
+
+    if crossover is None:
+        print("Chunking never beat inline prediction (single core?): keep the default threshold.")
+    else:
+        print(f"Crossover at ~{crossover} rows -> POWERGRID_PARALLEL_MIN_ROWS={crossover}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROW_COUNTS[-1])
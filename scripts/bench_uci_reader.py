@@ -0,0 +1,81 @@
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from training.uci_reader import read_uci
+
+# Usage: python -m scripts.bench_uci_reader [path] [rows]
+#
+# Compares the old preprocess read (every column, parse_dates on the
+# combined Date + Time string) with training.uci_reader.read_uci on the
+# same file, and checks both produce the same timestamps. Without a path,
+# or if the path does not exist, a UCI-shaped file with `rows` minute rows
+# (default 2,075,259, the size of the real dataset) is written first.
+
+UCI_ROWS = 2075259
+
+
+def make_uci_file(path: str, rows: int = UCI_ROWS, seed: int = 0):
+    # Same layout as the real file: d/m/yyyy dates without padding, '?' gaps
+    ts = pd.date_range('2006-12-16 17:24:00', periods=rows, freq='min')
+    rng = np.random.default_rng(seed)
+    codes, days = pd.factorize(ts.normalize())
+    labels = np.array([f"{d.day}/{d.month}/{d.year}" for d in days])
+    df = pd.DataFrame({
+        'Date': labels[codes],
+        'Time': ts.strftime('%H:%M:%S'),
+        'Global_active_power': rng.uniform(0.1, 5, rows).round(3),
+        'Global_reactive_power': rng.uniform(0, 0.5, rows).round(3),
+        'Voltage': rng.uniform(225, 250, rows).round(3),
+        'Global_intensity': rng.uniform(0, 20, rows).round(1),
+        'Sub_metering_1': rng.integers(0, 3, rows).astype(float),
+        'Sub_metering_2': rng.integers(0, 3, rows).astype(float),
+        'Sub_metering_3': rng.integers(0, 18, rows).astype(float),
+    })
+    df.loc[rng.random(rows) < 0.0125, ['Global_active_power', 'Voltage']] = np.nan
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, sep=';', index=False, na_rep='?')
+    return path
+
+
+def old_read(path: str):
+    # What training/preprocess.py did before the schema-driven reader
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return pd.read_csv(
+            path, sep=';', na_values=['?', ''], low_memory=False,
+            parse_dates={'datetime': ['Date', 'Time']}, dayfirst=True, infer_datetime_format=True
+        )
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main(path: str = 'data/raw/bench_uci.txt', rows: int = UCI_ROWS):
+    if not Path(path).exists():
+        print(f"Writing {rows} synthetic UCI rows to {path}...")
+        make_uci_file(path, rows)
+
+    old, t_old = timed(old_read, path)
+    new, t_new = timed(read_uci, path)
+
+    same = (old['datetime'].to_numpy() == new['datetime'].to_numpy()).all()
+    mib = lambda df: df.memory_usage(index=True, deep=True).sum() / 2 ** 20
+
+    print(f"rows={len(new)}  file={Path(path).stat().st_size / 2 ** 20:.0f} MiB")
+    print(f"{'reader':>10} {'seconds':>8} {'frame MiB':>10}")
+    print(f"{'old':>10} {t_old:>8.2f} {mib(old):>10.0f}")
+    print(f"{'read_uci':>10} {t_new:>8.2f} {mib(new):>10.0f}")
+    print(f"speed-up x{t_old / t_new:.1f}, timestamps identical: {bool(same)}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(args[0] if args else 'data/raw/bench_uci.txt', int(args[1]) if len(args) > 1 else UCI_ROWS)
@@ -0,0 +1,74 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from training.weather import DEFAULT_TOLERANCE, WeatherIndex, build_index, index_dir
+
+# Usage: python -m scripts.bench_weather [readings_per_site] [sites]
+#
+# Writes a weather CSV of irregular readings for several sites (shuffled,
+# as merged station exports are) and joins it onto a full UCI span of
+# minute timestamps. Compares pd.merge_asof, which has to sort the readings
+# on every run, with building the index once and then only binary-searching
+# it, and checks both give the same temperatures.
+
+START, MINUTES = '2006-12-16 17:24', 2075259
+
+
+def weather_file(path, per_site, sites):
+    rng = np.random.default_rng(0)
+    span = MINUTES * 60 * 10 ** 9
+    frames = []
+    for s in range(sites):
+        ts = pd.Timestamp(START).value + np.sort(rng.integers(0, span, per_site))
+        frames.append(pd.DataFrame({
+            'datetime': pd.to_datetime(ts).strftime('%Y-%m-%d %H:%M:%S'),
+            'site': f'site{s}',
+            'temperature': rng.normal(12, 8, per_site).round(1),
+        }))
+    df = pd.concat(frames).sample(frac=1, random_state=0)
+    df.to_csv(path, index=False)
+
+
+def merge_asof_join(path, minutes, site):
+    w = pd.read_csv(path, parse_dates=['datetime'])
+    w = w[w['site'] == site].sort_values('datetime', kind='stable')
+    out = pd.merge_asof(pd.DataFrame({'datetime': minutes}), w[['datetime', 'temperature']],
+                        on='datetime', tolerance=pd.Timedelta(DEFAULT_TOLERANCE))
+    return out['temperature'].to_numpy()
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main(per_site: int = 1000000, sites: int = 3):
+    minutes = pd.Series(pd.date_range(START, periods=MINUTES, freq='min'))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'weather.csv'
+        weather_file(path, per_site, sites)
+
+        old, t_old = timed(merge_asof_join, path, minutes, 'site1')
+        _, t_build = timed(build_index, path)
+        index, t_open = timed(WeatherIndex, path)
+        new, t_join = timed(index.asof, minutes, 'site1')
+
+        print(f"readings={per_site * sites} ({sites} sites)  minute rows={MINUTES}  "
+              f"index={sum(f.stat().st_size for f in index_dir(path).iterdir()) / 2 ** 20:.0f} MiB")
+        print(f"{'step':>26} {'seconds':>8}")
+        print(f"{'read + sort + merge_asof':>26} {t_old:>8.2f}")
+        print(f"{'build index (once)':>26} {t_build:>8.2f}")
+        print(f"{'open index':>26} {t_open:>8.4f}")
+        print(f"{'as-of join':>26} {t_join:>8.2f}")
+        print(f"repeat runs x{t_old / (t_open + t_join):.0f} faster, "
+              f"same temperatures: {bool(np.array_equal(old, new, equal_nan=True))}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
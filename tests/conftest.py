@@ -0,0 +1,69 @@
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+import app.main as main
+from app.result_cache import ResultCache
+
+
+# ----------------------------
+# SHARED MODELS
+# ----------------------------
+# Small forests trained on synthetic hour / temperature / voltage / dayofweek
+# rows, with an evening demand peak, shared by the app, client and tool tests.
+
+@pytest.fixture
+def feature_rows():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.integers(0, 24, 500),
+        rng.uniform(15, 40, 500),
+        rng.uniform(220, 240, 500),
+        rng.integers(0, 7, 500),
+    ])
+    demand = 1.5 + 2.0 * np.exp(-(X[:, 0] - 19) ** 2 / 10)
+    return X, demand
+
+
+@pytest.fixture
+def tiny_models(feature_rows):
+    X, demand = feature_rows
+    return {
+        "regression": RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0).fit(X, demand),
+        "classifier": RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(
+            X, (demand > np.quantile(demand, 0.75)).astype(int)),
+    }
+
+
+@pytest.fixture
+def band_classifier():
+    # 3-class voltage bands: 2 below 228 V, 1 up to 236 V, 0 above
+    rng = np.random.default_rng(1)
+    X = np.column_stack([rng.integers(0, 24, 500), rng.uniform(15, 40, 500),
+                         rng.uniform(220, 245, 500), rng.integers(0, 7, 500)])
+    bands = np.where(X[:, 2] < 228, 2, np.where(X[:, 2] <= 236, 1, 0))
+    return RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, bands)
+
+
+@pytest.fixture
+def models_dir(tiny_models, tmp_path):
+    path = tmp_path / "models"
+    path.mkdir()
+    for name, model in tiny_models.items():
+        joblib.dump(model, path / f"{name}.pkl")
+    return path
+
+
+@pytest.fixture
+def served_models(tiny_models, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "_models", tiny_models)
+    monkeypatch.setattr(main, "_model_version", "test")
+    monkeypatch.setattr(main, "_result_cache", ResultCache(directory=str(tmp_path / "cache")))
+    return tiny_models
+
+
+@pytest.fixture
+def client(served_models):
+    return TestClient(main.app)
@@ -0,0 +1,194 @@
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.result_cache import ResultCache
+
+
+CSV = b"hour,temperature,voltage,dayofweek\n18,30,229,1\n3,20,238,6\n"
+
+
+def test_repeat_upload_is_served_from_cache(client):
+    first = client.post("/upload-data", files={"file": ("a.csv", CSV)}).json()
+    second = client.post("/upload-data", files={"file": ("a.csv", CSV)}).json()
+    assert first == second
+    stats = client.get("/admin/cache-stats").json()
+    assert stats["hits"] == 1 and stats["entries"] == 1
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_bytes=60)
+    for k in ("a", "b", "c"):
+        cache.put(k, {"predictions": [1.0, 2.0]})   # 26 bytes each
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_result_cache_limit_and_clear_span_processes_sharing_a_directory(tmp_path):
+    # e.g. two API workers, or the API and the Streamlit frontend
+    api = ResultCache(directory=str(tmp_path), max_bytes=60)
+    frontend = ResultCache(directory=str(tmp_path), max_bytes=60)
+    api.put("a", {"predictions": [1.0, 2.0]})
+    frontend.put("b", {"predictions": [1.0, 2.0]})
+    frontend.put("c", {"predictions": [1.0, 2.0]})
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.json")) <= 60
+    assert api.get("a") is None and frontend.get("c") is not None
+
+    api.clear()   # model hot-swap in the API
+    assert frontend.get("b") is None and frontend.get("c") is None
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_gzip_upload_and_compressed_response(client):
+    import gzip
+
+    csv = b"hour,temperature,voltage,dayofweek\n" + b"18,30,229,1\n" * 2000
+    body, content_type = _multipart(csv)
+    resp = client.post(
+        "/upload-data",
+        content=gzip.compress(body),
+        headers={
+            "Content-Type": content_type,
+            "Content-Encoding": "gzip",
+            "Accept-Encoding": "gzip",
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert len(resp.json()["predictions"]) == 2000
+
+    stats = client.get("/admin/compression-stats").json()
+    assert stats["request_bytes_saved"] > 0
+    assert stats["response_bytes_saved"] > 0
+
+
+def test_gzip_bomb_is_rejected_before_it_is_inflated(client):
+    import gzip
+    import tracemalloc
+
+    from app.compression import CompressionMiddleware
+
+    limited = TestClient(CompressionMiddleware(main.app, max_decompressed=64 * 1024))
+    body, content_type = _multipart(b"hour,temperature,voltage,dayofweek\n" + b"0" * (32 * 1024 * 1024))
+    bomb = gzip.compress(body, compresslevel=9)
+    assert len(bomb) < 64 * 1024   # the compressed body alone is under the limit
+
+    tracemalloc.start()
+    resp = limited.post("/upload-data", content=bomb,
+                        headers={"Content-Type": content_type, "Content-Encoding": "gzip"})
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert resp.status_code == 413
+    assert peak < 8 * 1024 * 1024, peak
+
+
+def _multipart(csv: bytes):
+    boundary = "powergridboundary"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="meter.csv"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+    ).encode() + csv + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def test_derived_risk_mode_reports_disagreement(client, monkeypatch):
+    import time
+
+    from app.shadow import ShadowEvaluator
+
+    models = main._models
+    demand = models["regression"].predict([[19, 30, 228, 1], [3, 20, 238, 6]])
+    models["risk_threshold"] = float(demand.mean())
+    monkeypatch.setattr(main, "_risk_audit", ShadowEvaluator({"derived": models["classifier"]}, flush_seconds=0.01))
+
+    peak = client.post("/peak-hour?mode=derived", json={"hour": 19, "temperature": 30, "voltage": 228, "dayofweek": 1}).json()
+    calm = client.post("/peak-hour?mode=derived", json={"hour": 3, "temperature": 20, "voltage": 238, "dayofweek": 6}).json()
+    assert peak["risk"] == "High Load Shedding Risk" and peak["mode"] == "derived"
+    assert calm["risk"] == "Normal / Low Risk"
+
+    for _ in range(100):
+        stats = client.get("/admin/risk-stats").json()
+        if stats["derived_rows_checked"] == 2:
+            break
+        time.sleep(0.02)
+    assert stats["derived_rows_checked"] == 2
+    assert 0.0 <= stats["disagreement_rate"] <= 1.0
+
+
+def test_rules_mode_honours_deadline_and_shadows_every_row(client, band_classifier, monkeypatch):
+    import time
+
+    from app.shadow import ShadowEvaluator
+
+    clf = band_classifier
+    main._models["classifier"] = clf
+    shadow = ShadowEvaluator({"classifier": clf}, served_models=main._models, flush_seconds=0.01)
+    monkeypatch.setattr(main, "_shadow", shadow)
+
+    row = {"hour": 18, "temperature": 30, "dayofweek": 1}
+    clear = client.post("/peak-hour?mode=rules&early_exit=true", json={**row, "voltage": 243}).json()
+    near = client.post("/peak-hour?mode=rules", json={**row, "voltage": 228.2},
+                       headers={"X-Deadline-Ms": "1000"}).json()
+    assert clear["answered_by"] == "rule" and clear["risk"] == "Low Risk"
+    assert "trees_evaluated" not in clear and "tier" not in clear
+    assert near["answered_by"] == "classifier" and "tier" in near and "budget_left_ms" in near
+
+    for _ in range(100):
+        stats = shadow.stats()["classifier"]
+        if stats["rows"] == 2:
+            break
+        time.sleep(0.02)
+    assert stats["rows"] == 2 and stats["recomputed_reference"] >= 1
+    assert stats["agreement"] == 1.0
+    shadow.stop()
+
+
+def test_upload_aggregate_summary(client):
+    csv = (b"datetime,hour,temperature,voltage,dayofweek\n"
+           b"2024-01-01 18:00,18,30,229,0\n"
+           b"2024-01-01 03:00,3,20,238,0\n"
+           b"2024-01-02 19:00,19,31,228,1\n")
+    full = client.post("/upload-data", files={"file": ("a.csv", csv)}).json()["predictions"]
+    summary = client.post("/upload-data?aggregate=true&threshold=2.0", files={"file": ("a.csv", csv)}).json()
+
+    assert summary["rows"] == 3
+    assert summary["peak_demand"] == max(full)
+    assert summary["daily_peak"] == {"2024-01-01": max(full[:2]), "2024-01-02": full[2]}
+    assert summary["mean_by_hour"][3] == full[1] and summary["mean_by_hour"][0] is None
+    assert summary["hours_above_threshold"] == sum(p > 2.0 for p in full)
+    X = [[18, 30, 229, 0], [3, 20, 238, 0], [19, 31, 228, 1]]
+    assert summary["high_risk_hours"] == int((main._models["classifier"].predict(X) == 1).sum())
+
+
+def test_upload_aggregate_counts_the_top_band_of_a_3_class_classifier(client, band_classifier):
+    main._models["classifier"] = band_classifier
+
+    # One high (2), two moderate (1), one low (0)
+    csv = b"hour,temperature,voltage,dayofweek\n18,30,222,0\n3,20,232,0\n19,31,233,1\n12,25,244,2\n"
+    summary = client.post("/upload-data?aggregate=true", files={"file": ("b.csv", csv)}).json()
+    assert summary["high_risk_hours"] == 1
+
+
+def test_single_row_and_upload_run_in_separate_lanes(client):
+    before = client.get("/admin/lanes").json()
+    client.post("/predict-demand", json={"hour": 18, "temperature": 30, "voltage": 229, "dayofweek": 1})
+    client.post("/upload-data", files={"file": ("lanes.csv", CSV)})
+    after = client.get("/admin/lanes").json()
+    assert after["interactive"]["completed"] == before["interactive"]["completed"] + 1
+    assert after["bulk"]["completed"] == before["bulk"]["completed"] + 1
+
+
+def test_memory_introspection(client):
+    mem = client.get("/admin/memory?frames=true").json()
+    reg = mem["models"]["regression"]
+    assert reg["trees"] == 10 and reg["nodes"] > 10 and reg["bytes"] > 0
+    assert mem["process"]["pid"] > 0
+    assert set(mem["gc"]["pauses"]) == {"gen0", "gen1", "gen2"}
+    assert "count" in mem["pandas_frames"]
+
+    assert client.post("/admin/memory/tracemalloc?action=start").json()["tracing"]
+    client.post("/upload-data", files={"file": ("mem.csv", CSV)})
+    snap = client.post("/admin/memory/tracemalloc?action=snapshot&limit=5").json()
+    assert len(snap["top"]) <= 5 and "growth" in snap
+    assert not client.post("/admin/memory/tracemalloc?action=stop").json()["tracing"]
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.batch_score import batch_score, iter_chunks
+from app.utils import FEATURES
+from data.generate_sample_data import generate
+
+
+def test_batch_score_raw_uci_in_order(tmp_path, tiny_models, models_dir):
+    raw = generate(os.path.join(str(tmp_path), 'household_power_consumption.txt'), periods=24 * 20)
+    reg = tiny_models['regression']
+
+    out = os.path.join(str(tmp_path), 'scores.parquet')
+    result = batch_score(raw, out, models_dir=str(models_dir), workers=2, chunk_rows=50, with_risk=True)
+
+    expected = pd.concat(list(iter_chunks(raw, chunk_rows=50)), ignore_index=True)
+    scored = pd.read_parquet(out)
+    assert result['rows'] == len(expected) == len(scored)
+    assert (scored['datetime'].values == expected['datetime'].values).all()
+    np.testing.assert_allclose(scored['predicted_demand'], reg.predict(expected[FEATURES].to_numpy()))
+
+
+def test_batch_score_reports_missing_models_clearly(tmp_path):
+    import pytest
+
+    raw = generate(os.path.join(str(tmp_path), 'household_power_consumption.txt'), periods=24)
+    models_dir = tmp_path / 'models'
+    models_dir.mkdir()
+    with pytest.raises(FileNotFoundError, match='regression.pkl'):
+        batch_score(raw, str(tmp_path / 'scores.csv'), models_dir=str(models_dir), workers=1)
+
+    # Present but unloadable
+    (models_dir / 'regression.pkl').write_bytes(b'not a pickle')
+    with pytest.raises(RuntimeError, match='regression model could not be loaded'):
+        batch_score(raw, str(tmp_path / 'scores.csv'), models_dir=str(models_dir), workers=1)
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from client.powergrid_client import AsyncPowerGridClient, PowerGridClient, PowerGridError
+
+
+ROWS = [(h, 25.0 + h % 5, 225.0 + h % 10, h % 7) for h in range(24)]
+CSV = b"hour,temperature,voltage,dayofweek\n" + b"18,30,229,1\n" * 300
+
+
+def _counting(calls):
+    def hook(request):
+        calls.append(request.url.path)
+    return hook
+
+
+def _acounting(calls):
+    async def hook(request):
+        calls.append(request.url.path)
+    return hook
+
+
+def test_async_calls_are_coalesced_into_one_batch(served_models):
+    calls = []
+
+    async def run():
+        http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app),
+            base_url="http://testserver",
+            event_hooks={"request": [_acounting(calls)]},
+        )
+        async with AsyncPowerGridClient(client=http, batch_window=0.01) as api:
+            return await asyncio.gather(*(api.predict_demand(*r) for r in ROWS))
+
+    got = asyncio.run(run())
+    expected = served_models["regression"].predict(np.array(ROWS, dtype=float))
+    assert np.allclose(got, expected)
+    assert calls == ["/predict-demand/batch"]
+
+
+def test_sync_calls_from_threads_are_coalesced(served_models):
+    calls = []
+    http = TestClient(main.app)
+    http.event_hooks = {"request": [_counting(calls)], "response": []}
+    api = PowerGridClient(client=http, batch_window=0.2)
+
+    got = [None] * len(ROWS)
+
+    def call(i):
+        got[i] = api.predict_demand(*ROWS[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(ROWS))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    expected = served_models["regression"].predict(np.array(ROWS, dtype=float))
+    assert np.allclose(got, expected)
+    assert len(calls) < len(ROWS)
+    assert set(calls) == {"/predict-demand/batch"}
+
+
+def test_retries_on_unavailable():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"predictions": [1.0]})
+
+    http = httpx.Client(transport=httpx.MockTransport(handler), base_url="http://testserver")
+    api = PowerGridClient(client=http, backoff=0.001)
+    assert api.predict_demand_many([ROWS[0]]) == [1.0]
+    assert len(attempts) == 3
+
+
+def test_posts_are_not_retried_after_the_server_may_have_acted():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) < 2:
+            return httpx.Response(504)
+        return httpx.Response(200, json={"predictions": [1.0]})
+
+    http = httpx.Client(transport=httpx.MockTransport(handler), base_url="http://testserver")
+    with pytest.raises(PowerGridError) as err:
+        PowerGridClient(client=http, backoff=0.001).predict_demand_many([ROWS[0]])
+    assert err.value.status_code == 504 and len(attempts) == 1
+
+    api = PowerGridClient(client=http, backoff=0.001, retry_posts=True)
+    assert api.predict_demand_many([ROWS[0]]) == [1.0]
+
+
+def test_async_close_waits_for_full_batches_in_flight(served_models):
+    async def run():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://testserver")
+        api = AsyncPowerGridClient(client=http, batch_window=10, max_batch=2)
+        calls = [asyncio.ensure_future(api.predict_demand(*r)) for r in ROWS[:2]]
+        await asyncio.sleep(0)      # both queued: the full batch is sent
+        await api.aclose()
+        assert http.is_closed and not api._tasks
+        return [c.result() for c in calls]
+
+    got = asyncio.run(run())
+    assert np.allclose(got, served_models["regression"].predict(np.array(ROWS[:2], dtype=float)))
+
+
+def test_iter_upload_streams_predictions(served_models):
+    api = PowerGridClient(client=TestClient(main.app))
+    streamed = list(api.iter_upload(CSV, compress=True))
+    assert len(streamed) == 300
+    assert streamed == api.upload(CSV)["predictions"]
+
+    with pytest.raises(PowerGridError) as err:
+        list(api.iter_upload(b"hour,temperature\n1,2\n"))
+    assert err.value.status_code == 400
@@ -1,4 +1,5 @@
 import os
+import pytest
 from data.generate_sample_data import generate
 from training.preprocess import preprocess
 
@@ -18,3 +19,269 @@ def test_generate_and_preprocess(tmp_path):
     assert 'demand' in df.columns
     # Ensure no nulls in demand column were left after preprocessing
     assert df['demand'].isnull().sum() == 0
+
+
+def _minute_file(path, shuffle=False):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    ts = pd.date_range('2020-01-01', periods=3 * 24 * 60 + 17, freq='min')
+    df = pd.DataFrame({
+        'Date': ts.strftime('%d/%m/%Y'),
+        'Time': ts.strftime('%H:%M:%S'),
+        'Global_active_power': rng.uniform(0.2, 5.0, len(ts)).round(3),
+        'Voltage': rng.uniform(225, 245, len(ts)).round(2),
+    })
+    df.loc[rng.random(len(df)) < 0.05, 'Global_active_power'] = np.nan
+    df.loc[rng.random(len(df)) < 0.05, 'Voltage'] = np.nan
+    if shuffle:
+        df = df.sample(frac=1.0, random_state=0)
+    df.to_csv(path, sep=';', index=False, na_rep='?')
+    return path
+
+
+def test_streaming_preprocess_matches_in_memory(tmp_path):
+    import pandas as pd
+    from training.preprocess import preprocess, preprocess_streaming
+
+    for shuffle in (False, True):
+        raw = _minute_file(os.path.join(str(tmp_path), f'raw_{shuffle}.txt'), shuffle)
+        expected = pd.read_csv(preprocess(raw, os.path.join(str(tmp_path), 'full.csv')))
+        # 997 rows per chunk: hours straddle chunk boundaries
+        got = pd.read_csv(preprocess_streaming(raw, os.path.join(str(tmp_path), 'stream.csv'), chunksize=997))
+        assert list(got.columns) == list(expected.columns)
+        assert (got['datetime'] == expected['datetime']).all()
+        pd.testing.assert_frame_equal(got.drop(columns='datetime'), expected.drop(columns='datetime'))
+
+
+def test_uci_reader_parses_unique_dates_and_float32(tmp_path):
+    import numpy as np
+    import pandas as pd
+    from training.uci_reader import read_uci
+
+    path = os.path.join(str(tmp_path), 'uci.txt')
+    with open(path, 'w') as f:
+        f.write('Date;Time;Global_active_power;Global_reactive_power;Voltage;Global_intensity\n')
+        f.write('16/12/2006;17:24:00;4.216;0.418;234.840;18.400\n')
+        f.write('1/1/2007;00:00:00;?;?;?;?\n')
+        f.write('31/2/2007;10:00:00;1.0;0.1;230.0;4.0\n')   # invalid date
+        f.write('1/1/2007;23:59:00;2.5;0.1;241.5;9.0\n')
+    df = read_uci(path)
+
+    assert list(df.columns) == ['datetime', 'Global_active_power', 'voltage']
+    assert df['Global_active_power'].dtype == np.float32
+    expected = pd.to_datetime(['2006-12-16 17:24', '2007-01-01 00:00', None, '2007-01-01 23:59'])
+    assert (df['datetime'].isna().to_numpy() == expected.isna()).all()
+    assert (df['datetime'].dropna().to_numpy() == expected.dropna().to_numpy()).all()
+    assert np.isnan(df['voltage'][1])
+
+
+def test_parallel_byte_ranges_match_preprocess(tmp_path):
+    import pandas as pd
+    from training.preprocess import preprocess, preprocess_parallel, split_ranges
+
+    raw = _minute_file(os.path.join(str(tmp_path), 'raw.txt'))
+    ranges = split_ranges(raw, 7)
+    assert ranges[0][0] == len(open(raw, 'rb').readline())
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert ranges[-1][1] == os.path.getsize(raw)
+
+    expected = pd.read_csv(preprocess(raw, os.path.join(str(tmp_path), 'full.csv')))
+    got = pd.read_csv(preprocess_parallel(raw, os.path.join(str(tmp_path), 'par.csv'), workers=2, range_bytes=20000))
+    assert (got['datetime'] == expected['datetime']).all()
+    pd.testing.assert_frame_equal(got.drop(columns='datetime'), expected.drop(columns='datetime'), rtol=1e-12)
+
+
+def test_incremental_preprocess_appends_tail(tmp_path, capsys, monkeypatch):
+    import json
+    import pandas as pd
+    import training.preprocess as pre
+    from training.preprocess import preprocess, watermark_path
+
+    # A rebuild streams the file; only appended tails are read in one piece
+    read_range = pre._read_raw_range
+
+    def tail_only(raw_path, start, end):
+        assert start > 0, 'the whole raw file was loaded into memory'
+        return read_range(raw_path, start, end)
+    monkeypatch.setattr(pre, '_read_raw_range', tail_only)
+
+    full = _minute_file(os.path.join(str(tmp_path), 'full.txt'))
+    lines = open(full, 'rb').read().splitlines(keepends=True)
+    raw = os.path.join(str(tmp_path), 'raw.txt')
+    out = os.path.join(str(tmp_path), 'processed.csv')
+
+    # Day one ends mid-hour and mid-line; the rest is appended in two steps
+    cut = 1 + 24 * 60 + 37
+    with open(raw, 'wb') as f:
+        f.writelines(lines[:cut])
+        f.write(lines[cut][:5])
+    preprocess(raw, out, incremental=True)
+    assert 'rebuild' in capsys.readouterr().out.lower()
+    offset = json.load(open(watermark_path(out)))['offset']
+
+    with open(raw, 'ab') as f:
+        f.write(lines[cut][5:])
+        f.writelines(lines[cut + 1:cut + 500])
+    preprocess(raw, out, incremental=True)
+    with open(raw, 'ab') as f:
+        f.writelines(lines[cut + 500:])
+    preprocess(raw, out, incremental=True)
+    logs = capsys.readouterr().out.lower()
+    assert 'rebuild' not in logs and 'appended' in logs
+    assert json.load(open(watermark_path(out)))['offset'] > offset
+
+    expected_path = preprocess(full, os.path.join(str(tmp_path), 'expected.csv'))
+    expected = pd.read_csv(expected_path)
+    got = pd.read_csv(out)
+    assert (got['datetime'] == expected['datetime']).all()
+    pd.testing.assert_frame_equal(got.drop(columns='datetime'), expected.drop(columns='datetime'), rtol=1e-12)
+    from training.rollups import read_rollup
+    pd.testing.assert_frame_equal(read_rollup(out, '15min'), read_rollup(expected_path, '15min'), rtol=1e-12)
+
+    # Rewriting history is detected by the prefix checksum
+    with open(raw, 'r+b') as f:
+        f.seek(len(lines[0]))
+        f.write(b'17')
+    preprocess(raw, out, incremental=True)
+    assert 'rewritten' in capsys.readouterr().out
+
+
+def test_columnar_artifact_matches_csv_and_goes_stale(tmp_path):
+    import time
+    import numpy as np
+    import pandas as pd
+    from training.columnar import columnar_dir, load_columnar
+
+    raw = _minute_file(os.path.join(str(tmp_path), 'raw.txt'))
+    out = os.path.join(str(tmp_path), 'processed.csv')
+    preprocess(raw, out)
+    assert (columnar_dir(out) / 'meta.json').exists()
+
+    data = load_columnar(out)
+    df = pd.read_csv(out, parse_dates=['datetime'])
+    assert data['meta']['rows'] == len(df)
+    assert isinstance(data['X'], np.memmap) and data['X'].dtype == np.float32
+    assert (data['datetime'].view('datetime64[ns]') == df['datetime'].to_numpy()).all()
+    assert (data['hour'] == df['datetime'].dt.hour).all()
+    assert (data['dayofweek'] == df['datetime'].dt.dayofweek).all()
+    np.testing.assert_allclose(data['X'][:, 2], df['voltage'], rtol=1e-6)
+    np.testing.assert_array_equal(data['demand'], df['demand'])
+    from training.features import lag_features
+    np.testing.assert_array_equal(data['lags'], lag_features(df['datetime'], df['demand']))
+
+    # Any rewrite of the CSV invalidates the arrays, so trainers fall back
+    time.sleep(0.01)
+    df.head(10).to_csv(out, index=False)
+    assert load_columnar(out) is None
+
+
+def test_rollups_merge_across_modes_and_answer_ranges(tmp_path):
+    import pandas as pd
+    import pytest
+    from training.rollups import RESOLUTIONS, query, read_rollup, summarize
+
+    raw = _minute_file(os.path.join(str(tmp_path), 'raw.txt'))
+    mem = preprocess(raw, os.path.join(str(tmp_path), 'mem.csv'))
+    streamed = preprocess(raw, os.path.join(str(tmp_path), 'streamed.csv'), chunksize=1000)
+    for resolution in RESOLUTIONS:
+        pd.testing.assert_frame_equal(read_rollup(streamed, resolution), read_rollup(mem, resolution), rtol=1e-12)
+
+    hourly = read_rollup(mem, 'hourly')
+    processed = pd.read_csv(mem)
+    assert len(hourly) == len(processed)
+    pd.testing.assert_series_equal(hourly['demand_mean'], processed['demand'], check_names=False, rtol=1e-12)
+
+    minutes = pd.read_csv(raw, sep=';', na_values=['?'])
+    minutes['datetime'] = pd.to_datetime(minutes['Date'] + ' ' + minutes['Time'], format='%d/%m/%Y %H:%M:%S')
+    start, end = '2020-01-01 05:15', '2020-01-03 22:45'
+    power = minutes[(minutes['datetime'] >= start) & (minutes['datetime'] < end)]['Global_active_power'].dropna()
+
+    summary = summarize(mem, start, end)
+    assert summary['n'] == len(power)
+    # Raw values are read as float32, so compare to float32 precision
+    assert summary['demand_mean'] == pytest.approx(power.mean(), rel=1e-6)
+    assert summary['demand_max'] == pytest.approx(power.max(), rel=1e-6)
+    assert summary['demand_min'] == pytest.approx(power.min(), rel=1e-6)
+    assert summary['energy_kwh'] == pytest.approx(power.sum() / 60, rel=1e-6)
+    # Whole days and hours in the middle, 15-minute buckets only at the edges
+    assert summary['rows_read']['daily'] == 1 and summary['rows_read']['15min'] == 3 + 3
+
+    assert query(mem, '2020-01-01', '2020-01-04', max_points=100)['datetime'].diff().max() == pd.Timedelta(hours=1)
+
+
+def test_rollup_spool_keeps_only_open_buckets_in_memory(tmp_path):
+    import numpy as np
+    import pandas as pd
+    from training.rollups import RESOLUTIONS, RollupSpool, minute_partials, read_rollup, write_rollups
+
+    ts = pd.date_range('2020-01-01', periods=20 * 24 * 60, freq='min')
+    df = pd.DataFrame({'datetime': ts, 'Global_active_power': np.sin(np.arange(len(ts)) / 97.0) + 2})
+    chunks = [df.iloc[i:i + 5000] for i in range(0, len(df), 5000)]
+    # One chunk arrives late: its buckets were already written
+    chunks.append(chunks.pop(1))
+
+    spool = RollupSpool(os.path.join(str(tmp_path), 'spooled.csv'), chunk_rows=100)
+    for chunk in chunks:
+        spool.add(minute_partials(chunk))
+        assert all(len(spool.carry[r]) == 1 for r in RESOLUTIONS)
+    spool.finish()
+    assert not list(spool.dir.glob('*.partial'))
+
+    mem = os.path.join(str(tmp_path), 'mem.csv')
+    write_rollups(minute_partials(df), mem)
+    for resolution in RESOLUTIONS:
+        pd.testing.assert_frame_equal(read_rollup(spool.processed_path, resolution), read_rollup(mem, resolution), rtol=1e-12)
+
+
+def test_weather_asof_join_across_modes(tmp_path, capsys):
+    import numpy as np
+    import pandas as pd
+    from training.preprocess import preprocess, preprocess_parallel, preprocess_streaming
+    from training.weather import WeatherIndex
+
+    raw = _minute_file(os.path.join(str(tmp_path), 'raw.txt'))
+    # Two sites read at irregular times, shuffled; site a is silent for 5h on day two
+    rng = np.random.default_rng(1)
+    frames = []
+    for site in ('a', 'b'):
+        ts = pd.Timestamp('2019-12-31 23:00') + pd.to_timedelta(np.sort(rng.integers(0, 80 * 3600, 400)), unit='s')
+        if site == 'a':
+            ts = ts[(ts < pd.Timestamp('2020-01-02 03:00')) | (ts >= pd.Timestamp('2020-01-02 08:00'))]
+        frames.append(pd.DataFrame({'datetime': ts, 'site': site, 'temperature': rng.normal(10, 5, len(ts)).round(2)}))
+    readings = pd.concat(frames)
+    weather = os.path.join(str(tmp_path), 'weather.csv')
+    readings.sample(frac=1, random_state=0).to_csv(weather, index=False)
+
+    index = WeatherIndex(weather)
+    assert 'indexing' in capsys.readouterr().out.lower()
+    a = readings[readings['site'] == 'a'].sort_values('datetime', kind='stable')
+    first = a.iloc[0]
+    got = index.asof([first['datetime'] - pd.Timedelta(seconds=1), first['datetime'],
+                      first['datetime'] + pd.Timedelta(minutes=1), pd.Timestamp('2020-01-02 07:30'), pd.NaT], 'a')
+    assert np.isnan(got[0]) and got[1] == got[2] == first['temperature']
+    assert np.isnan(got[3]) and np.isnan(got[4])    # older than the 2h tolerance; NaT
+    assert not np.isnan(index.asof(['2020-01-02 07:30'], 'a', '6h')[0])
+    with pytest.raises(ValueError):
+        index.asof(['2020-01-02'], None)            # two sites: one has to be picked
+
+    # Repeated runs reuse the sorted index
+    out = preprocess(raw, os.path.join(str(tmp_path), 'full.csv'), weather_path=weather, site='a')
+    assert 'indexing' not in capsys.readouterr().out.lower()
+    expected = pd.read_csv(out, parse_dates=['datetime'])
+    from training.uci_reader import read_uci
+    minutes = read_uci(raw).dropna(subset=['Global_active_power'])
+    minutes = minutes[minutes['datetime'].dt.floor('h') == '2020-01-01 10:00'][['datetime']]
+    joined = pd.merge_asof(minutes, a[['datetime', 'temperature']], on='datetime', tolerance=pd.Timedelta('2h'))
+    row = expected[expected['datetime'] == '2020-01-01 10:00'].iloc[0]
+    assert row['temperature'] == pytest.approx(joined['temperature'].mean())
+    gap = expected[(expected['datetime'] >= '2020-01-02 06:00') & (expected['datetime'] < '2020-01-02 08:00')]
+    assert gap['temperature'].isna().all() and expected['demand'].notna().all()
+
+    streamed = pd.read_csv(preprocess_streaming(raw, os.path.join(str(tmp_path), 'stream.csv'), chunksize=997,
+                                                weather=(weather, 'a', '2h')), parse_dates=['datetime'])
+    parallel = pd.read_csv(preprocess_parallel(raw, os.path.join(str(tmp_path), 'par.csv'), workers=2, range_bytes=20000,
+                                               weather=(weather, 'a', '2h')), parse_dates=['datetime'])
+    for got in (streamed, parallel):
+        pd.testing.assert_frame_equal(got, expected, rtol=1e-12)
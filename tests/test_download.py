@@ -0,0 +1,158 @@
+import hashlib
+import random
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data.download_uci import ChecksumError, download_and_extract
+
+
+def _zip(tmp_path):
+    rng = random.Random(0)
+    text = ''.join(f'16/12/2006;17:{i % 60:02d}:00;{rng.uniform(0, 9):.3f};0.1;{rng.uniform(225, 245):.2f};18.0\n'
+                   for i in range(40000))
+    text = 'Date;Time;Global_active_power;Global_reactive_power;Voltage;Global_intensity\n' + text
+    path = tmp_path / 'src.zip'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('household_power_consumption.txt', text)
+    return path, text
+
+
+def _server(payload, drop_first_at=None, honour_range=True, etag=None, end_first_at=None):
+    # Serves payload with Range support; the first response can be cut off
+    # after drop_first_at bytes, as a dropped connection would be, or end
+    # cleanly after end_first_at bytes (no Content-Length to contradict)
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            rng = self.headers.get('Range')
+            requests_seen.append(rng)
+            start = int(rng[len('bytes='):].rstrip('-')) if rng and honour_range else 0
+            if start >= len(payload):
+                self.send_response(416)
+                self.end_headers()
+                return
+            body = payload[start:]
+            self.send_response(206 if start else 200)
+            if etag:
+                self.send_header('ETag', etag)
+            if end_first_at is not None and len(requests_seen) == 1:
+                body = body[:end_first_at]
+            else:
+                self.send_header('Content-Length', str(len(body)))
+            if start:
+                self.send_header('Content-Range', f'bytes {start}-{len(payload) - 1}/{len(payload)}')
+            self.end_headers()
+            if drop_first_at is not None and len(requests_seen) == 1:
+                self.wfile.write(body[:drop_first_at])
+                self.wfile.flush()
+                self.connection.close()
+                return
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/data.zip', requests_seen
+
+
+def test_download_resumes_verifies_and_extracts(tmp_path):
+    src, text = _zip(tmp_path)
+    payload = src.read_bytes()
+    sha = hashlib.sha256(payload).hexdigest()
+    server, url, seen = _server(payload, drop_first_at=len(payload) // 3)
+    try:
+        out = download_and_extract(url, tmp_path / 'raw' / 'household_power_consumption.txt', sha)
+    finally:
+        server.shutdown()
+    assert out.read_text() == text
+    # Resumed from the last whole chunk written before the drop
+    resumed_at = int(seen[1][len('bytes='):-1])
+    assert seen[0] is None and 0 < resumed_at <= len(payload) // 3
+    assert not (tmp_path / 'raw' / 'household_power_consumption.zip').exists()
+
+    # A .part left by an earlier run is resumed too, from a file:// mirror
+    out = tmp_path / 'mirror' / 'household_power_consumption.txt'
+    out.parent.mkdir()
+    (out.parent / 'household_power_consumption.zip.part').write_bytes(payload[:1000])
+    download_and_extract(src.as_uri(), out, sha, keep_zip=True)
+    assert out.read_text() == text
+    assert (out.parent / 'household_power_consumption.zip').read_bytes() == payload
+
+
+def test_download_rejects_bad_checksum_and_ignored_range(tmp_path):
+    src, text = _zip(tmp_path)
+    payload = src.read_bytes()
+    out = tmp_path / 'raw' / 'household_power_consumption.txt'
+    with pytest.raises(ChecksumError):
+        download_and_extract(src.as_uri(), out, '0' * 64)
+    assert not out.exists() and not list(out.parent.glob('*.part'))
+
+    # A server without Range support makes the download start over
+    out.parent.mkdir(exist_ok=True)
+    (out.parent / 'household_power_consumption.zip.part').write_bytes(b'junk')
+    server, url, seen = _server(payload, honour_range=False)
+    try:
+        download_and_extract(url, out, hashlib.sha256(payload).hexdigest())
+    finally:
+        server.shutdown()
+    assert out.read_text() == text and seen == ['bytes=4-']
+
+
+def test_download_resumes_a_short_stream_and_restarts_a_changed_source(tmp_path):
+    src, text = _zip(tmp_path)
+    payload = src.read_bytes()
+    sha = hashlib.sha256(payload).hexdigest()
+    out = tmp_path / 'raw' / 'household_power_consumption.txt'
+    out.parent.mkdir()
+    part = out.parent / 'household_power_consumption.zip.part'
+
+    # A resumed response that ends early without any error is resumed again
+    part.write_bytes(payload[:1000])
+    (out.parent / 'household_power_consumption.zip.part.json').write_text('{"etag": "\\"v1\\""}')
+    server, url, seen = _server(payload, etag='"v1"', end_first_at=5000)
+    try:
+        download_and_extract(url, out, sha)
+    finally:
+        server.shutdown()
+    assert out.read_text() == text and seen == ['bytes=1000-', 'bytes=6000-']
+
+    # A .part of an older version of the file is thrown away, not spliced
+    out.unlink()
+    part.write_bytes(payload[:1000])
+    (out.parent / 'household_power_consumption.zip.part.json').write_text('{"etag": "\\"v0\\""}')
+    server, url, seen = _server(payload, etag='"v1"')
+    try:
+        download_and_extract(url, out, sha)
+    finally:
+        server.shutdown()
+    assert out.read_text() == text and seen == ['bytes=1000-', None]
+    assert not list(out.parent.glob('*.part*'))
+
+
+def test_existing_zip_is_rehashed_and_replaced_when_it_does_not_match(tmp_path):
+    from data.download_uci import download
+
+    src, _ = _zip(tmp_path)
+    payload = src.read_bytes()
+    sha = hashlib.sha256(payload).hexdigest()
+    dest = tmp_path / 'raw' / 'household_power_consumption.zip'
+    dest.parent.mkdir()
+
+    # A truncated ZIP from an earlier run is downloaded again
+    dest.write_bytes(payload[:1000])
+    assert download(src.as_uri(), dest, sha) == dest
+    assert dest.read_bytes() == payload
+
+    # A matching one is kept as is; a source that never matches still fails
+    mtime = dest.stat().st_mtime_ns
+    download(src.as_uri(), dest, sha.upper())
+    assert dest.stat().st_mtime_ns == mtime
+    with pytest.raises(ChecksumError):
+        download(src.as_uri(), dest, '0' * 64)
+    assert not dest.exists()
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from app.utils import predict_demand_batch
+from training.features import FEATURES, add_features, calendar, feature_matrix, single_row
+
+
+def test_calendar_matches_pandas_accessors():
+    ts = pd.Series(pd.date_range('1969-12-25', '2031-01-01', freq='37h')).astype('datetime64[ns]')
+    ts.iloc[5] = pd.NaT
+    hour, dayofweek = calendar(ts)
+    ok = ts.notna().to_numpy()
+    assert (hour[ok] == ts[ok].dt.hour).all() and (dayofweek[ok] == ts[ok].dt.dayofweek).all()
+    assert hour[5] == -1 and dayofweek[5] == -1
+
+    # Timezone-aware timestamps use local wall-clock time
+    local = pd.Series(pd.to_datetime(['2024-01-06 18:00+05:00', '2024-01-08 03:00+05:00']))
+    for values in (local, pd.DatetimeIndex(local), local.dt.tz_convert('America/New_York')):
+        hour, dayofweek = calendar(values)
+        expected = pd.Series(values)
+        assert hour.tolist() == expected.dt.hour.tolist() and dayofweek.tolist() == expected.dt.dayofweek.tolist()
+    assert calendar(local)[0].tolist() == [18, 3] and calendar(local)[1].tolist() == [5, 0]
+
+
+def test_add_features_from_date_and_time_uses_training_profiles():
+    df = pd.DataFrame({'Date': ['16/12/2006', '17/12/2006', 'bad'], 'Time': ['17:24:00', '15:00:00', '00:00:00']})
+    out = add_features(df)
+    assert len(out) == 2
+    assert out['hour'].tolist() == [17, 15] and out['dayofweek'].tolist() == [5, 6]
+    # Weekend +5 C, 14:00-18:00 +3 C; +10 V from 17:00, as in preprocess
+    assert out['temperature'].tolist() == [33, 33] and out['voltage'].tolist() == [240, 230]
+    X = feature_matrix(datetime=pd.to_datetime(['2006-12-16 17:24', '2006-12-17 15:00']))
+    np.testing.assert_array_equal(X, out[FEATURES].to_numpy(dtype=float))
+
+
+def test_single_row_buffer_and_batch_csv_use_all_features(feature_rows):
+    X, _ = feature_rows
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, X[:, 0] + X[:, 3])
+
+    row = single_row(18, 30.5, 229.0, 1)
+    assert row.dtype == np.float32 and single_row(3, 20.0, 238.0, 6) is row
+    assert model.predict(row)[0] == model.predict([[3, 20.0, 238.0, 6]])[0]
+
+    csv = b"datetime,temperature,voltage\n2024-01-06 18:00,30,229\n2024-01-08 03:00,20,238\n"
+    expected = model.predict([[18, 30, 229, 5], [3, 20, 238, 0]])
+    np.testing.assert_allclose(predict_demand_batch(csv, {'regression': model}), expected)
+
+
+def _hourly_history(hours=900, seed=1):
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range('2021-03-01', periods=hours, freq='h')
+    ts = ts[rng.random(hours) > 0.1]                       # missing hours
+    demand = rng.uniform(0.2, 5.0, len(ts))
+    demand[rng.random(len(ts)) < 0.05] = np.nan            # missing readings
+    return ts, demand
+
+
+def test_online_lag_state_matches_offline_features_exactly():
+    from training.features import LAG_FEATURES, LagStateStore, lag_features
+
+    ts, demand = _hourly_history()
+    offline = lag_features(ts, demand)
+    state = LagStateStore()
+    online = []
+    for t, d in zip(ts, demand):
+        online.append(state.features('feeder-1', t))
+        state.observe('feeder-1', t, d)
+    np.testing.assert_array_equal(np.array(online), offline)
+    assert offline.shape == (len(ts), len(LAG_FEATURES))
+
+    # Same definition as shifting the hourly series
+    series = pd.Series(demand, index=ts).asfreq('h')
+    np.testing.assert_allclose(offline[:, 1], series.shift(24).reindex(ts), equal_nan=True)
+    np.testing.assert_allclose(offline[:, 4], series.shift(1).rolling(168, min_periods=1).mean().reindex(ts),
+                               rtol=1e-12, equal_nan=True)
+
+
+def test_lag_model_served_from_observed_history(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import app.main as main
+    from training.features import LAG_FEATURES, LagStateStore, lag_features
+
+    ts, demand = _hourly_history()
+    demand = np.nan_to_num(demand, nan=1.0)
+    lags = lag_features(ts, demand)
+    X = np.column_stack([feature_matrix(datetime=ts), lags])
+    ok = np.isfinite(X).all(axis=1)
+    lag_model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X[ok], demand[ok])
+    base = RandomForestRegressor(n_estimators=5, random_state=0).fit(X[ok, :4], demand[ok])
+    monkeypatch.setattr(main, '_models', {'regression': base, 'regression_lag': lag_model})
+    monkeypatch.setattr(main, '_lag_state', LagStateStore())
+    submitted = []
+    monkeypatch.setattr(main._shadow, 'submit', lambda kind, row, *a: submitted.append((kind, len(row))))
+    client = TestClient(main.app)
+
+    history = [{'feeder': 'f1', 'datetime': str(t), 'demand': float(d)} for t, d in zip(ts[:-1], demand[:-1])]
+    assert client.post('/observe', json={'observations': history}).json()['recorded'] == len(history)
+
+    target = ts[-1]
+    hour, temperature, voltage, dayofweek = feature_matrix(datetime=[target])[0]
+    req = {'hour': int(hour), 'temperature': temperature, 'voltage': voltage, 'dayofweek': int(dayofweek),
+           'feeder': 'f1', 'datetime': str(target)}
+    body = client.post('/predict-demand', json=req).json()
+    assert body['lag_features'] is True
+    expected = lag_model.predict(np.concatenate([X[-1, :4], lags[-1]]).astype(np.float32)[None, :])[0]
+    assert body['predicted_demand'] == expected
+    assert submitted == [('regression_lag', 4 + len(LAG_FEATURES))]
+
+    # A deadline is served by the base-model cascade, and says so
+    body = client.post('/predict-demand', json=req, headers={'X-Deadline-Ms': '1000'}).json()
+    assert body['lag_features'] is False and body['lag_reason'].startswith('X-Deadline-Ms')
+    assert body['tier'] in ('full', 'truncated', 'surrogate')
+    assert submitted[-1] == ('regression', 4)
+
+    body = client.post('/predict-demand', json={**req, 'feeder': 'unknown'}).json()
+    assert body['lag_features'] is False and body['lag_reason'] == 'incomplete feeder history'
+    assert client.get('/admin/lag-state').json()['feeders'] == 1
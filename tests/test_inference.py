@@ -0,0 +1,218 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+import app.inference as inference
+
+
+@pytest.fixture
+def regressor(feature_rows):
+    X, demand = feature_rows
+    return RandomForestRegressor(n_estimators=5, max_depth=6, n_jobs=-1, random_state=0).fit(X, demand), X
+
+
+def test_chunked_predict_matches_inline(regressor, monkeypatch):
+    model, X = regressor
+    inference.pin_single_threaded(model)
+    assert model.n_jobs == 1
+
+    monkeypatch.setattr(inference, "CPU_BUDGET", 4)
+    expected = model.predict(X)
+    got = inference.predict(model, X, min_rows=50, workers=4)
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_early_exit_classifier_matches_full_vote():
+    rng = np.random.default_rng(1)
+    X = rng.uniform(0, 24, size=(2000, 4))
+    y = (X[:, 0] + rng.normal(0, 2, 2000) > 12).astype(int)
+    clf = RandomForestClassifier(n_estimators=20, max_depth=10, random_state=0).fit(X, y)
+
+    labels, used = inference.classify_early_exit(clf, X)
+    np.testing.assert_array_equal(labels, clf.predict(X))
+    assert used.mean() < clf.n_estimators
+    assert inference.early_exit_stats()["classifier"]["avg_trees_evaluated"] < clf.n_estimators
+
+
+def test_early_exit_regressor_within_tolerance(regressor):
+    model, X = regressor
+    y, used = inference.regress_early_exit(model, X, tolerance=0.05, z=3.0, min_trees=2)
+    assert used.min() >= 2
+    # Rows evaluated on every tree are exact; the rest stay near the full mean
+    full = model.predict(X)
+    np.testing.assert_allclose(y[used == model.n_estimators], full[used == model.n_estimators])
+    assert np.mean(np.abs(y - full)) < 0.05
+
+
+def test_cascade_picks_tier_by_deadline(regressor):
+    from app.cascade import Cascade
+
+    model, _ = regressor
+    model.n_jobs = 1
+    cascade = Cascade(model, "regression")
+    row = [[18, 25.0, 230.0, 2]]
+
+    _, tier = cascade.predict(row, budget_ms=1e-6)
+    assert tier == "surrogate"
+    y_full, tier = cascade.predict(row, budget_ms=1e6)
+    assert tier == "full"
+    assert cascade.k < len(model.estimators_)
+
+
+def test_cascade_reprobes_a_tier_skipped_after_a_spike(regressor, monkeypatch):
+    import time
+
+    import app.cascade as cascade_mod
+
+    model, _ = regressor
+    model.n_jobs = 1
+    cascade = cascade_mod.Cascade(model, "regression")
+    row = np.array([[18, 25.0, 230.0, 2]])
+    budget = 10 * cascade.latency["full"].estimate()
+
+    # One 1 s sample (a GC pause, say) pushes "full" over the budget
+    cascade.latency["full"].update(1000.0)
+    assert cascade.predict(row, budget)[1] != "full"
+
+    # Once it has been skipped long enough it is re-timed off the request path
+    monkeypatch.setattr(cascade_mod, "CASCADE_REPROBE_SECONDS", 0.0)
+    cascade.predict(row, budget)
+    for _ in range(100):
+        if cascade.stats()["reprobes"]:
+            break
+        time.sleep(0.01)
+    assert cascade.stats()["reprobes"] >= 1
+    assert cascade.predict(row, budget)[1] == "full"
+
+
+def test_shadow_scores_off_path_and_drops_when_full(regressor):
+    import time
+
+    from app.shadow import ShadowEvaluator
+
+    model, X = regressor
+    model.n_jobs = 1
+    shadow = ShadowEvaluator({"regression": model}, capacity=100, batch_size=10, flush_seconds=0.05)
+    served = model.predict(X[:50])
+    for row, y in zip(X[:50], served):
+        assert shadow.submit("regression", row, y)
+    for _ in range(100):
+        if shadow.stats()["regression"]["rows"] == 50:
+            break
+        time.sleep(0.02)
+    stats = shadow.stats()["regression"]
+    assert stats["rows"] == 50 and stats["mae"] == 0.0
+
+    shadow.stop()
+    shadow._thread.join()
+
+    class Stalled(ShadowEvaluator):
+        def _run(self):   # worker busy elsewhere: nothing leaves the queue
+            self._stop.wait()
+
+    full = Stalled({"regression": model}, capacity=1)
+    assert full.submit("regression", X[0], 0.0)
+    assert not full.submit("regression", X[1], 0.0)
+    assert full.stats()["dropped"] == 1
+
+
+def test_shadow_scores_against_the_full_served_answer_and_drains_on_stop(regressor):
+    from app.shadow import ShadowEvaluator
+
+    model, X = regressor
+    model.n_jobs = 1
+    served = model.predict(X[:40])
+    approx = served + 1.0   # e.g. a truncated-forest / surrogate answer
+
+    shadow = ShadowEvaluator({"regression": model}, batch_size=1000, flush_seconds=60,
+                             served_models={"regression": model})
+    for i, row in enumerate(X[:40]):
+        shadow.submit("regression", row, approx[i] if i % 2 else served[i], exact=not i % 2)
+    # stop() before the first flush: queued rows are still scored
+    shadow.stop()
+    shadow._thread.join()
+    assert not shadow.submit("regression", X[0], served[0])
+    stats = shadow.stats()
+    assert stats["dropped"] == 1
+    assert stats["regression"]["rows"] == 40 and stats["regression"]["recomputed_reference"] == 20
+    assert stats["regression"]["mae"] == 0.0
+
+    # Without the served models, approximate answers are skipped, not scored
+    shadow = ShadowEvaluator({"regression": model}, batch_size=1000, flush_seconds=60)
+    for i, row in enumerate(X[:40]):
+        shadow.submit("regression", row, approx[i], exact=not i % 2)
+    shadow.stop()
+    shadow._thread.join()
+    stats = shadow.stats()["regression"]
+    assert stats["rows"] == 20 and stats["skipped_inexact"] == 20
+
+
+def test_rule_cascade_short_circuits_clear_voltages():
+    from app.rules import classify_with_rules, rule_labels, supports_rules
+
+    rng = np.random.default_rng(2)
+    X = np.column_stack([rng.integers(0, 24, 3000), rng.uniform(15, 40, 3000),
+                         rng.uniform(215, 245, 3000), rng.integers(0, 7, 3000)])
+    bands = np.where(X[:, 2] < 228, 2, np.where(X[:, 2] <= 236, 1, 0))
+    clf = RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0).fit(X, bands)
+    assert supports_rules(clf)
+
+    labels, decided = rule_labels([220.0, 227.5, 232.0, 236.5, 240.0])
+    assert labels.tolist() == [2, -1, 1, -1, 0]
+    assert decided.tolist() == [True, False, True, False, True]
+
+    labels, decided = classify_with_rules(clf, X)
+    assert 0.5 < decided.mean() < 1.0
+    np.testing.assert_array_equal(labels[~decided], clf.predict(X[~decided]))
+    assert np.mean(labels == clf.predict(X)) > 0.95
+
+
+def test_interactive_lane_runs_ahead_of_queued_bulk_slices(regressor):
+    import threading
+
+    from app.scheduler import LaneScheduler
+
+    lanes = LaneScheduler(workers=1, slice_rows=100)
+    gate = threading.Event()
+    order = []
+
+    blocker = lanes.submit("bulk", gate.wait)
+    bulk = [lanes.submit("bulk", order.append, f"bulk{i}") for i in range(3)]
+    interactive = lanes.submit("interactive", order.append, "interactive")
+    gate.set()
+    for f in [blocker, *bulk, interactive]:
+        f.result(timeout=5)
+    assert order[0] == "interactive"
+
+    model, X = regressor
+    np.testing.assert_array_equal(lanes.predict("bulk", model, X), model.predict(X))
+    stats = lanes.stats()
+    assert stats["bulk"]["completed"] == 4 + 5   # 500 rows in 100-row slices
+    assert stats["interactive"]["queue_depth"] == 0
+
+
+def test_interactive_work_is_never_stuck_behind_bulk_on_one_worker():
+    import threading
+
+    from app.scheduler import LaneScheduler
+
+    lanes = LaneScheduler(workers=1, bulk_max_running=1, slice_rows=100)
+    caller = threading.current_thread()
+
+    # Bulk idle: run() does not hand the work to a lane thread
+    assert lanes.run("interactive", threading.current_thread) is caller
+
+    # Bulk holds the only worker: the reserved thread serves interactive
+    gate = threading.Event()
+    blocker = lanes.submit("bulk", gate.wait)
+    queued = lanes.submit("bulk", lambda: None)
+    try:
+        thread = lanes.run("interactive", threading.current_thread)
+        assert thread is not caller and thread.name == "lane-worker-interactive"
+        assert not blocker.done() and not queued.done()
+    finally:
+        gate.set()
+    queued.result(timeout=5)
+    stats = lanes.stats()
+    assert stats["reserved_interactive_workers"] == 1
+    assert stats["interactive"]["inline"] == 1 and stats["interactive"]["completed"] == 2
@@ -0,0 +1,154 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from training.store import StoreLockedError, TimeSeriesStore, ingest
+
+
+def _uci_file(path, start='2020-01-30 22:00', minutes=3 * 24 * 60):
+    rng = np.random.default_rng(0)
+    ts = pd.date_range(start, periods=minutes, freq='min')
+    df = pd.DataFrame({
+        'Date': ts.strftime('%d/%m/%Y'),
+        'Time': ts.strftime('%H:%M:%S'),
+        'Global_active_power': rng.uniform(0.2, 5.0, len(ts)).round(3),
+        'Voltage': rng.uniform(225, 245, len(ts)).round(2),
+    })
+    df.loc[rng.random(len(df)) < 0.05, 'Global_active_power'] = np.nan
+    df.to_csv(path, sep=';', index=False, na_rep='?')
+    return path, df.assign(datetime=ts)
+
+
+def test_ingest_partitions_by_month_and_prunes_reads(tmp_path):
+    raw, df = _uci_file(tmp_path / 'raw.txt')
+    root = str(tmp_path / 'store')
+    ingest(str(raw), root)
+    store = TimeSeriesStore(root)
+
+    assert [name for name, _ in store.partitions('minute')] == ['2020-01', '2020-02']
+    assert store.read('minute').shape[0] == len(df)
+    # The newest (possibly incomplete) hour is left for the next ingest
+    assert store.last_timestamp('hourly') == df['datetime'].iloc[-1].floor('h') - pd.Timedelta(hours=1)
+
+    feb = store.read('minute', '2020-02-01 06:00', '2020-02-01 07:00')
+    assert feb.attrs['partitions_scanned'] == 1 and len(feb) == 60
+    expected = df[(df['datetime'] >= '2020-02-01 06:00') & (df['datetime'] < '2020-02-01 07:00')]
+    np.testing.assert_allclose(feb['demand'], expected['Global_active_power'], rtol=1e-6)
+
+    hour = store.read('hourly', '2020-01-31 10:00', '2020-01-31 11:00')
+    minutes = df[(df['datetime'] >= '2020-01-31 10:00') & (df['datetime'] < '2020-01-31 11:00')]
+    assert hour['demand'].iloc[0] == pytest.approx(minutes['Global_active_power'].mean(), rel=1e-6)
+
+
+def test_ingest_appends_only_new_rows(tmp_path):
+    raw, df = _uci_file(tmp_path / 'raw.txt')
+    part = tmp_path / 'part.txt'
+    lines = open(raw).readlines()
+    with open(part, 'w') as f:
+        f.writelines(lines[:2000])
+
+    once, twice = str(tmp_path / 'once'), str(tmp_path / 'twice')
+    ingest(str(raw), once)
+    ingest(str(part), twice)
+    ingest(str(raw), twice)
+    ingest(str(raw), twice)
+    for level in ('minute', 'hourly'):
+        pd.testing.assert_frame_equal(TimeSeriesStore(twice).read(level), TimeSeriesStore(once).read(level))
+
+
+def test_ingest_reads_only_the_appended_tail(tmp_path):
+    raw, df = _uci_file(tmp_path / 'raw.txt')
+    lines = open(raw, 'rb').readlines()
+    growing = tmp_path / 'growing.txt'
+    growing.write_bytes(b''.join(lines[:3000]) + lines[3000][:10])   # half-written last line
+
+    root = str(tmp_path / 'store')
+    first = ingest(str(growing), root)
+    assert first['raw_bytes'] == len(b''.join(lines[:3000]))
+    assert TimeSeriesStore(root).last_timestamp('minute') == df['datetime'].iloc[2998]
+
+    growing.write_bytes(b''.join(lines))
+    second = ingest(str(growing), root)
+    assert second['raw_bytes'] == len(b''.join(lines[3000:]))
+    assert ingest(str(growing), root)['raw_bytes'] == 0
+
+    once = str(tmp_path / 'once')
+    ingest(str(raw), once)
+    for level in ('minute', 'hourly'):
+        pd.testing.assert_frame_equal(TimeSeriesStore(root).read(level), TimeSeriesStore(once).read(level))
+
+    # A rewritten file is read from the start again
+    edited = lines[1][:-2] + (b'1' if lines[1][-2:-1] != b'1' else b'2') + b'\n'
+    growing.write_bytes(b''.join([lines[0], edited, *lines[2:]]))
+    assert ingest(str(growing), root)['raw_bytes'] == growing.stat().st_size
+
+
+def test_writer_refuses_without_a_file_lock(tmp_path, monkeypatch):
+    import training.store as store_module
+
+    monkeypatch.setattr(store_module, 'fcntl', None)
+    monkeypatch.setattr(store_module, 'msvcrt', None)
+    with pytest.raises(StoreLockedError, match='No file locking'):
+        with TimeSeriesStore(str(tmp_path / 'store')).writer():
+            pass
+
+
+def test_readers_see_only_committed_rows_while_writer_appends(tmp_path):
+    store = TimeSeriesStore(str(tmp_path / 'store'))
+    ts = pd.date_range('2020-01-31 20:00', periods=6000, freq='min')
+    rows = pd.DataFrame({'datetime': ts, 'demand': np.arange(len(ts), dtype=np.float32), 'voltage': 230.0})
+    errors = []
+    done = threading.Event()
+
+    def write():
+        with store.writer():
+            for i in range(0, len(rows), 250):
+                store.append('minute', rows.iloc[i:i + 250])
+        done.set()
+
+    def read():
+        while not done.is_set():
+            got = store.read('minute')
+            # Every visible row is complete: demand is its position in time
+            expected = ((got['datetime'] - ts[0]) // pd.Timedelta(minutes=1)).to_numpy()
+            if not (got['demand'].to_numpy() == expected).all():
+                errors.append(len(got))
+
+    writer = threading.Thread(target=write)
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for t in readers + [writer]:
+        t.start()
+    for t in readers + [writer]:
+        t.join()
+    assert not errors
+    assert len(store.read('minute')) == len(rows)
+
+    with store.writer():
+        with pytest.raises(StoreLockedError):
+            with TimeSeriesStore(store.root).writer():
+                pass
+
+
+def test_history_route(tmp_path, monkeypatch):
+    raw, df = _uci_file(tmp_path / 'raw.txt')
+    root = str(tmp_path / 'store')
+    ingest(str(raw), root)
+    monkeypatch.setattr(main, '_store', TimeSeriesStore(root))
+    client = TestClient(main.app)
+
+    body = client.get('/history', params={'start': '2020-01-31T23:30', 'end': '2020-02-01T00:30'}).json()
+    assert body['resolution'] == 'minute' and body['rows'] == 60 and body['partitions_scanned'] == 2
+    assert body['datetime'][0] == '2020-01-31T23:30:00'
+    window = df[(df['datetime'] >= '2020-01-31 23:30') & (df['datetime'] < '2020-02-01 00:30')]
+    assert body['demand'].count(None) == window['Global_active_power'].isna().sum()
+
+    body = client.get('/history', params={'start': '2020-01-30', 'end': '2020-02-10'}).json()
+    assert body['resolution'] == 'hourly' and body['rows'] == 3 * 24 - 1
+
+    assert client.get('/history', params={'start': '2020-02-01', 'end': '2020-01-01'}).status_code == 400
+    assert client.get('/history', params={
+        'start': '2000-01-01', 'end': '2020-01-01', 'resolution': 'minute'}).status_code == 400
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from app.supervisor import ScalingPolicy
+
+
+def _policy():
+    return ScalingPolicy(
+        min_workers=1, max_workers=3,
+        up_queue=4, down_queue=0.5, up_cpu=0.75, down_cpu=0.25,
+        up_p95_ms=200, down_p95_ms=50, up_ticks=2, down_ticks=3, cooldown_seconds=10,
+    )
+
+
+def test_scales_up_only_after_sustained_pressure_and_respects_max():
+    p = _policy()
+    assert p.decide(1, queue_per_worker=10, cpu=0.1, p95_ms=None, now=0) == 1
+    assert p.decide(1, queue_per_worker=10, cpu=0.1, p95_ms=None, now=1) == 2
+    # Cooldown after a change
+    assert p.decide(2, queue_per_worker=10, cpu=0.9, p95_ms=500, now=5) == 2
+    assert p.decide(2, queue_per_worker=10, cpu=0.9, p95_ms=500, now=12) == 3
+    assert p.decide(3, queue_per_worker=10, cpu=0.9, p95_ms=500, now=30) == 3
+    assert p.decide(3, queue_per_worker=10, cpu=0.9, p95_ms=500, now=31) == 3
+
+
+def test_hysteresis_band_holds_worker_count():
+    p = _policy()
+    # Between the lower and upper bounds: neither hot nor cold
+    for t in range(20):
+        assert p.decide(2, queue_per_worker=1, cpu=0.5, p95_ms=100, now=t) == 2
+    # Cold needs every signal low for down_ticks intervals
+    assert [p.decide(2, 0, 0.1, None, now=100 + t) for t in range(3)] == [2, 2, 1]
+    assert p.decide(1, 0, 0.0, None, now=200) == 1   # never below min
+
+
+def test_supervisor_loads_models_without_threads_and_refuses_to_fork_with_one(models_dir, monkeypatch):
+    import threading
+
+    import app.main as main
+    from app.supervisor import Supervisor
+    from app.utils import load_models
+
+    monkeypatch.setattr(main, "_models", None)
+    monkeypatch.setattr(main, "_model_version", None)
+    monkeypatch.setattr(main, "load_models", lambda: load_models(str(models_dir)))
+    before = set(threading.enumerate())
+
+    sup = Supervisor("127.0.0.1", 0, _policy(), 0.1)
+    sup._prepare()
+    assert {"regression", "classifier"} <= set(main._models)
+    # No shadow / risk-audit evaluator (or anything else) started in the parent
+    assert set(threading.enumerate()) <= before
+
+    stop = threading.Event()
+    t = threading.Thread(target=stop.wait, name="straggler")
+    t.start()
+    try:
+        with pytest.raises(RuntimeError, match="straggler"):
+            sup._spawn()
+    finally:
+        stop.set()
+        t.join()
+    assert sup.workers == {}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="the supervisor needs fork()")
+def test_supervisor_forks_a_worker_that_serves_and_stops_cleanly(tmp_path, models_dir):
+    import shutil
+    import signal
+    import socket
+    import subprocess
+    import sys
+    import time
+    from pathlib import Path
+
+    import httpx
+
+    (models_dir / "candidate").mkdir()
+    for name in ("regression.pkl", "classifier.pkl"):
+        shutil.copy(models_dir / name, models_dir / "candidate")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = {**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parents[1])}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.supervisor", "--host", "127.0.0.1", "--port", str(port),
+         "--min-workers", "1", "--max-workers", "1", "--interval", "0.2"],
+        cwd=tmp_path, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        for _ in range(300):
+            try:
+                r = httpx.post(f"{url}/predict-demand", json={"hour": 18, "temperature": 30.0, "voltage": 230.0, "dayofweek": 1})
+                break
+            except httpx.TransportError:
+                assert proc.poll() is None, proc.stdout.read()
+                time.sleep(0.1)
+        assert r.status_code == 200 and "predicted_demand" in r.json()
+        # The worker started its own candidate shadow after the fork
+        assert httpx.get(f"{url}/admin/shadow-stats").json()["enabled"]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        out = proc.communicate(timeout=30)[0]
+    assert proc.returncode == 0, out
+    assert "Refusing to fork" not in out and "started worker" in out
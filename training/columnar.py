@@ -0,0 +1,86 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from training.features import FEATURES, LAG_FEATURES, calendar, feature_matrix, lag_features
+
+# -------------------------------------------------
+# COLUMNAR PROCESSED-DATA ARTIFACT
+# -------------------------------------------------
+# preprocess writes processed.csv and, next to it, processed.columnar/:
+#
+#   datetime.npy   int64 ns since epoch
+#   hour.npy, dayofweek.npy
+#   temperature.npy, voltage.npy, demand.npy
+#   X.npy          float32 (rows, 4) in FEATURES order, C-contiguous
+#   lags.npy       float64 (rows, 5) in LAG_FEATURES order (NaN where the
+#                  history is missing)
+#   meta.json      row count + size/mtime of the CSV it was built from
+#
+# The trainers np.load() these with mmap_mode='r', so a load is a few page
+# mappings instead of parsing the CSV and re-deriving hour / dayofweek in
+# every trainer. X is float32 because that is what the forests convert
+# their input to anyway. Benchmark: python -m scripts.bench_columnar
+
+COLUMNS = ['datetime', 'hour', 'dayofweek', 'temperature', 'voltage', 'demand', 'lags']
+
+
+def columnar_dir(processed_path) -> Path:
+    p = Path(processed_path)
+    return p.with_name(p.stem + '.columnar')
+
+
+def _source_stamp(processed_path) -> dict:
+    st = os.stat(processed_path)
+    return {'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+
+
+def write_columnar(processed_path) -> Path:
+    # Built from the CSV that was just written, so every preprocess mode
+    # (in-memory, streaming, parallel, incremental) produces the same arrays
+    df = pd.read_csv(processed_path)
+    dt = pd.to_datetime(df['datetime'], format='ISO8601')
+    hour, dayofweek = calendar(dt)
+    arrays = {
+        'datetime': dt.to_numpy(dtype='datetime64[ns]').view(np.int64),
+        'hour': hour,
+        'dayofweek': dayofweek,
+        'temperature': df['temperature'].to_numpy(dtype=np.float64),
+        'voltage': df['voltage'].to_numpy(dtype=np.float64),
+        'demand': df['demand'].to_numpy(dtype=np.float64),
+    }
+    X = feature_matrix(hour, arrays['temperature'], arrays['voltage'], dayofweek, dtype=np.float32)
+    arrays['lags'] = lag_features(dt, arrays['demand'])
+
+    out = columnar_dir(processed_path)
+    out.mkdir(parents=True, exist_ok=True)
+    for name, values in {**arrays, 'X': X}.items():
+        np.save(out / f'{name}.npy', values)
+    meta = {'rows': int(len(df)), 'features': FEATURES, 'lag_features': LAG_FEATURES, **_source_stamp(processed_path)}
+    # meta.json last: its presence marks a complete artifact
+    with open(out / 'meta.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    return out
+
+
+def load_columnar(processed_path, mmap: bool = True):
+    # Returns {name: ndarray} (memory-mapped by default), or None when the
+    # artifact is missing or older than the CSV, so callers fall back to it
+    out = columnar_dir(processed_path)
+    meta_path = out / 'meta.json'
+    if not meta_path.exists() or not Path(processed_path).exists():
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if {k: meta.get(k) for k in ('source_size', 'source_mtime_ns')} != _source_stamp(processed_path):
+        return None
+    if not all((out / f'{name}.npy').exists() for name in COLUMNS + ['X']):
+        # Written by an older version: rebuild rather than half-load
+        return None
+    mode = 'r' if mmap else None
+    data = {name: np.load(out / f'{name}.npy', mmap_mode=mode) for name in COLUMNS + ['X']}
+    data['meta'] = meta
+    return data
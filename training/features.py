@@ -0,0 +1,295 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# -------------------------------------------------
+# SHARED FEATURE COMPUTATION (OFFLINE AND ONLINE)
+# -------------------------------------------------
+# One definition of the model input, used by preprocess, the trainers, the
+# API (single rows, JSON batches, uploads, batch_score) and the frontend:
+#
+#   FEATURES = [hour, temperature, voltage, dayofweek]
+#
+# hour / dayofweek come from the timestamp when a row has one. temperature
+# and voltage fall back to the synthetic profiles preprocess has always
+# used for the UCI data, which has neither.
+#
+# Calendar features are integer arithmetic on datetime64[ns] (1970-01-01
+# was a Thursday), not the .dt accessors. Timestamps given to the online
+# path as strings / datetimes go through a bounded per-timestamp cache.
+# single_row() fills a preallocated per-thread float32 (1, 4) buffer,
+# which the forests take as-is (float32 is their internal dtype), so a
+# single-row request builds no intermediate lists or arrays.
+
+FEATURES = ['hour', 'temperature', 'voltage', 'dayofweek']
+
+NS_PER_HOUR = 3600 * 10 ** 9
+NS_PER_DAY = 24 * NS_PER_HOUR
+EPOCH_DAYOFWEEK = 3
+
+
+def synthetic_temperature(hour, dayofweek):
+    # 25 C base, +5 at weekends, +3 in the 14:00-18:00 afternoon peak
+    hour, dayofweek = np.asarray(hour), np.asarray(dayofweek)
+    return 25 + 5 * (dayofweek >= 5) + 3 * ((hour >= 14) & (hour <= 18))
+
+
+def synthetic_voltage(hour):
+    return 230 + 10 * (np.asarray(hour) >= 17)
+
+
+def calendar(datetimes):
+    # (hour, dayofweek) int8 arrays from anything convertible to
+    # datetime64[ns]; NaT rows get -1. Timezone-aware values use their
+    # local wall-clock time, like the .dt accessors.
+    dt = pd.to_datetime(datetimes)
+    if isinstance(dt, pd.Series):
+        if dt.dt.tz is not None:
+            dt = dt.dt.tz_localize(None)
+    elif getattr(dt, 'tz', None) is not None:
+        dt = dt.tz_localize(None)
+    ns = np.asarray(dt, dtype='datetime64[ns]').view(np.int64)
+    nat = ns == np.iinfo(np.int64).min
+    hour = ((ns // NS_PER_HOUR) % 24).astype(np.int8)
+    dayofweek = ((ns // NS_PER_DAY + EPOCH_DAYOFWEEK) % 7).astype(np.int8)
+    if nat.any():
+        hour[nat] = -1
+        dayofweek[nat] = -1
+    return hour, dayofweek
+
+
+@lru_cache(maxsize=4096)
+def calendar_of(ts):
+    # (hour, dayofweek) of one timestamp (str, datetime or Timestamp)
+    t = pd.Timestamp(ts)
+    return t.hour, t.dayofweek
+
+
+def feature_matrix(hour=None, temperature=None, voltage=None, dayofweek=None, datetime=None, dtype=np.float64, out=None):
+    # Columns in FEATURES order; hour / dayofweek from `datetime` when not
+    # given, synthetic temperature / voltage when not given
+    if datetime is not None and (hour is None or dayofweek is None):
+        h, d = calendar(datetime)
+        hour = h if hour is None else hour
+        dayofweek = d if dayofweek is None else dayofweek
+    if hour is None or dayofweek is None:
+        raise ValueError("Need hour and dayofweek, or a datetime to derive them from")
+    hour, dayofweek = np.asarray(hour), np.asarray(dayofweek)
+    if temperature is None:
+        temperature = synthetic_temperature(hour, dayofweek)
+    if voltage is None:
+        voltage = synthetic_voltage(hour)
+
+    n = len(hour)
+    if out is None:
+        out = np.empty((n, len(FEATURES)), dtype=dtype)
+    out[:, 0] = hour
+    out[:, 1] = temperature
+    out[:, 2] = voltage
+    out[:, 3] = dayofweek
+    return out
+
+
+def _datetime_column(df: pd.DataFrame):
+    if 'datetime' in df.columns:
+        return pd.to_datetime(df['datetime'], errors='coerce')
+    if 'date' in df.columns and 'time' in df.columns:
+        return pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str), dayfirst=True, errors='coerce')
+    return None
+
+
+def add_features(df: pd.DataFrame, synthesize: bool = True) -> pd.DataFrame:
+    # Lower-cases the column names of df (in place) and adds any of
+    # FEATURES that can be derived; rows with an unparseable timestamp are
+    # dropped. With synthesize=False a missing temperature / voltage stays
+    # missing (the API asks the client for them rather than guessing).
+    df.columns = df.columns.str.strip().str.lower()
+    if 'hour' not in df.columns or 'dayofweek' not in df.columns:
+        dt = _datetime_column(df)
+        if dt is not None:
+            hour, dayofweek = calendar(dt)
+            if 'hour' not in df.columns:
+                df['hour'] = hour
+            if 'dayofweek' not in df.columns:
+                df['dayofweek'] = dayofweek
+            bad = dt.isna().to_numpy()
+            if bad.any():
+                df = df[~bad].copy()
+    if synthesize and 'hour' in df.columns and 'dayofweek' in df.columns:
+        if 'temperature' not in df.columns:
+            df['temperature'] = synthetic_temperature(df['hour'], df['dayofweek'])
+        if 'voltage' not in df.columns:
+            df['voltage'] = synthetic_voltage(df['hour'])
+    return df
+
+
+def missing_features(df: pd.DataFrame):
+    return [c for c in FEATURES if c not in df.columns]
+
+
+# -------------------------------
+# Single rows (online)
+# -------------------------------
+_local = threading.local()
+
+
+def single_row(hour, temperature, voltage, dayofweek, *extra) -> np.ndarray:
+    # The calling thread's (1, 4 + len(extra)) float32 buffer, overwritten
+    # by the next call on the same thread: copy it if it has to outlive the
+    # request
+    rows = getattr(_local, 'rows', None)
+    if rows is None:
+        rows = _local.rows = {}
+    width = len(FEATURES) + len(extra)
+    buf = rows.get(width)
+    if buf is None:
+        buf = rows[width] = np.empty((1, width), dtype=np.float32)
+    buf[0, 0] = hour
+    buf[0, 1] = temperature
+    buf[0, 2] = voltage
+    buf[0, 3] = dayofweek
+    if extra:
+        buf[0, 4:] = extra
+    return buf
+
+
+# -------------------------------------------------
+# LAG AND ROLLING-WINDOW DEMAND FEATURES
+# -------------------------------------------------
+# For the hour t being predicted:
+#
+#   demand_lag_k    demand at hour t-k (k in LAG_HOURS), NaN if that hour
+#                   is missing
+#   demand_roll_w   mean of the demand present in hours t-w .. t-1
+#
+# Only hours before t are used, so the label never leaks into its features.
+# Offline (lag_features) is vectorised over an hourly grid; online
+# (FeederHistory) reads the same hours out of a fixed-size ring buffer.
+# Both take the window mean with _window_mean over hours in time order,
+# so the two give bit-identical values (tests/test_features.py).
+
+LAG_HOURS = (1, 24, 168)
+ROLL_WINDOWS = (24, 168)
+LAG_FEATURES = [f'demand_lag_{k}' for k in LAG_HOURS] + [f'demand_roll_{w}' for w in ROLL_WINDOWS]
+# Hours t-168 .. t all fit, so recording hour t never evicts one still needed
+HISTORY_HOURS = max(max(LAG_HOURS), max(ROLL_WINDOWS)) + 1
+
+
+def _window_mean(windows: np.ndarray) -> np.ndarray:
+    # Row-wise mean of the non-NaN values of a (rows, w) array
+    present = ~np.isnan(windows)
+    count = present.sum(axis=1)
+    total = np.where(present, windows, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _hour_ids(datetimes) -> np.ndarray:
+    ns = np.asarray(pd.to_datetime(datetimes), dtype='datetime64[ns]').view(np.int64)
+    return ns // NS_PER_HOUR
+
+
+def lag_features(datetimes, demand, block_rows: int = 8192) -> np.ndarray:
+    # (rows, len(LAG_FEATURES)) float64 for hourly rows with unique
+    # timestamps (any order, gaps allowed)
+    ids = _hour_ids(datetimes)
+    demand = np.asarray(demand, dtype=np.float64)
+    out = np.full((len(ids), len(LAG_FEATURES)), np.nan)
+    if len(ids) == 0:
+        return out
+
+    # Dense hourly grid, padded with HISTORY_HOURS empty hours in front
+    pad = HISTORY_HOURS
+    base = ids.min() - pad
+    grid = np.full(ids.max() - base + 1, np.nan)
+    grid[ids - base] = demand
+    pos = ids - base
+
+    for j, k in enumerate(LAG_HOURS):
+        out[:, j] = grid[pos - k]
+    for j, w in enumerate(ROLL_WINDOWS, start=len(LAG_HOURS)):
+        # windows[i] = grid[i : i + w], so row pos - w covers hours t-w .. t-1
+        windows = sliding_window_view(grid, w)
+        for a in range(0, len(pos), block_rows):
+            out[a:a + block_rows, j] = _window_mean(windows[pos[a:a + block_rows] - w])
+    return out
+
+
+class FeederHistory:
+    # Ring buffer of the last HISTORY_HOURS hourly demands of one feeder.
+    # Slot h % HISTORY_HOURS holds hour h; the stored hour id tells a
+    # current entry from a stale one, so gaps read as NaN.
+    __slots__ = ('hours', 'values')
+
+    def __init__(self):
+        self.hours = np.full(HISTORY_HOURS, np.iinfo(np.int64).min, dtype=np.int64)
+        self.values = np.full(HISTORY_HOURS, np.nan)
+
+    def record(self, hour_id: int, demand: float):
+        slot = hour_id % HISTORY_HOURS
+        if hour_id >= self.hours[slot]:
+            self.hours[slot] = hour_id
+            self.values[slot] = demand
+
+    def _window(self, first: int, length: int) -> np.ndarray:
+        wanted = np.arange(first, first + length, dtype=np.int64)
+        slots = wanted % HISTORY_HOURS
+        return np.where(self.hours[slots] == wanted, self.values[slots], np.nan)
+
+    def features(self, hour_id: int) -> np.ndarray:
+        out = np.empty(len(LAG_FEATURES))
+        for j, k in enumerate(LAG_HOURS):
+            out[j] = self._window(hour_id - k, 1)[0]
+        for j, w in enumerate(ROLL_WINDOWS, start=len(LAG_HOURS)):
+            out[j] = _window_mean(self._window(hour_id - w, w)[None, :])[0]
+        return out
+
+
+class LagStateStore:
+    # feeder -> FeederHistory, least recently used feeders evicted beyond
+    # max_feeders. Work per call is bounded by HISTORY_HOURS, whatever the
+    # length of the history.
+    def __init__(self, max_feeders: int = 10000):
+        self.max_feeders = max_feeders
+        self._feeders = OrderedDict()
+        self._lock = threading.Lock()
+        self.observations = 0
+        self.evicted = 0
+
+    def observe(self, feeder: str, ts, demand: float):
+        hour_id = int(pd.Timestamp(ts).value // NS_PER_HOUR)
+        with self._lock:
+            history = self._feeders.get(feeder)
+            if history is None:
+                history = self._feeders[feeder] = FeederHistory()
+                if len(self._feeders) > self.max_feeders:
+                    self._feeders.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._feeders.move_to_end(feeder)
+            history.record(hour_id, float(demand))
+            self.observations += 1
+
+    def features(self, feeder: str, ts) -> np.ndarray:
+        # LAG_FEATURES for hour `ts` (all NaN for an unknown feeder)
+        hour_id = int(pd.Timestamp(ts).value // NS_PER_HOUR)
+        with self._lock:
+            history = self._feeders.get(feeder)
+            if history is None:
+                return np.full(len(LAG_FEATURES), np.nan)
+            self._feeders.move_to_end(feeder)
+            return history.features(hour_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "feeders": len(self._feeders),
+                "max_feeders": self.max_feeders,
+                "observations": self.observations,
+                "evicted": self.evicted,
+                "bytes": len(self._feeders) * HISTORY_HOURS * 16,
+            }
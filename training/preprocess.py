@@ -1,26 +1,48 @@
+import hashlib
+import io
+import json
+import os
+import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def preprocess(raw_path: str = 'data/raw/household_power_consumption.txt', out_path: str = 'data/processed/processed.csv'):
+from training.columnar import load_columnar, write_columnar
+from training.features import calendar, synthetic_temperature, synthetic_voltage
+from training.rollups import RollupSpool, load_base, merge_partials, minute_partials, write_rollups
+from training.uci_reader import is_uci_file, open_slice, read_uci
+from training.weather import DEFAULT_TOLERANCE, join_temperature, open_index
+
+def preprocess(raw_path: str = 'data/raw/household_power_consumption.txt', out_path: str = 'data/processed/processed.csv', chunksize: int = None, workers: int = None, incremental: bool = False, weather_path: str = None, site: str = None, weather_tolerance: str = DEFAULT_TOLERANCE):
     p = Path(raw_path)
     if not p.exists():
         raise FileNotFoundError(f"Raw data not found at {raw_path}")
 
+    # Measured temperature joined as-of onto the minute rows instead of the
+    # synthetic profile (training/weather.py)
+    weather = weather_spec(weather_path, site, weather_tolerance)
+
+    if incremental:
+        # Only the rows appended since the last run (see preprocess_incremental)
+        return preprocess_incremental(raw_path, out_path, weather)
+
+    if workers and workers > 1:
+        # Byte ranges parsed in a process pool (see preprocess_parallel)
+        return preprocess_parallel(raw_path, out_path, workers, weather=weather)
+    if chunksize:
+        # Constant-memory path, same output (see preprocess_streaming)
+        return preprocess_streaming(raw_path, out_path, chunksize, weather)
+
     print("Loading and parsing data (this may take a moment)...")
     
-    # OPTIMIZATION: Combine Date and Time *during* the read operation.
-    # parse_dates={'datetime': ['Date', 'Time']} creates a 'datetime' column automatically.
-    # index_col='datetime' sets it as index immediately (optional, but saves memory).
-    if p.suffix.lower() in ['.txt', '.csv']:
-        df = pd.read_csv(
-            raw_path, 
-            sep=';', 
-            na_values=['?', ''], 
-            low_memory=False,
-            parse_dates={'datetime': ['Date', 'Time']}, # Combines columns automatically
-            dayfirst=True, # vital for dd/mm/yyyy format
-            infer_datetime_format=True # Speeds up parsing
-        )
+    # Raw UCI files go through the schema-driven reader: four columns,
+    # float32 values, each distinct date/time string parsed once.
+    if p.suffix.lower() in ['.txt', '.csv'] and is_uci_file(raw_path):
+        df = read_uci(raw_path)
+    elif p.suffix.lower() in ['.txt', '.csv']:
+        df = pd.read_csv(raw_path, sep=';', na_values=['?', ''], low_memory=False)
+        if 'Date' in df.columns and 'Time' in df.columns:
+            df['datetime'] = pd.to_datetime(df.pop('Date') + ' ' + df.pop('Time'), dayfirst=True, errors='coerce')
     else:
         df = pd.read_csv(raw_path)
 
@@ -35,23 +57,27 @@ def preprocess(raw_path: str = 'data/raw/household_power_consumption.txt', out_p
         # Fallback if names are different
         df['Global_active_power'] = df.iloc[:, 0] # 0 because Date/Time are now the index/datetime col
     
-    df['Global_active_power'] = pd.to_numeric(df['Global_active_power'], errors='coerce')
+    # float64 so means match the partial-sum paths below
+    df['Global_active_power'] = pd.to_numeric(df['Global_active_power'], errors='coerce').astype('float64')
     df = df.dropna(subset=['Global_active_power'])
 
     # Feature Engineering
     # We access the .dt accessor on the datetime column
-    df['hour'] = df['datetime'].dt.hour
-    df['dayofweek'] = df['datetime'].dt.dayofweek
+    df['hour'], df['dayofweek'] = calendar(df['datetime'])
 
-    # Synthetic Temperature
-    if 'temperature' not in df.columns:
-        df['temperature'] = 25 + 5 * (df['dayofweek'] >= 5) + 3 * ((df['hour'] >= 14) & (df['hour'] <= 18))
+    # Measured (weather file) or synthetic temperature
+    if weather is not None:
+        df = with_weather(df, weather)
+    elif 'temperature' not in df.columns:
+        df['temperature'] = synthetic_temperature(df['hour'], df['dayofweek'])
 
     # Clean/Synthetic Voltage
     if 'Voltage' in df.columns:
-        df['voltage'] = pd.to_numeric(df['Voltage'], errors='coerce')
-    elif 'voltage' not in df.columns:
-        df['voltage'] = 230 + 10 * (df['hour'] >= 17)
+        df['voltage'] = pd.to_numeric(df['Voltage'], errors='coerce').astype('float64')
+    elif 'voltage' in df.columns:
+        df['voltage'] = pd.to_numeric(df['voltage'], errors='coerce').astype('float64')
+    else:
+        df['voltage'] = synthetic_voltage(df['hour'])
 
     # Aggregate to Hourly Data
     print("Aggregating to hourly data...")
@@ -69,12 +95,483 @@ def preprocess(raw_path: str = 'data/raw/household_power_consumption.txt', out_p
     outp = Path(out_path)
     outp.parent.mkdir(parents=True, exist_ok=True)
     grouped.to_csv(out_path, index=False)
-    
+
+    # 15min / hourly / daily / weekly rollups (training/rollups.py)
+    write_rollups(minute_partials(df), out_path)
+    # Memory-mapped arrays for the trainers (training/columnar.py)
+    write_columnar(out_path)
     print(f"Done! Processed data saved to {out_path}")
     return out_path
 
+# -------------------------------------------------
+# STREAMING (CONSTANT-MEMORY) PREPROCESSING
+# -------------------------------------------------
+# Reads `chunksize` minute rows at a time and folds each chunk into per-hour
+# partial sums and counts. The UCI file is in time order, so every hour
+# before the newest one in a chunk is complete and is written out right
+# away; only the last (possibly partial) hour is carried into the next
+# chunk. Memory is bounded by the chunk size, not the file size.
+#
+# Rows that arrive for an hour that was already written (unsorted input)
+# are kept as "late" partials and merged in a final pass over the partial
+# file, which has one row per hour, so the output still matches
+# preprocess().
+
+# Fixed so a part holding only midnight rows is not written as a bare date
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def weather_spec(weather_path: str = None, site: str = None, tolerance: str = DEFAULT_TOLERANCE):
+    # (path, site, tolerance) or None: small and picklable, so it can go to
+    # worker processes, which open the (already built) index themselves
+    if weather_path is None:
+        return None
+    if not Path(weather_path).exists():
+        raise FileNotFoundError(f"Weather data not found at {weather_path}")
+    open_index(weather_path).asof([], site, tolerance)  # builds the index, checks the site
+    return (str(weather_path), site, tolerance)
+
+
+def with_weather(df: pd.DataFrame, weather) -> pd.DataFrame:
+    if weather is None:
+        return df
+    path, site, tolerance = weather
+    return join_temperature(df, open_index(path), site, tolerance)
+
+
+def _iter_raw_chunks(raw_path: str, chunksize: int, end: int = None):
+    # Yields frames with datetime, Global_active_power and voltage columns;
+    # `end` stops a raw UCI file at that byte offset
+    p = Path(raw_path)
+    if p.suffix.lower() in ['.txt', '.csv'] and is_uci_file(raw_path):
+        if end is None:
+            yield from read_uci(raw_path, chunksize=chunksize)
+        else:
+            with open_slice(raw_path, 0, end) as f:
+                yield from read_uci(f, chunksize=chunksize)
+        return
+    if p.suffix.lower() in ['.txt', '.csv']:
+        reader = pd.read_csv(raw_path, sep=';', na_values=['?', ''], chunksize=chunksize, dtype={'Date': str, 'Time': str})
+    else:
+        reader = pd.read_csv(raw_path, chunksize=chunksize)
+
+    for chunk in reader:
+        if 'Date' in chunk.columns and 'Time' in chunk.columns:
+            dt = pd.to_datetime(chunk['Date'] + ' ' + chunk['Time'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
+            rest = chunk.drop(columns=['Date', 'Time'])
+        else:
+            dt = pd.to_datetime(chunk['datetime'], errors='coerce')
+            rest = chunk.drop(columns=['datetime'])
+        out = pd.DataFrame({'datetime': dt})
+        out['Global_active_power'] = rest['Global_active_power'] if 'Global_active_power' in rest.columns else rest.iloc[:, 0]
+        if 'temperature' in rest.columns:
+            out['temperature'] = rest['temperature']
+        if 'Voltage' in rest.columns:
+            out['voltage'] = rest['Voltage']
+        elif 'voltage' in rest.columns:
+            out['voltage'] = rest['voltage']
+        yield out
+
+
+def _hourly_partials(df: pd.DataFrame) -> pd.DataFrame:
+    # Same cleaning / features as preprocess(), reduced to sums and counts
+    df = df.dropna(subset=['datetime'])
+    df = df.assign(Global_active_power=pd.to_numeric(df['Global_active_power'], errors='coerce'))
+    df = df.dropna(subset=['Global_active_power'])
+
+    hour, dayofweek = calendar(df['datetime'])
+    if 'temperature' in df.columns:
+        temperature = pd.to_numeric(df['temperature'], errors='coerce')
+    else:
+        temperature = pd.Series(synthetic_temperature(hour, dayofweek), index=df.index)
+    if 'voltage' in df.columns:
+        voltage = pd.to_numeric(df['voltage'], errors='coerce')
+    else:
+        voltage = pd.Series(synthetic_voltage(hour), index=df.index)
+
+    parts = pd.DataFrame({
+        'demand': df['Global_active_power'].astype('float64'),
+        'temperature': temperature.astype('float64'),
+        'voltage': voltage.astype('float64'),
+    })
+    grouped = parts.groupby(df['datetime'].dt.floor('h').rename('datetime'))
+    sums, counts = grouped.sum(), grouped.count()
+    return pd.DataFrame({
+        'demand_sum': sums['demand'], 'demand_n': counts['demand'],
+        'temperature_sum': sums['temperature'], 'temperature_n': counts['temperature'],
+        'voltage_sum': sums['voltage'], 'voltage_n': counts['voltage'],
+    })
+
+
+def _finalize(partials: pd.DataFrame) -> pd.DataFrame:
+    # Means per hour; an hour with no valid voltage stays NaN, as in preprocess()
+    out = pd.DataFrame(index=partials.index)
+    for col in ('demand', 'temperature', 'voltage'):
+        n = partials[f'{col}_n']
+        out[col] = (partials[f'{col}_sum'] / n).where(n > 0)
+    return out.reset_index()
+
+
+def preprocess_streaming(raw_path: str = 'data/raw/household_power_consumption.txt', out_path: str = 'data/processed/processed.csv', chunksize: int = 250000, weather=None):
+    p = Path(raw_path)
+    if not p.exists():
+        raise FileNotFoundError(f"Raw data not found at {raw_path}")
+    _stream(raw_path, out_path, chunksize, weather)
+    return out_path
+
+
+def _stream(raw_path: str, out_path: str, chunksize: int, weather=None, end: int = None):
+    # The streaming pass; returns the newest hour's partials (attrs
+    # last_ts: the newest timestamp read), or None when there were no rows
+    outp = Path(out_path)
+    outp.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = outp.with_name(outp.name + '.partial')
+
+    print(f"Streaming {raw_path} in chunks of {chunksize} rows...")
+    carry = None            # partials of hours that may still receive rows
+    flushed_until = None    # every hour < this has been written
+    late = []               # partials for hours already written
+    rollups = RollupSpool(out_path, chunksize)   # same, for the rollup buckets
+    n_written = 0
+    last_ts = None
+
+    with open(partial_path, 'w', newline='') as f:
+        header = True
+        for chunk in _iter_raw_chunks(raw_path, chunksize, end):
+            rollups.add(minute_partials(chunk))
+            newest_ts = chunk['datetime'].max()
+            if pd.notna(newest_ts) and (last_ts is None or newest_ts > last_ts):
+                last_ts = newest_ts
+            parts = _hourly_partials(with_weather(chunk, weather))
+            if parts.empty:
+                continue
+
+            if flushed_until is not None:
+                is_late = parts.index < flushed_until
+                if is_late.any():
+                    late.append(parts[is_late])
+                    parts = parts[~is_late]
+
+            if carry is not None:
+                parts = pd.concat([carry, parts]).groupby(level=0).sum()
+            if parts.empty:
+                continue
+
+            # Everything before the newest hour is complete
+            newest = parts.index.max()
+            done, carry = parts[parts.index < newest], parts[parts.index >= newest]
+            if not done.empty:
+                done.to_csv(f, header=header, date_format=DATE_FORMAT)
+                header = False
+                n_written += len(done)
+                flushed_until = newest
+
+        if carry is not None and not carry.empty:
+            carry.to_csv(f, header=header, date_format=DATE_FORMAT)
+            header = False
+            n_written += len(carry)
+
+    # Partials -> means, one row per hour
+    if n_written == 0:
+        n_hours = 0
+        pd.DataFrame(columns=['datetime', 'demand', 'temperature', 'voltage']).to_csv(out_path, index=False)
+    elif late:
+        print(f"Merging {sum(len(l) for l in late)} late hourly partials (input not in time order)...")
+        partials = pd.read_csv(partial_path, index_col='datetime', parse_dates=['datetime'])
+        partials = pd.concat([partials] + late).groupby(level=0).sum().sort_index()
+        n_hours = len(partials)
+        _finalize(partials).to_csv(out_path, index=False, date_format=DATE_FORMAT)
+    else:
+        n_hours = n_written
+        first = True
+        for part in pd.read_csv(partial_path, index_col='datetime', parse_dates=['datetime'], chunksize=chunksize):
+            _finalize(part).to_csv(out_path, mode='w' if first else 'a', header=first, index=False, date_format=DATE_FORMAT)
+            first = False
+    os.remove(partial_path)
+
+    rollups.finish()
+    write_columnar(out_path)
+    print(f"Done! {n_hours} hourly rows saved to {out_path}")
+    if carry is None or carry.empty:
+        return None
+    last_hour = carry.copy()
+    last_hour.attrs['last_ts'] = last_ts.strftime(DATE_FORMAT)
+    return last_hour
+
+
+# -------------------------------------------------
+# PARALLEL BYTE-RANGE PREPROCESSING
+# -------------------------------------------------
+# The raw file is cut into newline-aligned byte ranges. Each range is
+# parsed in a worker process and reduced to hourly (sum, count) partials
+# with the same _hourly_partials as the streaming path. Summing the
+# partials per hour and dividing gives the same means as preprocess(),
+# whatever range an hour's rows fell into. Only the small partial frames
+# travel back to the parent.
+
+RANGE_BYTES = 64 * 1024 * 1024
+
+
+def split_ranges(raw_path: str, n_ranges: int):
+    # [(start, end)] covering the data rows; every range starts at the
+    # beginning of a line and ends just after a newline (or at EOF)
+    size = os.path.getsize(raw_path)
+    with open(raw_path, 'rb') as f:
+        f.readline()                     # header
+        data_start = f.tell()
+        bounds = [data_start]
+        step = max(1, (size - data_start) // max(1, n_ranges))
+        for target in range(data_start + step, size, step):
+            if target <= bounds[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()                 # finish the line containing target-1
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _range_partials(raw_path: str, start: int, end: int, weather=None):
+    # Worker: parse one byte range (with the header prepended) into hourly
+    # and 15-minute rollup partials
+    with open(raw_path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(end - start)
+    df = read_uci(io.BytesIO(header + data))
+    return _hourly_partials(with_weather(df, weather)), minute_partials(df)
+
+
+def preprocess_parallel(raw_path: str = 'data/raw/household_power_consumption.txt', out_path: str = 'data/processed/processed.csv', workers: int = None, range_bytes: int = RANGE_BYTES, weather=None):
+    p = Path(raw_path)
+    if not p.exists():
+        raise FileNotFoundError(f"Raw data not found at {raw_path}")
+    if not is_uci_file(raw_path):
+        # Only raw UCI files have a line layout we can split blindly
+        path, site, tolerance = weather or (None, None, DEFAULT_TOLERANCE)
+        return preprocess(raw_path, out_path, weather_path=path, site=site, weather_tolerance=tolerance)
+
+    workers = workers or os.cpu_count() or 1
+    # At least a few ranges per worker for balance; at most range_bytes each
+    n_ranges = max(workers * 4, -(-os.path.getsize(raw_path) // range_bytes))
+    ranges = split_ranges(raw_path, n_ranges)
+    print(f"Parsing {raw_path} as {len(ranges)} byte ranges on {workers} processes...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_range_partials, raw_path, a, b, weather) for a, b in ranges]
+        results = [f.result() for f in futures]
+
+    partials = [hourly for hourly, _ in results if not hourly.empty]
+    if partials:
+        merged = pd.concat(partials).groupby(level=0).sum().sort_index()
+        out = _finalize(merged)
+    else:
+        out = pd.DataFrame(columns=['datetime', 'demand', 'temperature', 'voltage'])
+
+    outp = Path(out_path)
+    outp.parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(out_path, index=False, date_format=DATE_FORMAT)
+
+    write_rollups(merge_partials([quarter for _, quarter in results]), out_path)
+    write_columnar(out_path)
+    print(f"Done! {len(out)} hourly rows saved to {out_path}")
+    return out_path
+
+
+# -------------------------------------------------
+# INCREMENTAL PREPROCESSING (RAW-FILE WATERMARK)
+# -------------------------------------------------
+# Meters append minute rows to the raw file every day. The watermark next
+# to the processed output records how far the raw file has been consumed:
+#
+#   offset        bytes of complete lines already processed
+#   checksum      sha256 of the first and last CHECKSUM_BLOCK bytes of
+#                 that prefix (detects a rewritten / replaced file)
+#   last_ts       newest timestamp seen
+#   last_hour     (sum, count) partials of the newest hour, which may still
+#                 receive rows
+#   out_offset    where that hour's row starts in the processed CSV
+#
+# A run parses only raw[offset:], merges the tail into the last hour,
+# truncates the processed CSV at out_offset and appends the refreshed last
+# hour plus any new hours. Anything unexpected (no watermark, shrunk or
+# rewritten file, rows older than the last hour, a different or updated
+# weather file) triggers a full rebuild.
+
+CHECKSUM_BLOCK = 1024 * 1024
+
+
+def watermark_path(out_path: str) -> Path:
+    return Path(str(out_path) + '.watermark.json')
+
+
+def _prefix_checksum(raw_path: str, offset: int) -> str:
+    h = hashlib.sha256()
+    with open(raw_path, 'rb') as f:
+        h.update(f.read(min(offset, CHECKSUM_BLOCK)))
+        if offset > CHECKSUM_BLOCK:
+            f.seek(max(CHECKSUM_BLOCK, offset - CHECKSUM_BLOCK))
+            h.update(f.read(offset - f.tell()))
+    h.update(str(offset).encode())
+    return h.hexdigest()
+
+
+def _complete_lines_end(raw_path: str) -> int:
+    # Offset just after the last newline: a half-written final line is left
+    # for the next run
+    size = os.path.getsize(raw_path)
+    with open(raw_path, 'rb') as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            block = f.read(pos - start)
+            i = block.rfind(b'\n')
+            if i >= 0:
+                return start + i + 1
+            pos = start
+    return 0
+
+
+def _last_row_offset(path: str) -> int:
+    # Start of the last line of a small text file that ends with a newline
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(max(0, size - 65536))
+        block = f.read()
+    i = block.rfind(b'\n', 0, len(block) - 1)
+    return size - len(block) + i + 1
+
+
+def _read_raw_range(raw_path: str, start: int, end: int) -> pd.DataFrame:
+    with open(raw_path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(start, len(header)))
+        data = f.read(end - f.tell())
+    return read_uci(io.BytesIO(header + data))
+
+
+def _weather_stamp(weather):
+    # Identifies the weather join the processed rows were built with
+    if weather is None:
+        return None
+    path, site, tolerance = weather
+    st = os.stat(path)
+    return [path, st.st_size, st.st_mtime_ns, site, str(tolerance)]
+
+
+def _write_watermark(out_path: str, raw_path: str, offset: int, last_hour: pd.DataFrame, weather=None):
+    last = last_hour.iloc[0]
+    mark = {
+        'raw_path': str(raw_path),
+        'weather': _weather_stamp(weather),
+        'offset': offset,
+        'checksum': _prefix_checksum(raw_path, offset),
+        'last_ts': last_hour.attrs.get('last_ts'),
+        'last_hour': {'datetime': last_hour.index[0].strftime(DATE_FORMAT), **{k: float(last[k]) for k in last_hour.columns}},
+        'out_offset': _last_row_offset(out_path),
+    }
+    wm = watermark_path(out_path)
+    tmp = wm.with_name(wm.name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(mark, f, indent=2)
+    os.replace(tmp, wm)
+
+
+def _rebuild(raw_path: str, out_path: str, weather=None, chunksize: int = 250000) -> pd.DataFrame:
+    # The constant-memory streaming pass over the complete lines, then the
+    # watermark from the hour it still carried at the end
+    end = _complete_lines_end(raw_path)
+    last_hour = _stream(raw_path, out_path, chunksize, weather, end)
+    if last_hour is not None:
+        _write_watermark(out_path, raw_path, end, last_hour, weather)
+    print(f"Full rebuild of {out_path} from {end} bytes of {raw_path}")
+    return out_path
+
+
+def preprocess_incremental(raw_path: str = 'data/raw/household_power_consumption.txt', out_path: str = 'data/processed/processed.csv', weather=None):
+    p = Path(raw_path)
+    if not p.exists():
+        raise FileNotFoundError(f"Raw data not found at {raw_path}")
+    if not is_uci_file(raw_path):
+        path, site, tolerance = weather or (None, None, DEFAULT_TOLERANCE)
+        return preprocess(raw_path, out_path, weather_path=path, site=site, weather_tolerance=tolerance)
+
+    wm = watermark_path(out_path)
+    mark = None
+    if wm.exists() and Path(out_path).exists():
+        with open(wm) as f:
+            mark = json.load(f)
+
+    end = _complete_lines_end(raw_path)
+    if mark is None or mark.get('raw_path') != str(raw_path):
+        print("No watermark for this file, rebuilding...")
+        return _rebuild(raw_path, out_path, weather)
+    if mark.get('weather') != _weather_stamp(weather):
+        print("Weather data changed since the last run, rebuilding...")
+        return _rebuild(raw_path, out_path, weather)
+    if load_base(out_path) is None:
+        print("No rollups next to the processed data, rebuilding...")
+        return _rebuild(raw_path, out_path, weather)
+    if end < mark['offset'] or _prefix_checksum(raw_path, mark['offset']) != mark['checksum']:
+        print("Raw file was rewritten since the last run, rebuilding...")
+        return _rebuild(raw_path, out_path, weather)
+    if end == mark['offset']:
+        print(f"No new rows in {raw_path}; {out_path} is up to date")
+        if load_columnar(out_path) is None:
+            write_columnar(out_path)
+        return out_path
+
+    tail = _read_raw_range(raw_path, mark['offset'], end)
+    parts = _hourly_partials(with_weather(tail, weather))
+    last = mark['last_hour']
+    last_hour = pd.DataFrame(
+        {k: [v] for k, v in last.items() if k != 'datetime'},
+        index=pd.DatetimeIndex([pd.Timestamp(last['datetime'])], name='datetime'),
+    )
+    if not parts.empty and parts.index.min() < last_hour.index[0]:
+        print("Appended rows go back before the last processed hour, rebuilding...")
+        return _rebuild(raw_path, out_path, weather)
+
+    merged = pd.concat([last_hour, parts]).groupby(level=0).sum().sort_index()
+    # Replace the (possibly partial) last hour's row, append the rest
+    with open(out_path, 'r+b') as f:
+        f.truncate(mark['out_offset'])
+    _finalize(merged).to_csv(out_path, mode='a', header=False, index=False, date_format=DATE_FORMAT)
+
+    newest = merged.iloc[[-1]].copy()
+    tail_ts = tail['datetime'].max()
+    newest.attrs['last_ts'] = max(mark['last_ts'], tail_ts.strftime(DATE_FORMAT)) if pd.notna(tail_ts) else mark['last_ts']
+    _write_watermark(out_path, raw_path, end, newest, weather)
+
+    # Tail minutes merged into the stored 15-minute partials
+    write_rollups(merge_partials([load_base(out_path), minute_partials(tail)]), out_path)
+    write_columnar(out_path)
+    print(f"Appended {end - mark['offset']} bytes: {len(merged) - 1} new hourly rows in {out_path}")
+    return out_path
+
+
 if __name__ == '__main__':
+    # python -m training.preprocess [--chunksize N] [--workers N] [--incremental]
+    #     [--weather-path data/raw/weather.csv [--site NAME] [--weather-tolerance 2h]]
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--raw-path', default='data/raw/household_power_consumption.txt')
+    parser.add_argument('--out-path', default='data/processed/processed.csv')
+    parser.add_argument('--chunksize', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None, help='parse byte ranges in N processes')
+    parser.add_argument('--incremental', action='store_true', help='only parse rows appended since the last run')
+    parser.add_argument('--weather-path', default=None, help='CSV of datetime[,site],temperature readings')
+    parser.add_argument('--site', default=None, help='weather site to use when the file has several')
+    parser.add_argument('--weather-tolerance', default=DEFAULT_TOLERANCE, help='oldest reading to accept, e.g. 90min')
+    args = parser.parse_args()
     try:
-        preprocess()
+        preprocess(args.raw_path, args.out_path, args.chunksize, args.workers, args.incremental,
+                   args.weather_path, args.site, args.weather_tolerance)
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
+        sys.exit(1)
\ No newline at end of file
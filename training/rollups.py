@@ -0,0 +1,300 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------
+# MULTI-RESOLUTION ROLLUPS
+# -------------------------------------------------
+# Next to processed.csv, preprocess writes processed.rollups/<resolution>/
+# for 15min, hourly, daily and weekly buckets (weeks start on Monday). Each
+# holds .npy columns like training/columnar.py: the bucket start (int64 ns)
+# and the mergeable partials of Global_active_power over it (n, sum, min,
+# max). Mean and energy in kWh are derived on read (the minute readings are
+# average kW, so one reading is kW / 60 kWh).
+#
+# The minute data is scanned once, into 15-minute partials. Every coarser
+# rollup is the same partials regrouped, so the streaming, parallel and
+# incremental paths only ever merge partials (sums and counts add, min and
+# max take the min and max) and never go back to the minute rows.
+#
+# summarize(start, end) answers a range from the coarsest buckets that fit
+# inside it and fills the edges from finer ones: a year is ~52 weekly rows
+# plus a few daily / hourly / 15-minute rows at the ends.
+
+RESOLUTIONS = ['15min', 'hourly', 'daily', 'weekly']
+BUCKET_WIDTHS = {
+    '15min': pd.Timedelta(minutes=15),
+    'hourly': pd.Timedelta(hours=1),
+    'daily': pd.Timedelta(days=1),
+    'weekly': pd.Timedelta(days=7),
+}
+PARTIAL_COLUMNS = ['n', 'demand_sum', 'demand_min', 'demand_max']
+
+
+def rollups_dir(processed_path) -> Path:
+    p = Path(processed_path)
+    return p.with_name(p.stem + '.rollups')
+
+
+def rollup_path(processed_path, resolution: str) -> Path:
+    return rollups_dir(processed_path) / resolution
+
+
+def bucket_floor(ts, resolution: str):
+    # Works on a Timestamp, a DatetimeIndex or a datetime Series
+    dt = ts.dt if isinstance(ts, pd.Series) else ts
+    if resolution == '15min':
+        return dt.floor('15min')
+    if resolution == 'hourly':
+        return dt.floor('h')
+    day = dt.normalize()
+    if resolution == 'daily':
+        return day
+    if resolution == 'weekly':
+        return day - pd.to_timedelta(dt.dayofweek, unit='D')
+    raise ValueError(f"Unknown resolution {resolution!r}, expected one of {RESOLUTIONS}")
+
+
+def _bucket_ceil(ts: pd.Timestamp, resolution: str) -> pd.Timestamp:
+    floor = bucket_floor(ts, resolution)
+    if floor == ts:
+        return ts
+    return floor + BUCKET_WIDTHS[resolution]
+
+
+def minute_partials(df: pd.DataFrame) -> pd.DataFrame:
+    # 15-minute (n, sum, min, max) of Global_active_power, indexed by bucket
+    df = df.dropna(subset=['datetime'])
+    power = pd.to_numeric(df['Global_active_power'], errors='coerce').astype('float64')
+    keep = power.notna()
+    power = power[keep]
+    grouped = power.groupby(bucket_floor(df['datetime'][keep], '15min').rename('datetime'))
+    return pd.DataFrame({
+        'n': grouped.count(),
+        'demand_sum': grouped.sum(),
+        'demand_min': grouped.min(),
+        'demand_max': grouped.max(),
+    })
+
+
+def merge_partials(parts) -> pd.DataFrame:
+    # Combine partial frames (any resolution) that may share buckets
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=PARTIAL_COLUMNS, index=pd.DatetimeIndex([], name='datetime'))
+    merged = pd.concat(parts) if len(parts) > 1 else parts[0]
+    return regroup(merged, merged.index)
+
+
+def regroup(partials: pd.DataFrame, keys) -> pd.DataFrame:
+    grouped = partials[PARTIAL_COLUMNS].groupby(keys)
+    out = grouped.agg({'n': 'sum', 'demand_sum': 'sum', 'demand_min': 'min', 'demand_max': 'max'})
+    out.index.name = 'datetime'
+    return out.sort_index()
+
+
+def _save(table: pd.DataFrame, path: Path):
+    # datetime.npy last: its presence marks a complete rollup
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / 'n.npy', table['n'].to_numpy(dtype=np.int64))
+    for col in PARTIAL_COLUMNS[1:]:
+        np.save(path / f'{col}.npy', table[col].to_numpy(dtype=np.float64))
+    tmp = path / 'datetime.tmp.npy'
+    np.save(tmp, table.index.to_numpy(dtype='datetime64[ns]').view(np.int64))
+    tmp.replace(path / 'datetime.npy')
+
+
+def write_rollups(base: pd.DataFrame, processed_path) -> Path:
+    # base: 15-minute partials (see minute_partials / merge_partials)
+    out = rollups_dir(processed_path)
+    base = merge_partials([base])
+    for resolution in RESOLUTIONS:
+        table = base if resolution == '15min' else regroup(base, bucket_floor(base.index, resolution))
+        path = rollup_path(processed_path, resolution)
+        if (path / 'datetime.npy').exists():
+            (path / 'datetime.npy').unlink()
+        _save(table, path)
+    return out
+
+
+# -------------------------------------------------
+# STREAMING ROLLUP WRITER (CONSTANT MEMORY)
+# -------------------------------------------------
+# For preprocess_streaming: like its hourly path, each resolution keeps only
+# the newest (still open) bucket in memory. Older buckets are complete once
+# a newer one has been seen, and are appended to
+# processed.rollups/<resolution>.partial. At the end each .partial is
+# copied chunk by chunk into memory-mapped .npy columns. Buckets that show
+# up again after they were written (input not in time order) are kept
+# aside and merged in memory at the end, as the hourly path does.
+
+PARTIAL_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class RollupSpool:
+    def __init__(self, processed_path, chunk_rows: int = 250000):
+        self.processed_path = processed_path
+        self.chunk_rows = chunk_rows
+        self.dir = rollups_dir(processed_path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.carry = dict.fromkeys(RESOLUTIONS)
+        self.flushed_until = dict.fromkeys(RESOLUTIONS)
+        self.late = {resolution: [] for resolution in RESOLUTIONS}
+        self.rows = dict.fromkeys(RESOLUTIONS, 0)
+        self.files = {resolution: open(self._partial(resolution), 'w', newline='') for resolution in RESOLUTIONS}
+
+    def _partial(self, resolution: str) -> Path:
+        return self.dir / f'{resolution}.partial'
+
+    def _write(self, resolution: str, done: pd.DataFrame):
+        done.to_csv(self.files[resolution], header=self.rows[resolution] == 0, date_format=PARTIAL_DATE_FORMAT)
+        self.rows[resolution] += len(done)
+
+    def add(self, quarters: pd.DataFrame):
+        # quarters: 15-minute partials of one chunk (minute_partials)
+        if quarters.empty:
+            return
+        for resolution in RESOLUTIONS:
+            parts = quarters if resolution == '15min' else regroup(quarters, bucket_floor(quarters.index, resolution))
+            flushed = self.flushed_until[resolution]
+            if flushed is not None:
+                is_late = parts.index < flushed
+                if is_late.any():
+                    self.late[resolution].append(parts[is_late])
+                    parts = parts[~is_late]
+            parts = merge_partials([self.carry[resolution], parts] if self.carry[resolution] is not None else [parts])
+            if parts.empty:
+                continue
+            newest = parts.index.max()
+            done, self.carry[resolution] = parts[parts.index < newest], parts[parts.index >= newest]
+            if not done.empty:
+                self._write(resolution, done)
+                self.flushed_until[resolution] = newest
+
+    def finish(self) -> Path:
+        for resolution in RESOLUTIONS:
+            carry = self.carry[resolution]
+            if carry is not None and not carry.empty:
+                self._write(resolution, carry)
+            self.files[resolution].close()
+            partial = self._partial(resolution)
+            path = rollup_path(self.processed_path, resolution)
+            if (path / 'datetime.npy').exists():
+                (path / 'datetime.npy').unlink()
+            if self.late[resolution]:
+                table = merge_partials([_read_partial(partial)] + self.late[resolution])
+                _save(table, path)
+            else:
+                _save_streaming(partial, path, self.rows[resolution], self.chunk_rows)
+            partial.unlink()
+        return self.dir
+
+
+def _read_partial(src: Path, chunksize: int = None):
+    return pd.read_csv(src, index_col='datetime', parse_dates=['datetime'],
+                       float_precision='round_trip', chunksize=chunksize)
+
+
+def _save_streaming(src: Path, path: Path, rows: int, chunk_rows: int):
+    # Same files as _save(), filled a chunk of the .partial at a time
+    path.mkdir(parents=True, exist_ok=True)
+    if rows == 0:
+        _save(merge_partials([]), path)
+        return
+    columns = {'n': np.int64, **{col: np.float64 for col in PARTIAL_COLUMNS[1:]}}
+    out = {col: np.lib.format.open_memmap(path / f'{col}.npy', mode='w+', dtype=dtype, shape=(rows,))
+           for col, dtype in columns.items()}
+    tmp = path / 'datetime.tmp.npy'
+    ts = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.int64, shape=(rows,))
+    pos = 0
+    for part in _read_partial(src, chunk_rows):
+        end = pos + len(part)
+        ts[pos:end] = part.index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        for col in columns:
+            out[col][pos:end] = part[col].to_numpy()
+        pos = end
+    for arr in [*out.values(), ts]:
+        arr.flush()
+    del out, ts
+    tmp.replace(path / 'datetime.npy')
+
+
+def _slice(path: Path, start=None, end=None):
+    # Row range of buckets starting in [start, end), by binary search on the
+    # memory-mapped datetime column
+    ts = np.load(path / 'datetime.npy', mmap_mode='r')
+    lo = 0 if start is None else int(np.searchsorted(ts, pd.Timestamp(start).value, side='left'))
+    hi = len(ts) if end is None else int(np.searchsorted(ts, pd.Timestamp(end).value, side='left'))
+    return ts, lo, max(lo, hi)
+
+
+def read_rollup(processed_path, resolution: str, start=None, end=None) -> pd.DataFrame:
+    # Buckets whose start lies in [start, end); only that slice is read
+    path = rollup_path(processed_path, resolution)
+    if not (path / 'datetime.npy').exists():
+        raise FileNotFoundError(f"No {resolution} rollup at {path}; run training.preprocess first")
+    ts, lo, hi = _slice(path, start, end)
+    df = pd.DataFrame({'datetime': np.array(ts[lo:hi]).view('datetime64[ns]')})
+    for col in PARTIAL_COLUMNS:
+        df[col] = np.load(path / f'{col}.npy', mmap_mode='r')[lo:hi]
+    df['demand_mean'] = df['demand_sum'] / df['n']
+    df['energy_kwh'] = df['demand_sum'] / 60.0
+    return df
+
+
+def load_base(processed_path):
+    # Stored 15-minute partials, or None when there are no rollups yet
+    if not (rollup_path(processed_path, '15min') / 'datetime.npy').exists():
+        return None
+    return read_rollup(processed_path, '15min').set_index('datetime')[PARTIAL_COLUMNS]
+
+
+def choose_resolution(start, end, max_points: int = 2000) -> str:
+    # Finest resolution that returns at most max_points buckets
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for resolution in RESOLUTIONS:
+        if span / BUCKET_WIDTHS[resolution] <= max_points:
+            return resolution
+    return 'weekly'
+
+
+def query(processed_path, start, end, max_points: int = 2000) -> pd.DataFrame:
+    # Time series for a chart: reads one rollup, never the minute data
+    return read_rollup(processed_path, choose_resolution(start, end, max_points), start, end)
+
+
+def _cover(start: pd.Timestamp, end: pd.Timestamp, level: int):
+    # [(resolution, a, b)] with whole buckets of the coarsest possible size
+    if start >= end:
+        return []
+    resolution = RESOLUTIONS[level]
+    if level == 0:
+        return [(resolution, start, end)]
+    a, b = _bucket_ceil(start, resolution), bucket_floor(end, resolution)
+    if a >= b:
+        return _cover(start, end, level - 1)
+    return _cover(start, a, level - 1) + [(resolution, a, b)] + _cover(b, end, level - 1)
+
+
+def summarize(processed_path, start, end) -> dict:
+    # Mean / max / min / energy of [start, end) (15-minute aligned), merged
+    # from whole rollup buckets
+    pieces = []
+    rows_read = dict.fromkeys(RESOLUTIONS, 0)
+    for resolution, a, b in _cover(pd.Timestamp(start), pd.Timestamp(end), len(RESOLUTIONS) - 1):
+        piece = read_rollup(processed_path, resolution, a, b)
+        rows_read[resolution] += len(piece)
+        pieces.append(piece)
+    rows = pd.concat(pieces) if pieces else pd.DataFrame(columns=PARTIAL_COLUMNS)
+    n = int(rows['n'].sum())
+    return {
+        'start': str(pd.Timestamp(start)),
+        'end': str(pd.Timestamp(end)),
+        'n': n,
+        'demand_mean': float(rows['demand_sum'].sum() / n) if n else None,
+        'demand_max': float(rows['demand_max'].max()) if n else None,
+        'demand_min': float(rows['demand_min'].min()) if n else None,
+        'energy_kwh': float(rows['demand_sum'].sum() / 60.0),
+        'rows_read': rows_read,
+    }
@@ -0,0 +1,274 @@
+import json
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from training.preprocess import _complete_lines_end, _prefix_checksum
+from training.uci_reader import is_uci_file, open_slice, read_uci
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+# -------------------------------------------------
+# APPEND-ONLY PARTITIONED TIME-SERIES STORE
+# -------------------------------------------------
+# Minute and hourly demand / voltage, one directory per calendar month:
+#
+#   data/store/minute/2007-03/datetime.bin   int64 ns, ascending
+#                             demand.bin     float32 (as read from the file)
+#                             voltage.bin    float32
+#                             meta.json      rows, min_ts, max_ts
+#   data/store/hourly/2007-03/...            same, float64 hourly means
+#
+# Column files are raw fixed-width arrays that only ever grow. meta.json is
+# the commit record: the writer appends to the column files, flushes them,
+# then atomically replaces meta.json with the new row count. Readers read
+# meta.json first and memory-map exactly that many rows, so they never see
+# a half-written append and need no lock. A single writer per store is
+# enforced with an exclusive lock on data/store/.writer.lock (flock, or
+# msvcrt.locking on Windows); writing is refused where neither exists.
+#
+# Range reads prune partitions by their min_ts / max_ts and binary-search
+# the memory-mapped datetime column, so only the pages of the requested
+# slice are touched.
+
+LEVELS = ('minute', 'hourly')
+COLUMNS = {
+    'minute': {'datetime': np.int64, 'demand': np.float32, 'voltage': np.float32},
+    'hourly': {'datetime': np.int64, 'demand': np.float64, 'voltage': np.float64},
+}
+
+
+class StoreLockedError(RuntimeError):
+    pass
+
+
+def _partition_name(ts: pd.Timestamp) -> str:
+    return f"{ts.year:04d}-{ts.month:02d}"
+
+
+def _lock_exclusive(f, root: Path):
+    # Non-blocking; the OS releases it if the writer dies
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            raise StoreLockedError(f"No file locking on this platform; refusing to write to {root}")
+    except OSError:
+        raise StoreLockedError(f"Another process is writing to {root}")
+
+
+def _read_meta(path: Path):
+    try:
+        with open(path / 'meta.json') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class TimeSeriesStore:
+    def __init__(self, root: str = 'data/store'):
+        self.root = Path(root)
+
+    # -------------------------------
+    # Reading (any number of readers)
+    # -------------------------------
+    def partitions(self, level: str):
+        # [(name, meta)] in time order; partitions without a commit are skipped
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level {level!r}, expected one of {LEVELS}")
+        base = self.root / level
+        if not base.exists():
+            return []
+        out = []
+        for name in sorted(os.listdir(base)):
+            meta = _read_meta(base / name)
+            if meta and meta['rows'] > 0:
+                out.append((name, meta))
+        return out
+
+    def last_timestamp(self, level: str):
+        parts = self.partitions(level)
+        return pd.Timestamp(parts[-1][1]['max_ts']) if parts else None
+
+    def _columns(self, level: str, name: str, rows: int):
+        path = self.root / level / name
+        return {
+            col: np.memmap(path / f'{col}.bin', dtype=dtype, mode='r', shape=(rows,))
+            for col, dtype in COLUMNS[level].items()
+        }
+
+    def read(self, level: str, start=None, end=None) -> pd.DataFrame:
+        # Rows with start <= datetime < end, plus how many partitions were opened
+        lo_ns = None if start is None else pd.Timestamp(start).value
+        hi_ns = None if end is None else pd.Timestamp(end).value
+        pieces = {col: [] for col in COLUMNS[level]}
+        scanned = 0
+        for name, meta in self.partitions(level):
+            if hi_ns is not None and pd.Timestamp(meta['min_ts']).value >= hi_ns:
+                continue
+            if lo_ns is not None and pd.Timestamp(meta['max_ts']).value < lo_ns:
+                continue
+            scanned += 1
+            cols = self._columns(level, name, meta['rows'])
+            ts = cols['datetime']
+            a = 0 if lo_ns is None else int(np.searchsorted(ts, lo_ns, side='left'))
+            b = len(ts) if hi_ns is None else int(np.searchsorted(ts, hi_ns, side='left'))
+            for col, values in cols.items():
+                pieces[col].append(np.array(values[a:b]))
+        arrays = {
+            col: np.concatenate(p) if p else np.empty(0, dtype=COLUMNS[level][col])
+            for col, p in pieces.items()
+        }
+        df = pd.DataFrame({
+            'datetime': arrays['datetime'].view('datetime64[ns]'),
+            'demand': arrays['demand'],
+            'voltage': arrays['voltage'],
+        })
+        df.attrs['partitions_scanned'] = scanned
+        return df
+
+    # -------------------------------
+    # Writing (one writer at a time)
+    # -------------------------------
+    @contextmanager
+    def writer(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock = open(self.root / '.writer.lock', 'a+')
+        try:
+            _lock_exclusive(lock, self.root)
+            yield self
+        finally:
+            lock.close()
+
+    def append(self, level: str, df: pd.DataFrame) -> int:
+        # Appends rows newer than the last stored timestamp (older or
+        # duplicate rows are dropped); call inside `with store.writer():`
+        df = df.dropna(subset=['datetime']).sort_values('datetime', kind='stable')
+        last = self.last_timestamp(level)
+        if last is not None:
+            df = df[df['datetime'] > last]
+        df = df.drop_duplicates(subset='datetime', keep='last')
+        if df.empty:
+            return 0
+        months = df['datetime'].dt.to_period('M')
+        for _, part in df.groupby(months, sort=True):
+            self._append_partition(level, part)
+        return len(df)
+
+    def _append_partition(self, level: str, part: pd.DataFrame):
+        path = self.root / level / _partition_name(part['datetime'].iloc[0])
+        path.mkdir(parents=True, exist_ok=True)
+        meta = _read_meta(path) or {'rows': 0, 'min_ts': None, 'max_ts': None}
+        values = {
+            'datetime': part['datetime'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+            'demand': part['demand'].to_numpy(),
+            'voltage': part['voltage'].to_numpy(),
+        }
+        for col, dtype in COLUMNS[level].items():
+            with open(path / f'{col}.bin', 'ab') as f:
+                # Drop bytes of an append that crashed before its commit
+                f.truncate(meta['rows'] * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(values[col], dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        ts = part['datetime']
+        new_meta = {
+            'rows': meta['rows'] + len(part),
+            'min_ts': meta['min_ts'] or ts.iloc[0].isoformat(),
+            'max_ts': ts.iloc[-1].isoformat(),
+        }
+        tmp = path / 'meta.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(new_meta, f)
+        os.replace(tmp, path / 'meta.json')
+
+
+# -------------------------------------------------
+# INGEST: RAW UCI FILE -> STORE
+# -------------------------------------------------
+# data/store/ingest.json holds the same kind of raw-file watermark as
+# incremental preprocessing (training/preprocess.py): the byte offset of
+# the complete lines already ingested and a checksum of that prefix. A run
+# parses only raw[offset:]; a different, shrunk or rewritten file is read
+# from the start (append() still drops rows the store already has).
+
+def _ingest_start(root: Path, raw_path: str, end: int) -> int:
+    try:
+        with open(root / 'ingest.json') as f:
+            mark = json.load(f)
+    except FileNotFoundError:
+        return 0
+    if (mark.get('raw_path') != str(raw_path) or end < mark['offset']
+            or _prefix_checksum(raw_path, mark['offset']) != mark['checksum']):
+        print(f"{raw_path} is not the file ingested last time, reading it from the start")
+        return 0
+    return mark['offset']
+
+
+def _write_ingest_mark(root: Path, raw_path: str, offset: int):
+    tmp = root / 'ingest.json.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'raw_path': str(raw_path), 'offset': offset,
+                   'checksum': _prefix_checksum(raw_path, offset)}, f)
+    os.replace(tmp, root / 'ingest.json')
+
+
+def ingest(raw_path: str = 'data/raw/household_power_consumption.txt', root: str = 'data/store', chunksize: int = 500000):
+    # Appends minute rows newer than the store's last minute, then every
+    # hour that is complete (the hour holding the newest minute is left for
+    # the next run, when it may have more rows). A half-written last line
+    # is left for the next run too.
+    if not is_uci_file(raw_path):
+        raise ValueError(f"{raw_path} is not a raw UCI file")
+    store = TimeSeriesStore(root)
+    with store.writer():
+        end = _complete_lines_end(raw_path)
+        offset = _ingest_start(store.root, raw_path, end)
+        added = 0
+        if end > offset:
+            with open_slice(raw_path, offset, end) as raw:
+                for chunk in read_uci(raw, chunksize=chunksize):
+                    chunk = chunk.rename(columns={'Global_active_power': 'demand'})
+                    added += store.append('minute', chunk)
+        _write_ingest_mark(store.root, raw_path, end)
+
+        last_minute = store.last_timestamp('minute')
+        if last_minute is None:
+            return {'minute_rows': 0, 'hourly_rows': 0, 'raw_bytes': end - offset}
+        last_hour = store.last_timestamp('hourly')
+        start = None if last_hour is None else last_hour + pd.Timedelta(hours=1)
+        minutes = store.read('minute', start, last_minute.floor('h'))
+        hourly = minutes.groupby(minutes['datetime'].dt.floor('h')).agg(
+            demand=('demand', 'mean'), voltage=('voltage', 'mean')
+        ).reset_index()
+        hours = store.append('hourly', hourly.astype({'demand': 'float64', 'voltage': 'float64'}))
+    print(f"Stored {added} minute rows and {hours} hourly rows in {root} ({end - offset} bytes read)")
+    return {'minute_rows': added, 'hourly_rows': hours, 'raw_bytes': end - offset}
+
+
+if __name__ == '__main__':
+    # python -m training.store [--raw-path ...] [--store-dir data/store]
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--raw-path', default='data/raw/household_power_consumption.txt')
+    parser.add_argument('--store-dir', default='data/store')
+    args = parser.parse_args()
+    try:
+        ingest(args.raw_path, args.store_dir)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
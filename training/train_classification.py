@@ -4,12 +4,18 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 import joblib
+import json
+import numpy as np
 
 # Try importing based on folder structure (training.preprocess) or local file (preprocess)
 try:
     from training.preprocess import preprocess
+    from training.columnar import load_columnar
+    from training.features import FEATURES, add_features
 except ImportError:
     from preprocess import preprocess
+    from columnar import load_columnar
+    from features import FEATURES, add_features
 
 def train_classification(processed_path: str = 'data/processed/processed.csv', model_path: str = 'models/classifier.pkl'):
     processed = Path(processed_path)
@@ -19,26 +25,35 @@ def train_classification(processed_path: str = 'data/processed/processed.csv', m
         print("Processed file not found. Running preprocessing first...")
         preprocess()
 
+    features = FEATURES
+
     # 2. Load Data
-    df = pd.read_csv(processed_path)
-    
-    # 3. Feature Engineering (Critical Step)
-    df['datetime'] = pd.to_datetime(df['datetime'])
-    df['hour'] = df['datetime'].dt.hour
-    df['dayofweek'] = df['datetime'].dt.dayofweek
+    # Memory-mapped arrays written by preprocess (hour/dayofweek included);
+    # fall back to parsing the CSV when the artifact is missing or stale
+    data = load_columnar(processed_path)
+    if data is not None:
+        X, demand = data['X'], data['demand']
+        keep = np.isfinite(X).all(axis=1) & np.isfinite(demand)
+        if not keep.all():
+            X, demand = X[keep], demand[keep]
+        X = pd.DataFrame(X, columns=features, copy=False)
+        demand = pd.Series(demand, name='demand')
+    else:
+        df = pd.read_csv(processed_path)
 
-    features = ['hour', 'temperature', 'voltage', 'dayofweek']
-    
-    # Clean up any potential NaNs
-    df = df.dropna(subset=features + ['demand'])
+        # 3. Feature Engineering (Critical Step)
+        df = add_features(df)
+
+        # Clean up any potential NaNs
+        df = df.dropna(subset=features + ['demand'])
+
+        X = df[features]
+        demand = df['demand']
 
     # 4. Create Target Label
     # Label as high risk if demand is above the 75th percentile
-    thresh = df['demand'].quantile(0.75)
-    df['high_risk'] = (df['demand'] > thresh).astype(int)
-
-    X = df[features]
-    y = df['high_risk']
+    thresh = demand.quantile(0.75)
+    y = (demand > thresh).astype(int).rename('high_risk')
 
     # 5. Train Model (LITE VERSION)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -60,10 +75,15 @@ def train_classification(processed_path: str = 'data/processed/processed.csv', m
     preds = clf.predict(X_test)
     acc = accuracy_score(y_test, preds)
 
-    Path('models').mkdir(parents=True, exist_ok=True)
+    Path(model_path).parent.mkdir(parents=True, exist_ok=True)
     
     # 'compress=3' helps reduce the file size further
     joblib.dump(clf, model_path, compress=3)
+
+    # Store the label threshold next to the model so the API can derive
+    # risk from the regression output (POWERGRID_RISK_MODE=derived)
+    with open(Path(model_path).with_suffix('.json'), 'w') as f:
+        json.dump({'threshold': float(thresh), 'quantile': 0.75}, f)
     
     print(f"Model saved to {model_path}")
 
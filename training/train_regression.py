@@ -9,10 +9,16 @@ import joblib
 # Handle import whether running as module or script
 try:
     from training.preprocess import preprocess
+    from training.columnar import load_columnar
+    from training.features import FEATURES, LAG_FEATURES, add_features, lag_features
 except ImportError:
     from preprocess import preprocess
+    from columnar import load_columnar
+    from features import FEATURES, LAG_FEATURES, add_features, lag_features
 
-def train_regression(processed_path: str = 'data/processed/processed.csv', model_path: str = 'models/regression.pkl'):
+def train_regression(processed_path: str = 'data/processed/processed.csv', model_path: str = 'models/regression.pkl', lags: bool = False):
+    # lags=True adds LAG_FEATURES (recent demand history); the API serves
+    # that model from models/regression_lag.pkl for requests naming a feeder
     processed = Path(processed_path)
     
     # 1. Ensure Data Exists
@@ -20,23 +26,36 @@ def train_regression(processed_path: str = 'data/processed/processed.csv', model
         print("Processed file not found. Running preprocessing first...")
         preprocess()
 
+    features = FEATURES + LAG_FEATURES if lags else FEATURES
+
     # 2. Load Data
-    df = pd.read_csv(processed_path)
-    
-    # 3. Feature Engineering
-    # We must regenerate 'hour' and 'dayofweek' from the datetime column
-    df['datetime'] = pd.to_datetime(df['datetime'])
-    df['hour'] = df['datetime'].dt.hour
-    df['dayofweek'] = df['datetime'].dt.dayofweek
+    # Memory-mapped arrays written by preprocess (hour/dayofweek included);
+    # fall back to parsing the CSV when the artifact is missing or stale
+    data = load_columnar(processed_path)
+    if data is not None:
+        X, demand = data['X'], data['demand']
+        if lags:
+            X = np.hstack([X, data['lags'].astype(np.float32)])
+        keep = np.isfinite(X).all(axis=1) & np.isfinite(demand)
+        if not keep.all():
+            X, demand = X[keep], demand[keep]
+        X = pd.DataFrame(X, columns=features, copy=False)
+        y = pd.Series(demand, name='demand')
+    else:
+        df = pd.read_csv(processed_path)
 
-    features = ['hour', 'temperature', 'voltage', 'dayofweek']
-    
-    # Clean data
-    df = df.dropna(subset=features + ['demand'])
+        # 3. Feature Engineering
+        # We must regenerate 'hour' and 'dayofweek' from the datetime column
+        df = add_features(df)
+        if lags:
+            df[LAG_FEATURES] = lag_features(df['datetime'], df['demand'])
+
+        # Clean data
+        df = df.dropna(subset=features + ['demand'])
 
-    # 4. Prepare Training Data
-    X = df[features]
-    y = df['demand']
+        # 4. Prepare Training Data
+        X = df[features]
+        y = df['demand']
 
     # 5. Train Model (LITE VERSION)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -59,7 +78,7 @@ def train_regression(processed_path: str = 'data/processed/processed.csv', model
     preds = model.predict(X_test)
     rmse = float(np.sqrt(mean_squared_error(y_test, preds)))
 
-    Path('models').mkdir(parents=True, exist_ok=True)
+    Path(model_path).parent.mkdir(parents=True, exist_ok=True)
     
     # 'compress=3' helps reduce the file size further
     joblib.dump(model, model_path, compress=3)
@@ -68,5 +87,10 @@ def train_regression(processed_path: str = 'data/processed/processed.csv', model
     return {'rmse': float(rmse), 'model_path': model_path}
 
 if __name__ == '__main__':
-    print('Training regression model...')
-    print(train_regression())
\ No newline at end of file
+    import sys
+    if '--lags' in sys.argv[1:]:
+        print('Training lag-feature regression model...')
+        print(train_regression(model_path='models/regression_lag.pkl', lags=True))
+    else:
+        print('Training regression model...')
+        print(train_regression())
\ No newline at end of file
@@ -14,8 +14,10 @@ except ImportError:
 # Handle import whether running as module or script
 try:
     from training.preprocess import preprocess
+    from training.columnar import load_columnar
 except ImportError:
     from preprocess import preprocess
+    from columnar import load_columnar
 
 
 def train_timeseries(processed_path: str = 'data/processed/processed.csv', model_path: str = 'models/timeseries.pkl'):
@@ -31,12 +33,20 @@ def train_timeseries(processed_path: str = 'data/processed/processed.csv', model
 
     print("Loading data for Time Series...")
     # 2. Load and Set Index
-    df = pd.read_csv(processed_path)
-    df['datetime'] = pd.to_datetime(df['datetime'])
-    
-    # Set datetime as index and ensure it is sorted
-    df = df.set_index('datetime').sort_index()
-    
+    # Memory-mapped arrays written by preprocess, else the CSV
+    data = load_columnar(processed_path)
+    if data is not None:
+        df = pd.DataFrame(
+            {'demand': data['demand']},
+            index=pd.DatetimeIndex(data['datetime'].view('datetime64[ns]'), name='datetime'),
+        ).sort_index()
+    else:
+        df = pd.read_csv(processed_path)
+        df['datetime'] = pd.to_datetime(df['datetime'])
+
+        # Set datetime as index and ensure it is sorted
+        df = df.set_index('datetime').sort_index()
+
     # 3. Prepare Time Series Object
     # 'asfreq' ensures we have a strict hourly frequency, filling gaps if necessary
     ts = df['demand'].asfreq('h')
@@ -65,7 +75,7 @@ def train_timeseries(processed_path: str = 'data/processed/processed.csv', model
     res = model.fit(disp=False)
     
     # 5. Save Model
-    Path('models').mkdir(parents=True, exist_ok=True)
+    Path(model_path).parent.mkdir(parents=True, exist_ok=True)
     
     # 'compress=3' to reduce file size
     joblib.dump(res, model_path, compress=3)
@@ -0,0 +1,108 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------
+# SCHEMA-DRIVEN UCI READER
+# -------------------------------------------------
+# household_power_consumption.txt has ~2M minute rows but only four columns
+# matter downstream. Reading just those with fixed dtypes and building the
+# timestamps from the (few) distinct date and time strings is much faster
+# than `parse_dates={'datetime': ['Date', 'Time']}`: there are ~1,400
+# distinct dates and 1,440 distinct times in the whole file, so each is
+# parsed once and the rest is integer arithmetic on the factorized codes.
+#
+# Benchmark: python -m scripts.bench_uci_reader
+
+UCI_COLUMNS = ['Date', 'Time', 'Global_active_power', 'Voltage']
+UCI_DTYPES = {
+    'Date': str,
+    'Time': str,
+    'Global_active_power': np.float32,
+    'Voltage': np.float32,
+}
+UCI_NA_VALUES = ['?', '']
+
+
+def is_uci_file(path) -> bool:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        header = f.readline().strip().split(';')
+    return all(c in header for c in UCI_COLUMNS)
+
+
+def parse_uci_datetime(date: pd.Series, time: pd.Series) -> pd.Series:
+    # dd/mm/yyyy + HH:MM:SS -> datetime64[ns]; unparseable rows become NaT
+    date_codes, date_uniques = pd.factorize(date, use_na_sentinel=True)
+    time_codes, time_uniques = pd.factorize(time, use_na_sentinel=True)
+
+    days = pd.to_datetime(pd.Series(date_uniques, dtype=object), format='%d/%m/%Y', errors='coerce')
+    days = days.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    secs = pd.to_timedelta(pd.Series(time_uniques, dtype=object), errors='coerce')
+    secs = secs.to_numpy(dtype='timedelta64[ns]').view(np.int64)
+
+    nat = np.iinfo(np.int64).min
+    # Sentinel -1 (missing string) maps to NaT via the appended slot
+    days = np.append(days, nat)[date_codes]
+    secs = np.append(secs, nat)[time_codes]
+    values = days + secs
+    values[(days == nat) | (secs == nat)] = nat
+    return pd.Series(values.view('datetime64[ns]'), index=date.index, name='datetime')
+
+
+def _to_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        'datetime': parse_uci_datetime(raw['Date'], raw['Time']),
+        'Global_active_power': raw['Global_active_power'],
+        'voltage': raw['Voltage'],
+    })
+
+
+def read_uci(path, chunksize: int = None):
+    # Returns one DataFrame (datetime, Global_active_power, voltage), or an
+    # iterator of them when chunksize is given
+    reader = pd.read_csv(
+        path,
+        sep=';',
+        usecols=UCI_COLUMNS,
+        dtype=UCI_DTYPES,
+        na_values=UCI_NA_VALUES,
+        keep_default_na=False,
+        engine='c',
+        chunksize=chunksize,
+    )
+    if chunksize is None:
+        return _to_frame(reader)
+    return (_to_frame(chunk) for chunk in reader)
+
+
+class _RawSlice(io.RawIOBase):
+    # The header line, then bytes [start, end) of the file, read lazily
+    def __init__(self, path, start: int, end: int):
+        self._f = open(path, 'rb')
+        self._header = self._f.readline()
+        self._f.seek(max(start, len(self._header)))
+        self._left = max(0, end - self._f.tell())
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._header:
+            n = min(len(b), len(self._header))
+            b[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        n = self._f.readinto(memoryview(b)[:min(len(b), self._left)])
+        self._left -= n
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def open_slice(path, start: int, end: int):
+    # Binary file object for read_uci(): the header plus bytes [start, end)
+    # (e.g. only the rows appended since a watermark, or only complete lines)
+    return io.BufferedReader(_RawSlice(path, start, end))
@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------
+# WEATHER AS-OF JOIN
+# -------------------------------------------------
+# A weather file is a CSV of readings at irregular times, optionally for
+# several sites:
+#
+#   datetime,site,temperature
+#   2007-01-01 00:07:00,paris,4.2
+#
+# Each load row gets the temperature of the latest reading at or before it
+# at its site, if that reading is at most `tolerance` old (else NaN). Of
+# several readings with the same timestamp, the last one in the file wins.
+#
+# Sorting millions of readings is the expensive part, so it happens once:
+# the first use writes <weather>.index/ next to the file (readings sorted
+# by site then time, as .npy columns, plus meta.json with per-site offsets
+# and the CSV's size / mtime). Later runs memory-map it and only binary
+# search (np.searchsorted), chunk by chunk in the streaming path or per
+# byte range in the parallel one. Benchmark: python -m scripts.bench_weather
+
+DEFAULT_TOLERANCE = '2h'
+
+
+def index_dir(weather_path) -> Path:
+    p = Path(weather_path)
+    return p.with_name(p.name + '.index')
+
+
+def _source_stamp(weather_path) -> dict:
+    st = os.stat(weather_path)
+    return {'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+
+
+def build_index(weather_path, chunksize: int = 1000000) -> Path:
+    parts = []
+    for chunk in pd.read_csv(weather_path, chunksize=chunksize):
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        if 'datetime' not in chunk.columns or 'temperature' not in chunk.columns:
+            raise ValueError(f"{weather_path} needs datetime and temperature columns")
+        ts = pd.to_datetime(chunk['datetime'], format='ISO8601', errors='coerce')
+        parts.append(pd.DataFrame({
+            'site': chunk['site'].astype(str) if 'site' in chunk.columns else '',
+            'ts': ts.to_numpy(dtype='datetime64[ns]').view(np.int64),
+            'temperature': pd.to_numeric(chunk['temperature'], errors='coerce').to_numpy(dtype=np.float64),
+        }))
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['site', 'ts', 'temperature'])
+    df = df[(df['ts'] != np.iinfo(np.int64).min) & df['temperature'].notna()]
+
+    codes, sites = pd.factorize(df['site'], sort=True)
+    ts = df['ts'].to_numpy(dtype=np.int64)
+    order = np.lexsort((ts, codes))  # stable: file order among equal timestamps
+    offsets = np.searchsorted(codes[order], np.arange(len(sites) + 1))
+
+    out = index_dir(weather_path)
+    out.mkdir(parents=True, exist_ok=True)
+    np.save(out / 'ts.npy', ts[order])
+    np.save(out / 'temperature.npy', df['temperature'].to_numpy(dtype=np.float64)[order])
+    meta = {
+        'rows': int(len(order)),
+        'sites': {str(s): [int(offsets[i]), int(offsets[i + 1])] for i, s in enumerate(sites)},
+        **_source_stamp(weather_path),
+    }
+    # meta.json last: its presence marks a complete index
+    with open(out / 'meta.json', 'w') as f:
+        json.dump(meta, f)
+    return out
+
+
+class WeatherIndex:
+    def __init__(self, weather_path):
+        self.path = Path(weather_path)
+        out = index_dir(weather_path)
+        meta = None
+        if (out / 'meta.json').exists():
+            with open(out / 'meta.json') as f:
+                meta = json.load(f)
+        if meta is None or {k: meta.get(k) for k in ('source_size', 'source_mtime_ns')} != _source_stamp(weather_path):
+            print(f"Indexing weather readings in {weather_path}...")
+            build_index(weather_path)
+            with open(out / 'meta.json') as f:
+                meta = json.load(f)
+        self.meta = meta
+        self.ts = np.load(out / 'ts.npy', mmap_mode='r')
+        self.temperature = np.load(out / 'temperature.npy', mmap_mode='r')
+
+    def _site_slice(self, site):
+        sites = self.meta['sites']
+        if site is None:
+            if len(sites) != 1:
+                raise ValueError(f"{self.path} has sites {sorted(sites)}; pass one with site=")
+            site = next(iter(sites))
+        if site not in sites:
+            raise ValueError(f"Site {site!r} not in {self.path} (has {sorted(sites)})")
+        a, b = sites[site]
+        return self.ts[a:b], self.temperature[a:b]
+
+    def asof(self, datetimes, site=None, tolerance=DEFAULT_TOLERANCE) -> np.ndarray:
+        # Temperature of the latest reading at or before each timestamp,
+        # NaN when there is none within `tolerance` (or the timestamp is NaT)
+        t = np.asarray(pd.to_datetime(datetimes), dtype='datetime64[ns]').view(np.int64)
+        ts, temperature = self._site_slice(site)
+        out = np.full(len(t), np.nan)
+        if len(ts) == 0:
+            return out
+        i = np.searchsorted(ts, t, side='right') - 1
+        ok = (i >= 0) & (t != np.iinfo(np.int64).min)
+        age = t[ok] - ts[i[ok]]
+        hit = age <= pd.Timedelta(tolerance).value
+        idx = np.flatnonzero(ok)[hit]
+        out[idx] = temperature[i[idx]]
+        return out
+
+
+@lru_cache(maxsize=4)
+def _cached_index(path: str, size: int, mtime_ns: int) -> WeatherIndex:
+    return WeatherIndex(path)
+
+
+def open_index(weather_path) -> WeatherIndex:
+    # One WeatherIndex per process and weather file version, so chunked
+    # callers (and each worker process) open the .npy files once
+    st = os.stat(weather_path)
+    return _cached_index(str(weather_path), st.st_size, st.st_mtime_ns)
+
+
+def join_temperature(df: pd.DataFrame, weather: WeatherIndex, site=None, tolerance=DEFAULT_TOLERANCE) -> pd.DataFrame:
+    # Adds (or replaces) df['temperature'] from the weather readings; works
+    # on minute or hourly rows and on any chunk of them
+    return df.assign(temperature=weather.asof(df['datetime'], site, tolerance))
+
+
+if __name__ == '__main__':
+    # python -m training.weather data/raw/weather.csv   (re)build the index
+    try:
+        print(f"Index written to {build_index(sys.argv[1] if len(sys.argv) > 1 else 'data/raw/weather.csv')}")
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)